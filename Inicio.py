@@ -1,6 +1,6 @@
 import streamlit as st
-from data_handler import login
-from css_utils import load_css
+from autenticacion import login
+from css_utils import load_css, load_icon_css
 
 
 st.set_page_config(page_title="Portal - SICyT", page_icon=st.secrets["LOGO_CORTO"], layout="wide", initial_sidebar_state="collapsed")
@@ -9,7 +9,7 @@ st.logo(image=st.secrets['LOGO_LARGO'], size="large")
 custom_streamlit_css = ""
 
 # Cargar los estilos de iconos y tipografía personalizada
-icon_css = load_css("static/iconos/dist/css/icono-arg.css")
+icon_css = load_icon_css()
 roboto_css = load_css("static/style.css")
 
 # Inyectar el CSS en la aplicación
@@ -0,0 +1,253 @@
+"""Construcción de los activos estáticos de la aplicación.
+
+``icono-arg.css`` pesa ~470 KB porque embebe la fuente completa de iconos en
+base64, y las páginas lo inyectaban en cada rerun. Este script busca en las
+páginas las clases ``icono-arg-*`` que realmente se usan, recorta la fuente a
+esos glifos y genera:
+
+- ``static/iconos/dist/fonts/icono-arg-subset-<hash>.woff``: la fuente recortada,
+  servida como archivo estático de Streamlit (``server.enableStaticServing``) en
+  ``app/static/...``. El hash del contenido en el nombre permite que el
+  navegador la guarde en caché sin riesgo de usar una versión vieja.
+- ``static/iconos/dist/css/icono-arg-subset.css``: las reglas de esos glifos,
+  que ``css_utils.load_icon_css`` inyecta en las páginas (~1 KB).
+
+Para las fichas en PDF también prepara versiones livianas de lo que
+``pdf_generator`` incrusta en cada archivo:
+
+- las imágenes fijas (el membrete) remuestreadas a ``DPI_PDF`` para el ancho
+  con que se ubican en la página y, si no tienen transparencia, en JPEG, que
+  fpdf2 incrusta sin volver a comprimir;
+- las fuentes Poppins recortadas a los caracteres latinos, sin hinting ni
+  tablas de layout, que fpdf2 no usa.
+
+Quedan en ``static/pdf/`` junto con ``activos.json``, que relaciona cada
+archivo original con su versión construida; ``ruta_pdf`` la resuelve y vuelve
+al original si no se construyó.
+
+Hay que volver a ejecutarlo al usar un icono nuevo en una página o al cambiar
+el membrete o las fuentes:
+
+    python activos.py
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ICONOS_DIR = os.path.join(BASE_DIR, "static", "iconos", "dist")
+ICONOS_CSS = os.path.join(ICONOS_DIR, "css", "icono-arg.css")
+ICONOS_FUENTE = os.path.join(ICONOS_DIR, "fonts", "icono-arg_d575b86ae6556e738fe950b6139dab39.ttf")
+ICONOS_CSS_SUBSET = os.path.join(ICONOS_DIR, "css", "icono-arg-subset.css")
+ICONOS_FUENTE_SUBSET = "icono-arg-subset-{huella}.woff"
+
+# Archivos donde se buscan las clases de iconos usadas
+FUENTES_PAGINAS = ["Inicio.py", "pages/*.py"]
+
+# URL relativa a la página con la que Streamlit sirve ``static/``
+URL_ESTATICOS = "app/static"
+
+PDF_DIR = os.path.join(BASE_DIR, "static", "pdf")
+MANIFIESTO_PDF = os.path.join(PDF_DIR, "activos.json")
+
+# Resolución de impresión de las imágenes fijas del PDF
+DPI_PDF = 200
+CALIDAD_JPEG = 90
+
+# Imágenes que incrusta ``ficha_provincial_pdf`` -> ancho en mm con que se ubican
+IMAGENES_PDF = {
+    "static/logo/letterhead.png": 210,
+}
+
+FUENTES_PDF = [
+    "static/fonts/Poppins/Poppins-Regular.ttf",
+    "static/fonts/Poppins/Poppins-Bold.ttf",
+    "static/fonts/Poppins/Poppins-Italic.ttf",
+]
+
+# Latín básico, Latin-1, Latín extendido A y puntuación general (comillas, guiones, …)
+UNICODES_PDF = [
+    *range(0x20, 0x7F), *range(0xA0, 0x180), *range(0x2010, 0x2028), *range(0x2030, 0x203B),
+    0x20AC, 0x2122,
+]
+
+_RE_GLIFO = re.compile(r'\.icono-arg-([\w-]+):before\s*\{\s*content:\s*"\\([0-9a-fA-F]+)";\s*\}')
+_RE_CLASE = re.compile(r"\bicono-arg-([\w-]+)")
+# Propiedades comunes a todos los glifos (la regla que lista todos los ``:before``)
+_RE_BASE = re.compile(r"\[data-icon\]:before,\s*(?:\.icono-arg-[\w-]+:before,?\s*)+\{([^}]*)\}")
+
+
+def glifos_disponibles(css: str) -> dict:
+    """Nombre de cada icono de ``icono-arg.css`` -> punto de código."""
+    return {nombre: int(codigo, 16) for nombre, codigo in _RE_GLIFO.findall(css)}
+
+
+def glifos_usados(disponibles: dict) -> list:
+    """Iconos referenciados en las páginas, en orden alfabético."""
+    usados = set()
+    for patron in FUENTES_PAGINAS:
+        for archivo in glob.glob(os.path.join(BASE_DIR, patron)):
+            with open(archivo, "r", encoding="utf-8") as f:
+                usados.update(_RE_CLASE.findall(f.read()))
+    return sorted(usados & set(disponibles))
+
+
+def recortar_fuente(origen: str, codigos: list, flavor: str = "woff") -> bytes:
+    """Fuente con solo los glifos de ``codigos`` (``flavor=None`` para TTF). Misma entrada, mismos bytes."""
+    from fontTools.subset import Options, Subsetter, load_font, save_font
+
+    opciones = Options()
+    opciones.flavor = flavor
+    opciones.layout_features = []
+    opciones.hinting = False
+    opciones.notdef_outline = True
+    # Tablas que fontTools no sabe recortar (FFTM): se descartan, no hace falta avisarlo
+    logging.getLogger("fontTools.subset").setLevel(logging.ERROR)
+    fuente = load_font(origen, opciones)
+    # Sin esto el timestamp de ``head`` cambia en cada ejecución y con él la huella
+    fuente.recalcTimestamp = False
+    subsetter = Subsetter(opciones)
+    subsetter.populate(unicodes=codigos)
+    subsetter.subset(fuente)
+    salida = io.BytesIO()
+    save_font(fuente, salida, opciones)
+    return salida.getvalue()
+
+
+def construir_iconos() -> tuple:
+    """Genera la fuente y el CSS recortados. Devuelve (glifos, ruta del CSS, ruta de la fuente)."""
+    with open(ICONOS_CSS, "r", encoding="utf-8") as f:
+        css = f.read()
+    disponibles = glifos_disponibles(css)
+    glifos = glifos_usados(disponibles)
+    base = _RE_BASE.search(css)
+    propiedades = " ".join(linea.strip() for linea in base.group(1).strip().splitlines()) if base else ""
+
+    fuente = recortar_fuente(ICONOS_FUENTE, [disponibles[g] for g in glifos])
+    nombre_fuente = ICONOS_FUENTE_SUBSET.format(huella=hashlib.sha256(fuente).hexdigest()[:12])
+    directorio_fuentes = os.path.dirname(ICONOS_FUENTE)
+    for anterior in glob.glob(os.path.join(directorio_fuentes, ICONOS_FUENTE_SUBSET.format(huella="*"))):
+        if os.path.basename(anterior) != nombre_fuente:
+            os.remove(anterior)
+    ruta_fuente = os.path.join(directorio_fuentes, nombre_fuente)
+    with open(ruta_fuente, "wb") as f:
+        f.write(fuente)
+
+    url = "/".join([URL_ESTATICOS, os.path.relpath(ruta_fuente, os.path.join(BASE_DIR, "static")).replace(os.sep, "/")])
+    lineas = [
+        "/* Generado por activos.py a partir de icono-arg.css (MIT, argob/iconos): no editar. */",
+        "@font-face {",
+        '  font-family: "icono-arg";',
+        f'  src: url("{url}") format("woff");',
+        "  font-weight: normal;",
+        "  font-style: normal;",
+        "}",
+        '[class*="icono-arg"] { line-height: 1; }',
+        '[class*="icono-arg"]:before { font-size: 1.5em; }',
+    ]
+    if glifos:
+        lineas.append(",\n".join(f".icono-arg-{g}:before" for g in glifos) + f" {{ {propiedades} }}")
+    lineas += [f'.icono-arg-{g}:before {{ content: "\\{disponibles[g]:x}"; }}' for g in glifos]
+    with open(ICONOS_CSS_SUBSET, "w", encoding="utf-8") as f:
+        f.write("\n".join(lineas) + "\n")
+    return glifos, ICONOS_CSS_SUBSET, ruta_fuente
+
+
+def reducir_imagen(origen: str, ancho_mm: float) -> tuple:
+    """
+    Imagen remuestreada a ``DPI_PDF`` para ``ancho_mm``, como (bytes, extensión).
+    JPEG si es opaca; PNG optimizado si usa transparencia.
+    """
+    from PIL import Image
+
+    with Image.open(origen) as img:
+        img.load()
+    ancho = round(ancho_mm / 25.4 * DPI_PDF)
+    if img.width > ancho:
+        img = img.resize((ancho, round(img.height * ancho / img.width)), Image.LANCZOS)
+
+    salida = io.BytesIO()
+    opaca = img.mode in ("RGB", "L") or (img.mode == "RGBA" and img.getchannel("A").getextrema() == (255, 255))
+    if opaca:
+        # Sin submuestreo de color: el texto claro sobre fondo oscuro queda nítido
+        img.convert("RGB" if img.mode != "L" else "L").save(salida, "JPEG", quality=CALIDAD_JPEG,
+                                                            subsampling=0, optimize=True)
+        return salida.getvalue(), ".jpg"
+    img.save(salida, "PNG", optimize=True)
+    return salida.getvalue(), ".png"
+
+
+def _escribir_con_huella(directorio: str, nombre: str, extension: str, contenido: bytes) -> str:
+    """Guarda ``contenido`` como ``<nombre>-<hash><extension>`` y devuelve la ruta relativa a BASE_DIR."""
+    ruta = os.path.join(directorio, f"{nombre}-{hashlib.sha256(contenido).hexdigest()[:12]}{extension}")
+    os.makedirs(directorio, exist_ok=True)
+    with open(ruta, "wb") as f:
+        f.write(contenido)
+    return os.path.relpath(ruta, BASE_DIR).replace(os.sep, "/")
+
+
+def construir_pdf() -> dict:
+    """Genera las imágenes y fuentes reducidas del PDF y el manifiesto. Devuelve original -> construido."""
+    manifiesto = {}
+    for origen, ancho_mm in IMAGENES_PDF.items():
+        contenido, extension = reducir_imagen(os.path.join(BASE_DIR, origen), ancho_mm)
+        nombre = os.path.splitext(os.path.basename(origen))[0]
+        manifiesto[origen] = _escribir_con_huella(PDF_DIR, nombre, extension, contenido)
+    for origen in FUENTES_PDF:
+        contenido = recortar_fuente(os.path.join(BASE_DIR, origen), UNICODES_PDF, flavor=None)
+        nombre = os.path.splitext(os.path.basename(origen))[0]
+        manifiesto[origen] = _escribir_con_huella(os.path.join(PDF_DIR, "fonts"), nombre, ".ttf", contenido)
+
+    # Versiones anteriores que ya no figuran en el manifiesto
+    vigentes = {os.path.join(BASE_DIR, ruta) for ruta in manifiesto.values()}
+    for anterior in glob.glob(os.path.join(PDF_DIR, "**", "*-" + "?" * 12 + ".*"), recursive=True):
+        if anterior not in vigentes:
+            os.remove(anterior)
+    with open(MANIFIESTO_PDF, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    _manifiesto_pdf.cache_clear()
+    return manifiesto
+
+
+@lru_cache(maxsize=1)
+def _manifiesto_pdf() -> dict:
+    try:
+        with open(MANIFIESTO_PDF, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def ruta_pdf(ruta: str) -> str:
+    """Versión construida de ``ruta`` para el PDF si existe; si no, la original."""
+    construida = _manifiesto_pdf().get(ruta)
+    if construida and os.path.exists(os.path.join(BASE_DIR, construida)):
+        return os.path.join(BASE_DIR, construida)
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye los activos estáticos recortados de la aplicación.")
+    parser.parse_args()
+
+    glifos, css, fuente = construir_iconos()
+    print(f"Iconos: {', '.join(glifos) or 'ninguno'}")
+    for ruta in (css, fuente):
+        print(f" {os.path.relpath(ruta, BASE_DIR)}: {os.path.getsize(ruta):,} bytes".replace(",", "."))
+
+    print("PDF:")
+    for origen, construido in construir_pdf().items():
+        antes, despues = (os.path.getsize(os.path.join(BASE_DIR, r)) for r in (origen, construido))
+        print(f" {construido}: {antes:,} -> {despues:,} bytes".replace(",", "."))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""Benchmark de punta a punta de la ficha provincial.
+
+Mide, para cada provincia, las etapas que recorre una ficha desde la base de
+datos hasta el PDF:
+
+    plantillas  Renderizado Jinja2 de las plantillas SQL de todos los componentes.
+    consultas   ``get_informe`` completo (consultas en paralelo).
+    pivot       ``tabla_pivot`` de las tablas, como DataFrame y como GT.
+    figuras     Construcción de las figuras de Plotly (sin la cache de figuras.py).
+    png         Render de las figuras a PNG con Kaleido.
+    pdf         Escritura del PDF con ``ficha_provincial_pdf``.
+    carga       ``constructor_postgres.main`` (solo con --carga y motor postgres).
+
+Puede ejecutarse contra el PostgreSQL configurado en ``.streamlit/secrets.toml``
+o contra un motor embebido (DuckDB, dependencia opcional) cargado con los CSV
+de ``data/`` usando el esquema de ``constructor_postgres.SQL_SCHEMA``.
+
+Los resultados se guardan como JSON para comparar entre commits: con
+``--comparar`` el proceso termina con código 1 si el p50 de alguna etapa
+empeora más que ``--umbral`` respecto de la corrida base.
+
+Uso:
+    python benchmark.py --motor embebido --salida bench/actual.json
+    python benchmark.py --motor embebido --comparar bench/base.json --umbral 0.2
+    python benchmark.py --motor postgres --carga --repeticiones 3
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+from jinja2 import Template
+
+ETAPAS = ["plantillas", "consultas", "pivot", "figuras", "png", "pdf", "carga"]
+ANIO = "2023"
+
+# Diferencia absoluta mínima (segundos) para considerar una regresión: evita
+# marcar como regresión el ruido de etapas que tardan pocos milisegundos.
+PISO_REGRESION = 0.005
+
+
+# --- MOTOR EMBEBIDO ---
+
+class MotorEmbebido:
+    """Base DuckDB en memoria con el esquema de constructor_postgres y los CSV de data/."""
+    _db = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_db(cls):
+        if cls._db is None:
+            with cls._lock:
+                if cls._db is None:
+                    cls._db = cls._crear()
+        return cls._db
+
+    @staticmethod
+    def _crear():
+        import duckdb
+        import constructor_postgres as cp
+
+        db = duckdb.connect()
+        # Funciones de PostgreSQL usadas por las plantillas que DuckDB no trae
+        db.execute("CREATE MACRO initcap(s) AS upper(s[1]) || lower(s[2:])")
+        for tabla, archivo in ((t, a) for a, t in cp.ARCHIVOS_A_CARGAR.items()):
+            ruta = os.path.join(cp.DATA_DIR, archivo)
+            if os.path.exists(ruta):
+                df = cp.leer_datos(archivo)
+                db.register("_df", df)
+                db.execute(f'CREATE TABLE "{tabla}" AS SELECT * FROM _df')
+                db.unregister("_df")
+        # Las tablas sin CSV se crean vacías con el DDL del esquema
+        existentes = {fila[0] for fila in db.execute("SELECT table_name FROM information_schema.tables").fetchall()}
+        for sentencia in cp.SQL_SCHEMA.split(";"):
+            if "CREATE TABLE" in sentencia:
+                tabla = sentencia.split("CREATE TABLE", 1)[1].split("(", 1)[0].strip()
+                if tabla not in existentes:
+                    db.execute(sentencia.replace("SERIAL", "INTEGER"))
+        for sentencia in cp.SQL_DERIVADAS.split(";"):
+            if sentencia.strip():
+                db.execute(sentencia)
+        db.executemany("INSERT INTO version_tablas (tabla, cargado) VALUES (?, now())",
+                       [(tabla,) for tabla in cp.tablas_del_esquema() if not tabla.startswith("version_")])
+        db.execute(cp.SQL_VERSION_DATOS)
+        return db
+
+
+# Tipos de DuckDB -> OID de PostgreSQL, para que los resultados sigan el mismo
+# camino tipado (``data_handler.construir_dataframe``) que contra PostgreSQL
+OID_POSTGRES = {"BOOLEAN": 16, "BIGINT": 20, "SMALLINT": 21, "INTEGER": 23, "FLOAT": 700, "DOUBLE": 701,
+                "DECIMAL": 1700, "VARCHAR": 1043}
+
+
+class _CursorDuckDB:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    @property
+    def description(self):
+        return [
+            (d[0], OID_POSTGRES.get(str(d[1]).split("(")[0], d[1]), *d[2:])
+            for d in self._cursor.description
+        ]
+
+
+class CursorEmbebido:
+    """Reemplazo de ``data_handler.Cursor`` que usa un cursor del motor embebido por hilo."""
+
+    def __enter__(self):
+        self._cursor = MotorEmbebido.get_db().cursor()
+        return _CursorDuckDB(self._cursor)
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        self._cursor.close()
+
+
+# --- MEDICIONES ---
+
+def _cuantil(valores, q):
+    return float(pd.Series(valores).quantile(q)) if valores else None
+
+
+def resumir(tiempos: dict) -> dict:
+    return {
+        etapa: {
+            "n": len(valores),
+            "total": sum(valores),
+            "media": sum(valores) / len(valores),
+            "p50": _cuantil(valores, 0.5),
+            "p95": _cuantil(valores, 0.95),
+            "max": max(valores),
+        }
+        for etapa, valores in tiempos.items() if valores
+    }
+
+
+class Cronometro:
+    """Acumula duraciones por etapa y registra por qué se omitió una etapa."""
+
+    def __init__(self):
+        self.tiempos = {etapa: [] for etapa in ETAPAS}
+        self.omitidas = {}
+
+    def medir(self, etapa: str, funcion, *args, **kwargs):
+        if etapa in self.omitidas:
+            return None
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion(*args, **kwargs)
+        except Exception as e:
+            self.omitidas[etapa] = f"{type(e).__name__}: {e}"
+            return None
+        self.tiempos[etapa].append(time.perf_counter() - inicio)
+        return resultado
+
+
+def _renderizar_plantillas(nombre_informe: str, params: dict):
+    from data_handler import _preparar_informe
+
+    _, seleccion = _preparar_informe(nombre_informe, params, None, None)
+    for comp in seleccion.values():
+        if comp.get("plantilla_sql"):
+            params_comp = {k: params[k] for k in comp.get("parametros", []) if k in params}
+            Template(comp["plantilla_sql"]).render(params_comp)
+
+
+def _pivotear(componentes: dict):
+    from data_handler import tabla_pivot
+
+    for comp in componentes.values():
+        if comp.get("tipo_componente") == "TABLA":
+            comp["df"] = tabla_pivot(comp)
+            tabla_pivot(comp, render_gt=True)
+
+
+def _construir_figuras(componentes: dict) -> dict:
+    from figuras import _construir
+
+    return {
+        nombre: _construir(comp)
+        for nombre, comp in componentes.items()
+        if comp.get("tipo_componente") == "GRAFICO"
+    }
+
+
+def _renderizar_png(componentes: dict, figuras: dict):
+    from figuras import EXPORTACION_POR_DEFECTO
+
+    for nombre, figura in figuras.items():
+        comp = componentes[nombre]
+        if comp["resultado_sql"] is None or comp["resultado_sql"].empty:
+            comp["img"] = ""
+            continue
+        opciones = {**EXPORTACION_POR_DEFECTO, **comp["config"].get("exportacion", {})}
+        comp["img"] = figura.to_image(format="png", **opciones)
+
+
+def _escribir_pdf(provincia: str, data: dict, directorio: str):
+    from pdf_generator import ficha_provincial_pdf
+
+    ficha_provincial_pdf(provincia, data, os.path.join(directorio, "ficha.pdf"))
+
+
+def ejecutar(motor: str, repeticiones: int = 1, provincias: list = None, carga: bool = False) -> dict:
+    import data_handler
+
+    if motor == "embebido":
+        data_handler.Cursor = CursorEmbebido
+        MotorEmbebido.get_db()
+
+    cronometro = Cronometro()
+    if carga:
+        if motor != "postgres":
+            cronometro.omitidas["carga"] = "La carga solo se mide contra PostgreSQL"
+        else:
+            import constructor_postgres
+            cronometro.medir("carga", constructor_postgres.main)
+
+    provinciasDF = data_handler.get_provincias()
+    if provincias:
+        provinciasDF = provinciasDF[provinciasDF["id"].isin(provincias)]
+
+    por_provincia = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        for _ in range(repeticiones):
+            for _, fila in provinciasDF.iterrows():
+                params = {"provincia_id": int(fila["id"]), "provincia": fila["nombre_iso"], "anio": ANIO}
+                inicio = time.perf_counter()
+
+                cronometro.medir("plantillas", _renderizar_plantillas, "ficha_provincial", params)
+                data = cronometro.medir("consultas", data_handler.get_informe, "ficha_provincial", params)
+                if data is None:
+                    continue
+                cronometro.medir("pivot", _pivotear, data["componentes"])
+                figuras = cronometro.medir("figuras", _construir_figuras, data["componentes"]) or {}
+                cronometro.medir("png", _renderizar_png, data["componentes"], figuras)
+                if "png" in cronometro.omitidas:
+                    cronometro.omitidas.setdefault("pdf", "Sin imágenes PNG de los gráficos")
+                cronometro.medir("pdf", _escribir_pdf, fila["nombre_iso"], data, directorio)
+
+                por_provincia.setdefault(fila["nombre_iso"], []).append(time.perf_counter() - inicio)
+                print(f" {fila['nombre_iso']}: {por_provincia[fila['nombre_iso']][-1]:.3f} s")
+
+    return {
+        "meta": {
+            "commit": _commit_actual(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "motor": motor,
+            "repeticiones": repeticiones,
+            "provincias": len(provinciasDF),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+        },
+        "etapas": resumir(cronometro.tiempos),
+        "omitidas": cronometro.omitidas,
+        "por_provincia": {provincia: resumir({"total": t})["total"] for provincia, t in por_provincia.items()},
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def comparar(actual: dict, base: dict, umbral: float) -> list:
+    """
+    Compara el p50 de cada etapa contra una corrida base.
+
+    Returns:
+        Lista de regresiones ``(etapa, p50_base, p50_actual, variacion)``.
+    """
+    regresiones = []
+    for etapa, resumen in actual["etapas"].items():
+        anterior = base.get("etapas", {}).get(etapa)
+        if not anterior or not anterior.get("p50"):
+            continue
+        variacion = resumen["p50"] / anterior["p50"] - 1
+        if variacion > umbral and resumen["p50"] - anterior["p50"] > PISO_REGRESION:
+            regresiones.append((etapa, anterior["p50"], resumen["p50"], variacion))
+    return regresiones
+
+
+def imprimir(resultado: dict, base: dict = None):
+    print(f"\nMotor: {resultado['meta']['motor']} - commit {resultado['meta']['commit']} - "
+          f"{resultado['meta']['provincias']} provincias x {resultado['meta']['repeticiones']}")
+    print(f"{'Etapa':<12}{'n':>5}{'p50 (ms)':>12}{'p95 (ms)':>12}{'máx (ms)':>12}{'base p50':>12}")
+    for etapa in ETAPAS:
+        if etapa in resultado["etapas"]:
+            r = resultado["etapas"][etapa]
+            anterior = (base or {}).get("etapas", {}).get(etapa, {}).get("p50")
+            columna_base = f"{anterior * 1000:>12.1f}" if anterior else f"{'-':>12}"
+            print(f"{etapa:<12}{r['n']:>5}{r['p50'] * 1000:>12.1f}{r['p95'] * 1000:>12.1f}{r['max'] * 1000:>12.1f}{columna_base}")
+        elif etapa in resultado["omitidas"]:
+            print(f"{etapa:<12} omitida: {' '.join(resultado['omitidas'][etapa].split())[:90]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la ficha provincial.")
+    parser.add_argument("--motor", choices=["embebido", "postgres"], default="embebido")
+    parser.add_argument("--repeticiones", type=int, default=1)
+    parser.add_argument("--provincias", type=int, nargs="*", help="IDs de provincia (por defecto, todas)")
+    parser.add_argument("--carga", action="store_true", help="Mide también constructor_postgres.main")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de una corrida base contra la cual comparar")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento máximo tolerado del p50 (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    # Las consultas loguean en INFO: no se mezclan con la salida del benchmark
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    resultado = ejecutar(args.motor, args.repeticiones, args.provincias, args.carga)
+
+    base = None
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            base = json.load(f)
+    imprimir(resultado, base)
+
+    if args.salida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.salida}")
+
+    if base is not None:
+        regresiones = comparar(resultado, base, args.umbral)
+        for etapa, anterior, actual, variacion in regresiones:
+            print(f"REGRESIÓN en {etapa}: p50 {anterior * 1000:.1f} ms -> {actual * 1000:.1f} ms ({variacion:+.0%})")
+        if regresiones:
+            sys.exit(1)
+        print(f"\nSin regresiones por encima del {args.umbral:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
+import argparse
 import os
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
 import psycopg2
 import pandas as pd
 import io
 from psycopg2 import sql
+from datos_columnares import leer_fuente
 
 # --- CONFIGURACIÓN DE LA BASE DE DATOS ---
 DB_CONFIG = {
@@ -16,8 +22,9 @@ DB_CONFIG = {
 # --- CONFIGURACIÓN DE ARCHIVOS ---
 # Ruta al directorio que contiene los archivos CSV
 # Asume que la carpeta 'data' está en el mismo nivel que la carpeta del script
+# (DATA_DIR permite cargar otro directorio, p. ej. los datos de datos_sinteticos.py)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, 'data')
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, 'data'))
 
 # Mapeo de archivos a tablas
 ARCHIVOS_A_CARGAR = {
@@ -40,6 +47,134 @@ ARCHIVOS_A_CARGAR = {
     'proyectos_provincia_region_pais_renaprod.csv': 'proyectos_provincia_region_pais_renaprod',
 }
 
+# --- TERRITORIOS ---
+# Cada fuente escribe las provincias y regiones a su manera ('SANTA CRUZ', 'CORDOBA',
+# 'C.A.B.A.', 'Ciudad Autónoma de Buenos Aires'...). Al cargar, cada columna de
+# territorio se resuelve a los identificadores de ref_provincia (provincia_id) y
+# de las regiones COFECYT (region_id), y las plantillas filtran por esos enteros.
+
+# Regiones COFECYT con su identificador canónico
+REGIONES = {1: 'Centro', 2: 'Cuyo', 3: 'Metropolitana', 4: 'NEA', 5: 'NOA', 6: 'Patagonia'}
+
+# Grafías que no coinciden con ref_provincia aun normalizadas -> nombre en ref_provincia
+ALIAS_TERRITORIOS = {
+    'CABA': 'C.A.B.A.',
+    'Ciudad de Bs.As.': 'C.A.B.A.',
+    'Ciudad Autónoma de Buenos Aires': 'C.A.B.A.',
+    'Tierra del Fuego': 'Tierra del Fuego, Antártida e Islas del Atlántico Sur',
+}
+
+# Valores que no son un territorio (totales, sin dato, exportaciones sin origen):
+# quedan sin identificador y no se informan como no resueltos
+SIN_TERRITORIO = {'Total País', 'NA', 'Otro', 'Extranjero', 'Indeterminado', 'PC', 'Plataforma Continental'}
+
+# Columnas de territorio por tabla y qué contienen: 'provincia' -> provincia_id,
+# 'region' -> region_id, 'unidad' (provincia, región o país según nivel_agregacion)
+# -> provincia_id en las filas de provincia y region_id en las de región
+COLUMNAS_TERRITORIO = {
+    'ref_provincia': {'region_cofecyt': 'region'},
+    'inversion_id_ract_esid_provincia_region_pais': {'unidad_territorial': 'unidad'},
+    'indicadores_contexto_y_sicytar': {'provincia': 'unidad'},
+    'rrhh_sicytar_agregado_provincia_region_pais': {'unidad_territorial': 'unidad'},
+    'esid_inversion_sectores_provincia_region_pais': {'unidad_territorial': 'unidad'},
+    'expo_nivel_tecnologico_provincia_region_pais': {'unidad_territorial': 'unidad'},
+    'expo_por_provincia_top5': {'provincia': 'provincia'},
+    'expo_tecno_destino': {'cod_prov': 'provincia'},
+    'percepcion_final': {'unidad_territorial': 'unidad'},
+    'listado_unidades_de_id': {'provincia': 'provincia'},
+    'equipos_ssnn_provincia_region_pais': {'unidad_territorial': 'unidad'},
+    'inversion_y_articulos_por_investigador_provincia_region_pais': {'unidad_territorial': 'unidad'},
+    'proyectos_pfi': {'provincia': 'provincia', 'region_cofecyt': 'region'},
+    'productos_provincia_region_pais_renaprod': {'unidad_territorial': 'unidad'},
+    'patentes_desagregadas_ipc_provincia_region_pais': {'provincia': 'provincia'},
+    'proyectos_provincia_region_pais_renaprod': {'unidad_territorial': 'unidad'},
+}
+
+# Valores de territorio sin resolver de la última carga: (tabla, columna, valor) -> filas
+NO_RESUELTOS = Counter()
+
+
+def normalizar_territorio(nombre) -> str:
+    """Clave de comparación de un nombre de territorio: sin tildes ni puntuación, en mayúsculas."""
+    sin_tildes = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[.,]', ' ', sin_tildes).upper().split())
+
+
+@lru_cache(maxsize=None)
+def diccionario_territorios() -> tuple:
+    """
+    Diccionarios (provincias, regiones) de nombre normalizado -> identificador,
+    a partir de ref_provincia.csv, REGIONES y ALIAS_TERRITORIOS.
+    """
+    ref = leer_fuente('ref_provincia.csv')
+    provincias = {normalizar_territorio(fila.provincia): int(fila.provincia_id) for fila in ref.itertuples()}
+    for alias, nombre in ALIAS_TERRITORIOS.items():
+        provincias[normalizar_territorio(alias)] = provincias[normalizar_territorio(nombre)]
+    regiones = {normalizar_territorio(region): region_id for region_id, region in REGIONES.items()}
+    return provincias, regiones
+
+
+def resolver_territorios(df: pd.DataFrame, table_name: str) -> pd.DataFrame:
+    """
+    Agrega a ``df`` las columnas provincia_id/region_id de las columnas de
+    territorio de la tabla (COLUMNAS_TERRITORIO) y registra en NO_RESUELTOS los
+    valores que no se pudieron resolver.
+    """
+    provincias, regiones = diccionario_territorios()
+    sin_territorio = {normalizar_territorio(v) for v in SIN_TERRITORIO}
+    for columna, tipo in COLUMNAS_TERRITORIO.get(table_name, {}).items():
+        claves = df[columna].map(normalizar_territorio, na_action='ignore')
+        resueltas = pd.Series(False, index=df.index)
+        if tipo in ('provincia', 'unidad'):
+            df['provincia_id'] = claves.map(provincias).astype('Int64')
+            resueltas |= df['provincia_id'].notna()
+        if tipo in ('region', 'unidad'):
+            df['region_id'] = claves.map(regiones).astype('Int64')
+            resueltas |= df['region_id'].notna()
+
+        sin_resolver = df.loc[claves.notna() & ~resueltas & ~claves.isin(sin_territorio), columna]
+        for valor, filas in sin_resolver.value_counts().items():
+            NO_RESUELTOS[(table_name, columna, valor)] += filas
+    return df
+
+
+# --- AÑOS COMO COLUMNAS ---
+# Algunas fuentes traen un año por columna ('2021', '2022', ...). Se cargan en
+# formato largo (anio, valor) para que las plantillas filtren por anio como
+# cualquier otro valor y un año nuevo no requiera cambiar el esquema.
+COLUMNA_ANIO = re.compile(r'^\d{4}$')
+
+
+def a_formato_largo(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convierte las columnas de año de ``df`` en filas (anio, valor). Las celdas
+    vacías no generan fila. Si no hay columnas de año devuelve ``df`` sin cambios.
+    """
+    anios = [col for col in df.columns if COLUMNA_ANIO.match(str(col))]
+    if not anios:
+        return df
+    fijas = [col for col in df.columns if col not in anios]
+    largo = df.melt(id_vars=fijas, value_vars=anios, var_name='anio', value_name='valor').dropna(subset=['valor'])
+    largo['anio'] = largo['anio'].astype(int)
+    return largo[['anio', *fijas, 'valor']].reset_index(drop=True)
+
+
+def leer_datos(filename: str) -> pd.DataFrame:
+    """Lee un archivo de DATA_DIR (ver datos_columnares) en formato largo y con sus territorios ya resueltos."""
+    df = a_formato_largo(leer_fuente(filename))
+    return resolver_territorios(df, ARCHIVOS_A_CARGAR[filename])
+
+
+def reporte_territorios():
+    """Imprime los valores de territorio que no se pudieron resolver en la carga."""
+    if not NO_RESUELTOS:
+        print("Todos los territorios se resolvieron a un identificador.")
+        return
+    print(f"ADVERTENCIA: {len(NO_RESUELTOS)} valores de territorio sin resolver (agregar a ALIAS_TERRITORIOS):")
+    for (tabla, columna, valor), filas in sorted(NO_RESUELTOS.items()):
+        print(f" {tabla}.{columna}: '{valor}' ({filas} filas)")
+
+
 # --- DEFINICIÓN DEL ESQUEMA SQL (DDL) ---
 
 SQL_SCHEMA = """
@@ -48,7 +183,13 @@ rrhh_sicytar_agregado_provincia_region_pais, rrhh_ract_esid, esid_inversion_sect
 patentes_desagregadas_ipc_provincia_region_pais, proyectos_provincia_region_pais_renaprod,
 productos_provincia_region_pais_renaprod, expo_nivel_tecnologico_provincia_region_pais, expo_por_provincia_top5,
 expo_tecno_destino, percepcion_final, listado_unidades_de_id, equipos_ssnn_provincia_region_pais,
-inversion_y_articulos_por_investigador_provincia_region_pais, proyectos_pfi CASCADE;
+inversion_y_articulos_por_investigador_provincia_region_pais, proyectos_pfi, version_datos, version_tablas,
+patente, patente_solicitante, patente_ipc, patentes_provincia_anio, ref_region CASCADE;
+
+CREATE TABLE ref_region (
+    region_id INTEGER PRIMARY KEY,
+    region VARCHAR(100) NOT NULL
+);
 
 CREATE TABLE ref_provincia (
     provincia_id INTEGER PRIMARY KEY,
@@ -56,7 +197,8 @@ CREATE TABLE ref_provincia (
     codigo_indec VARCHAR(20),
     region_mincyt VARCHAR(100),
     region_iso VARCHAR(20),
-    region_cofecyt VARCHAR(100)
+    region_cofecyt VARCHAR(100),
+    region_id INTEGER
 );
 
 CREATE TABLE inversion_id_ract_esid_provincia_region_pais (
@@ -66,7 +208,9 @@ CREATE TABLE inversion_id_ract_esid_provincia_region_pais (
     unidad_territorial VARCHAR(100),
     tipo_institucion_ract VARCHAR(100),
     monto_inversion NUMERIC(20, 2),
-    monto_inversion_constante_2004 NUMERIC(20, 2)
+    monto_inversion_constante_2004 NUMERIC(20, 2),
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE indicadores_contexto_y_sicytar (
@@ -89,7 +233,9 @@ CREATE TABLE indicadores_contexto_y_sicytar (
     investigador INTEGER,
     otro_personal INTEGER,
     tasa_inv_millon_hab REAL,
-    tasa_inv_1000_pea REAL
+    tasa_inv_1000_pea REAL,
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE rrhh_sicytar_agregado_provincia_region_pais (
@@ -101,7 +247,9 @@ CREATE TABLE rrhh_sicytar_agregado_provincia_region_pais (
     es_conicet VARCHAR(10),
     sexo_descripcion VARCHAR(50),
     gran_area_experticia VARCHAR(100),
-    cant_personas INTEGER
+    cant_personas INTEGER,
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE rrhh_ract_esid (
@@ -121,7 +269,9 @@ CREATE TABLE esid_inversion_sectores_provincia_region_pais (
     unidad_territorial VARCHAR(100),
     sector_clae VARCHAR(255),
     monto_inversion NUMERIC(20, 2),
-    monto_inversion_constante_2004 NUMERIC(20, 2)
+    monto_inversion_constante_2004 NUMERIC(20, 2),
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE patentes_desagregadas_ipc_provincia_region_pais (
@@ -134,7 +284,8 @@ CREATE TABLE patentes_desagregadas_ipc_provincia_region_pais (
     renaorg_id VARCHAR(50),
     institucion VARCHAR(255),
     es_institucion_nacional BOOLEAN,
-    letra_ipc_descripcion VARCHAR(255)
+    letra_ipc_descripcion VARCHAR(255),
+    provincia_id INTEGER
 );
 
 CREATE TABLE proyectos_provincia_region_pais_renaprod (
@@ -151,7 +302,9 @@ CREATE TABLE proyectos_provincia_region_pais_renaprod (
     monto_financiado_adjudicado_prorrateado NUMERIC(20, 2),
     monto_total_adjudicado_prorrateado NUMERIC(20, 2),
     monto_financiado_adjudicado_constante_2004_prorrateado NUMERIC(20, 2),
-    monto_total_adjudicado_constante_2004_prorrateado NUMERIC(20, 2)
+    monto_total_adjudicado_constante_2004_prorrateado NUMERIC(20, 2),
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE productos_provincia_region_pais_renaprod (
@@ -162,7 +315,9 @@ CREATE TABLE productos_provincia_region_pais_renaprod (
     tipo_producto_cientifico VARCHAR(255),
     revista_sjr VARCHAR(255),
     gran_area VARCHAR(100),
-    nivel_agregacion VARCHAR(50)
+    nivel_agregacion VARCHAR(50),
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE expo_nivel_tecnologico_provincia_region_pais (
@@ -171,27 +326,32 @@ CREATE TABLE expo_nivel_tecnologico_provincia_region_pais (
     nivel_agregacion VARCHAR(50),
     unidad_territorial VARCHAR(100),
     "ITEnfoqueindustria" VARCHAR(100),
-    fob_millones_uss NUMERIC(20, 2)
+    fob_millones_uss NUMERIC(20, 2),
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
+-- El CSV trae un año por columna, se carga en formato largo (ver a_formato_largo)
 CREATE TABLE expo_por_provincia_top5 (
     id SERIAL PRIMARY KEY,
+    anio INTEGER,
     region_cofecyt VARCHAR(100),
     provincia VARCHAR(100),
     gran_rubro VARCHAR(255),
-    "2021" NUMERIC(20, 2),
-    "2022" NUMERIC(20, 2),
-    "2023" NUMERIC(20, 2),
-    "2024" NUMERIC(20, 2)
+    valor NUMERIC(20, 2),
+    provincia_id INTEGER
 );
 
+CREATE INDEX expo_por_provincia_top5_provincia_anio_idx ON expo_por_provincia_top5 (provincia_id, anio);
+
 CREATE TABLE expo_tecno_destino (
     id SERIAL PRIMARY KEY,
     anio INTEGER,
     cod_prov VARCHAR(100),
     intensidad_tecnologica BOOLEAN,
     pais_destino VARCHAR(100),
-    fob_millones_sum NUMERIC(20, 2)
+    fob_millones_sum NUMERIC(20, 2),
+    provincia_id INTEGER
 );
 
 CREATE TABLE percepcion_final (
@@ -201,14 +361,17 @@ CREATE TABLE percepcion_final (
     variable VARCHAR(255),
     nivel_agregacion VARCHAR(50),
     unidad_territorial VARCHAR(100),
-    valor REAL
+    valor REAL,
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE listado_unidades_de_id (
     organizacion_id INTEGER PRIMARY KEY,
     organizacion VARCHAR(255),
     nivel_1 VARCHAR(255),
-    provincia VARCHAR(100)
+    provincia VARCHAR(100),
+    provincia_id INTEGER
 );
 
 CREATE TABLE equipos_ssnn_provincia_region_pais (
@@ -216,7 +379,9 @@ CREATE TABLE equipos_ssnn_provincia_region_pais (
     unidad_territorial VARCHAR(100),
     sistema_nacional VARCHAR(255),
     cant_equipos INTEGER,
-    nivel_agregacion VARCHAR(50)
+    nivel_agregacion VARCHAR(50),
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE inversion_y_articulos_por_investigador_provincia_region_pais (
@@ -228,7 +393,9 @@ CREATE TABLE inversion_y_articulos_por_investigador_provincia_region_pais (
     cant_investigadores INTEGER,
     cant_articulos INTEGER,
     inversion_investigador NUMERIC(20, 2),
-    articulos_investigador REAL
+    articulos_investigador REAL,
+    provincia_id INTEGER,
+    region_id INTEGER
 );
 
 CREATE TABLE proyectos_pfi (
@@ -241,17 +408,217 @@ CREATE TABLE proyectos_pfi (
     sector VARCHAR(255),
     vertical VARCHAR(255),
     tecnologias TEXT,
-    vertical_tecnologia TEXT
+    vertical_tecnologia TEXT,
+    provincia_id INTEGER,
+    region_id INTEGER
+);
+
+-- Patentes normalizadas (se completan con SQL_DERIVADAS): el CSV trae una fila por
+-- patente x solicitante x letra IPC, con filas repetidas
+CREATE TABLE patente (
+    lens_id VARCHAR(255) PRIMARY KEY,
+    application_number VARCHAR(255),
+    anio INTEGER NOT NULL,
+    con_institucion_provincial BOOLEAN NOT NULL
+);
+
+CREATE TABLE patente_solicitante (
+    lens_id VARCHAR(255) NOT NULL REFERENCES patente (lens_id),
+    institucion VARCHAR(255),
+    provincia VARCHAR(100),
+    provincia_id INTEGER,
+    es_institucion_nacional BOOLEAN NOT NULL,
+    renaorg_id VARCHAR(50),
+    region_cofecyt VARCHAR(100)
 );
+
+CREATE TABLE patente_ipc (
+    lens_id VARCHAR(255) NOT NULL REFERENCES patente (lens_id),
+    letra_ipc_descripcion VARCHAR(255) NOT NULL,
+    PRIMARY KEY (lens_id, letra_ipc_descripcion)
+);
+
+-- Patentes solicitadas por instituciones provinciales (no nacionales) por provincia y año
+CREATE TABLE patentes_provincia_anio (
+    provincia_id INTEGER NOT NULL,
+    anio INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL,
+    PRIMARY KEY (provincia_id, anio)
+);
+
+CREATE INDEX patente_anio_idx ON patente (anio);
+CREATE INDEX patente_solicitante_provincia_idx ON patente_solicitante (provincia_id, lens_id);
+
+-- Una fila por carga: data_handler la usa como versión de los datos para invalidar sus cachés
+CREATE TABLE version_datos (
+    cargado TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Última carga de cada tabla: data_handler invalida solo lo que lee las tablas recargadas
+CREATE TABLE version_tablas (
+    tabla VARCHAR(100) PRIMARY KEY,
+    cargado TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+# Índices de los identificadores de territorio que agrega resolver_territorios
+SQL_INDICES_TERRITORIO = "\n".join(
+    f"CREATE INDEX ON {tabla} ({columna});"
+    for tabla, columnas in COLUMNAS_TERRITORIO.items()
+    for columna in sorted({'provincia_id' for t in columnas.values() if t in ('provincia', 'unidad')}
+                          | {'region_id' for t in columnas.values() if t in ('region', 'unidad')})
+)
+
+
+def tablas_del_esquema() -> dict:
+    """Columnas y tipos de cada tabla de ``SQL_SCHEMA``, en orden."""
+    tablas = {}
+    for sentencia in SQL_SCHEMA.split(";"):
+        m = re.search(r"CREATE TABLE (\w+) \((.*)\)", sentencia, re.S)
+        if not m:
+            continue
+        columnas = []
+        for linea in m.group(2).splitlines():
+            partes = linea.strip().rstrip(",").split()
+            if len(partes) >= 2 and not partes[0].isupper():
+                columnas.append((partes[0].strip('"'), partes[1].upper()))
+        tablas[m.group(1)] = columnas
+    return tablas
+
+
+# --- ESQUEMA ESTRELLA (opcional) ---
+# Con ESQUEMA_ESTRELLA=1 los textos largos y muy repetidos de las tablas de hechos
+# se guardan una sola vez en tablas de dimensión (dim_<columna>, clave SMALLINT) y
+# la tabla se carga como <tabla>_hechos con <columna>_id. Una vista con el nombre
+# original reconstruye las columnas, así que las plantillas de informes.yml no
+# cambian; al ser LEFT JOIN por clave primaria, PostgreSQL omite la dimensión en
+# las consultas que no usan la columna.
+ESQUEMA_ESTRELLA = os.getenv("ESQUEMA_ESTRELLA", "0") == "1"
+
+DIMENSIONES = {
+    'rrhh_sicytar_agregado_provincia_region_pais': ['tipo_personal_sicytar', 'gran_area_experticia'],
+    'esid_inversion_sectores_provincia_region_pais': ['sector_clae'],
+    'patentes_desagregadas_ipc_provincia_region_pais': ['letra_ipc_descripcion'],
+    'percepcion_final': ['indicador'],
+}
+
+# Valor -> clave de cada dimensión en la carga actual (una columna puede repetirse entre tablas)
+DICCIONARIOS = {}
+
+
+def tabla_hechos(table_name: str) -> str:
+    """Tabla donde se cargan los datos de ``table_name`` según el modo del esquema."""
+    return f"{table_name}_hechos" if ESQUEMA_ESTRELLA and table_name in DIMENSIONES else table_name
+
+
+def sql_esquema_estrella() -> str:
+    """DDL que convierte las tablas de DIMENSIONES en hechos + dimensiones + vista."""
+    esquema = tablas_del_esquema()
+    sentencias = []
+    for columna in sorted({c for columnas in DIMENSIONES.values() for c in columnas}):
+        sentencias.append(
+            f"CREATE TABLE dim_{columna} (\n    id SMALLINT PRIMARY KEY,\n    {columna} VARCHAR(255) NOT NULL UNIQUE\n);"
+        )
+    for tabla, columnas in DIMENSIONES.items():
+        sentencias.append(f"ALTER TABLE {tabla} RENAME TO {tabla}_hechos;")
+        sentencias += [f"ALTER TABLE {tabla}_hechos DROP COLUMN {columna};" for columna in columnas]
+        sentencias += [
+            f"ALTER TABLE {tabla}_hechos ADD COLUMN {columna}_id SMALLINT REFERENCES dim_{columna} (id);"
+            for columna in columnas
+        ]
+        # Las mismas columnas y en el mismo orden que la tabla original, sin las claves <columna>_id
+        seleccion = ", ".join(f"dim_{c}.{c}" if c in columnas else f"h.{c}" for c, _ in esquema[tabla])
+        sentencias.append(
+            f"CREATE VIEW {tabla} AS\nSELECT {seleccion}\n"
+            f"FROM {tabla}_hechos h\n"
+            + "\n".join(f"LEFT JOIN dim_{c} ON dim_{c}.id = h.{c}_id" for c in columnas) + ";"
+        )
+    return "\n".join(sentencias)
+
+
+# --- PARTICIONES POR AÑO (opcional) ---
+# Con PARTICIONAR_ANIO=1 las tablas de hechos más grandes, que las plantillas
+# siempre filtran por anio, se crean particionadas por rango de anio: una
+# partición por año (<tabla>_<anio>) más <tabla>_default para filas sin año.
+# Las consultas solo recorren las particiones de los años pedidos y un año se
+# puede recargar sin tocar los demás (python constructor_postgres.py --recargar).
+PARTICIONAR_ANIO = os.getenv("PARTICIONAR_ANIO", "0") == "1"
+
+TABLAS_PARTICIONADAS = {'expo_tecno_destino', 'rrhh_sicytar_agregado_provincia_region_pais'}
+
+
+def esquema_sql() -> str:
+    """SQL_SCHEMA, con las TABLAS_PARTICIONADAS particionadas por anio si PARTICIONAR_ANIO."""
+    if not PARTICIONAR_ANIO:
+        return SQL_SCHEMA
+    esquema = SQL_SCHEMA
+    for tabla in sorted(TABLAS_PARTICIONADAS):
+        # La clave primaria de una tabla particionada tendría que incluir anio, que
+        # admite nulos (van a la partición por defecto): id queda sin clave primaria
+        esquema = re.sub(
+            rf"(CREATE TABLE {tabla} \(\n    id SERIAL) PRIMARY KEY(,.*?\n\));",
+            rf"\1\2 PARTITION BY RANGE (anio);\n\n"
+            rf"CREATE TABLE {tabla}_default PARTITION OF {tabla} DEFAULT;",
+            esquema, count=1, flags=re.S
+        )
+    return esquema
+
+
+# Tablas que se calculan a partir de las cargadas, en este orden, después de la carga masiva
+SQL_DERIVADAS = """
+INSERT INTO ref_region (region_id, region)
+SELECT DISTINCT region_id, region_cofecyt FROM ref_provincia;
+
+INSERT INTO patente (lens_id, application_number, anio, con_institucion_provincial)
+SELECT lens_id, min(application_number), min(anio), COALESCE(bool_or(provincia <> 'NA'), FALSE)
+FROM patentes_desagregadas_ipc_provincia_region_pais
+GROUP BY lens_id;
+
+-- Un solicitante por patente, institución y provincia
+INSERT INTO patente_solicitante (lens_id, institucion, provincia, provincia_id, es_institucion_nacional, renaorg_id,
+                                 region_cofecyt)
+SELECT lens_id, institucion, provincia, provincia_id, es_institucion_nacional, min(renaorg_id), min(region_cofecyt)
+FROM patentes_desagregadas_ipc_provincia_region_pais
+GROUP BY lens_id, institucion, provincia, provincia_id, es_institucion_nacional;
+
+INSERT INTO patente_ipc (lens_id, letra_ipc_descripcion)
+SELECT DISTINCT lens_id, letra_ipc_descripcion
+FROM patentes_desagregadas_ipc_provincia_region_pais
+WHERE letra_ipc_descripcion IS NOT NULL;
+
+INSERT INTO patentes_provincia_anio (provincia_id, anio, cantidad)
+SELECT s.provincia_id, p.anio, COUNT(DISTINCT s.lens_id)
+FROM patente_solicitante s
+JOIN patente p ON p.lens_id = s.lens_id
+WHERE s.es_institucion_nacional = FALSE AND s.provincia_id IS NOT NULL
+GROUP BY s.provincia_id, p.anio;
 """
 
+# Registra la carga, en la misma transacción que los datos
+SQL_VERSION_DATOS = "INSERT INTO version_datos (cargado) VALUES (now());"
+SQL_VERSION_TABLA = """
+INSERT INTO version_tablas (tabla, cargado) VALUES (%s, now())
+ON CONFLICT (tabla) DO UPDATE SET cargado = EXCLUDED.cargado;
+"""
+
+
+def registrar_versiones(cur, tablas):
+    """Registra una nueva versión de los datos y de cada una de ``tablas``."""
+    for tabla in tablas:
+        cur.execute(SQL_VERSION_TABLA, (tabla,))
+    cur.execute(SQL_VERSION_DATOS)
+
 
 def create_schema(conn):
     """Crea el esquema de la base de datos ejecutando el DDL."""
     try:
         with conn.cursor() as cur:
             print("Creando el esquema de la base de datos...")
-            cur.execute(SQL_SCHEMA)
+            limpiar_esquema_estrella(cur)
+            cur.execute(esquema_sql())
+            cur.execute(SQL_INDICES_TERRITORIO)
+            if ESQUEMA_ESTRELLA:
+                cur.execute(sql_esquema_estrella())
             conn.commit()
             print("Esquema creado exitosamente.")
     except Exception as e:
@@ -260,6 +627,81 @@ def create_schema(conn):
         raise
 
 
+def limpiar_esquema_estrella(cur):
+    """
+    Elimina las vistas, tablas de hechos y dimensiones de una carga anterior en
+    modo estrella, para que SQL_SCHEMA pueda recrear las tablas en cualquier modo.
+    """
+    cur.execute(
+        "SELECT table_name FROM information_schema.views WHERE table_schema = current_schema() AND table_name = ANY(%s)",
+        (list(DIMENSIONES),)
+    )
+    for (vista,) in cur.fetchall():
+        cur.execute(sql.SQL("DROP VIEW {} CASCADE;").format(sql.Identifier(vista)))
+    tablas = [f"{tabla}_hechos" for tabla in DIMENSIONES]
+    tablas += sorted({f"dim_{columna}" for columnas in DIMENSIONES.values() for columna in columnas})
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS {} CASCADE;").format(sql.SQL(', ').join(map(sql.Identifier, tablas))))
+    DICCIONARIOS.clear()
+
+
+def codificar_dimensiones(cur, table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reemplaza las columnas de texto de ``table_name`` (DIMENSIONES) por su clave
+    en dim_<columna>, insertando en la dimensión los valores nuevos.
+    """
+    from psycopg2.extras import execute_values
+
+    for columna in DIMENSIONES[table_name]:
+        if columna not in DICCIONARIOS:
+            # Vacío en una carga completa; en una recarga parcial conserva las claves existentes
+            cur.execute(sql.SQL("SELECT {}, id FROM {}").format(sql.Identifier(columna), sql.Identifier(f"dim_{columna}")))
+            DICCIONARIOS[columna] = dict(cur.fetchall())
+        diccionario = DICCIONARIOS[columna]
+        nuevos = [valor for valor in df[columna].dropna().unique() if valor not in diccionario]
+        filas = [(len(diccionario) + i + 1, valor) for i, valor in enumerate(sorted(nuevos))]
+        if filas:
+            execute_values(cur, sql.SQL("INSERT INTO {} (id, {}) VALUES %s").format(
+                sql.Identifier(f"dim_{columna}"), sql.Identifier(columna)
+            ), filas)
+            diccionario.update((valor, clave) for clave, valor in filas)
+        df[f"{columna}_id"] = df[columna].map(diccionario).astype('Int16')
+        df = df.drop(columns=columna)
+    return df
+
+
+def reporte_dependientes(tablas):
+    """Imprime los componentes de informes.yml que leen ``tablas``: los que la aplicación deja de tomar de caché."""
+    from registro_informes import RegistroInformes
+
+    componentes = RegistroInformes.dependientes(tablas)
+    print(f"Componentes que leen {', '.join(tablas)} ({len(componentes)}): {', '.join(componentes) or 'ninguno'}")
+
+
+def reporte_tamanios(cur):
+    """
+    Imprime el tamaño en disco (datos e índices) de las tablas de DIMENSIONES y
+    sus dimensiones, y de las tablas particionadas sumando todas sus particiones.
+    """
+    tablas = [tabla_hechos(tabla) for tabla in DIMENSIONES]
+    if ESQUEMA_ESTRELLA:
+        tablas += sorted({f"dim_{columna}" for columnas in DIMENSIONES.values() for columna in columnas})
+    if PARTICIONAR_ANIO:
+        tablas += sorted({tabla_hechos(tabla) for tabla in TABLAS_PARTICIONADAS} - set(tablas))
+    # pg_table_size de una tabla particionada es 0: se suma sobre pg_partition_tree,
+    # que no devuelve filas para una tabla común (se usa la tabla misma)
+    cur.execute(
+        "SELECT c.relname, pg_size_pretty(sum(pg_table_size(COALESCE(p.relid, c.oid)))), "
+        "pg_size_pretty(sum(pg_indexes_size(COALESCE(p.relid, c.oid)))) "
+        "FROM pg_class c LEFT JOIN LATERAL pg_partition_tree(c.oid) p ON TRUE "
+        "WHERE c.relname = ANY(%s) AND c.relkind IN ('r', 'p') "
+        "GROUP BY c.relname ORDER BY c.relname",
+        (tablas,)
+    )
+    print("Tamaño de las tablas con dimensiones o particiones (datos / índices):")
+    for tabla, datos, indices in cur.fetchall():
+        print(f" {tabla}: {datos} / {indices}")
+
+
 def bulk_load_data(cur, table_name, df):
     """Carga datos en una tabla usando el método de alto rendimiento COPY."""
     # Limpia la tabla antes de la carga
@@ -267,16 +709,54 @@ def bulk_load_data(cur, table_name, df):
 
     # Prepara los datos en un buffer en memoria
     buffer = io.StringIO()
-    # Asegura que las columnas del DF coincidan con la tabla y maneja nulos
-    df.columns = [f'"{col}"' if col.isdigit() or col == 'ITEnfoqueindustria' else col for col in df.columns]
+    # Maneja nulos; las columnas se indican explícitamente en el COPY
     df.to_csv(buffer, index=False, header=False, sep=';', na_rep='\\N')
     buffer.seek(0)
 
-    # Ejecuta el comando COPY
-    copy_sql = sql.SQL("COPY {} FROM STDIN WITH (FORMAT CSV, DELIMITER ';', NULL '\\N')").format(sql.Identifier(table_name))
+    # Ejecuta el comando COPY, con las columnas del DF (las demás toman su valor por defecto)
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT CSV, DELIMITER ';', NULL '\\N')").format(
+        sql.Identifier(table_name), sql.SQL(', ').join(map(sql.Identifier, df.columns))
+    )
     cur.copy_expert(sql=copy_sql, file=buffer)
 
 
+def cargar_particiones(cur, table_name, df, anios=None):
+    """
+    Carga ``df`` en las particiones por año de ``table_name``, creando las que
+    falten. Cada partición se vacía y carga por separado; con ``anios`` solo se
+    tocan esas particiones (las filas de otros años se ignoran).
+    """
+    destino = tabla_hechos(table_name)
+    recarga_parcial = anios is not None
+    if anios is None:
+        anios = sorted(int(anio) for anio in df['anio'].dropna().unique())
+    for anio in anios:
+        particion = f"{table_name}_{anio}"
+        filas = df[df['anio'] == anio]
+        if filas.empty:
+            # Un año que ya no está en el CSV se vacía, pero no se crea una partición vacía
+            cur.execute("SELECT to_regclass(%s)", (particion,))
+            if cur.fetchone()[0] is None:
+                print(f" ADVERTENCIA: {table_name} no tiene filas de {anio}")
+                continue
+        cur.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM (%s) TO (%s);").format(
+            sql.Identifier(particion), sql.Identifier(destino)
+        ), (anio, anio + 1))
+        bulk_load_data(cur, particion, filas)
+    if not recarga_parcial:
+        bulk_load_data(cur, f"{table_name}_default", df[df['anio'].isna()])
+
+
+def cargar_tabla(cur, table_name, df, anios=None):
+    """Carga ``df`` en ``table_name`` según el modo del esquema (estrella y/o particionado)."""
+    if tabla_hechos(table_name) != table_name:
+        df = codificar_dimensiones(cur, table_name, df)
+    if PARTICIONAR_ANIO and table_name in TABLAS_PARTICIONADAS:
+        cargar_particiones(cur, table_name, df, anios)
+    else:
+        bulk_load_data(cur, tabla_hechos(table_name), df)
+
+
 def upsert_from_df(cur, df, table_name, conflict_column, update_columns):
     """
     Realiza un 'upsert' (INSERT ON CONFLICT UPDATE) desde un DataFrame de pandas.
@@ -295,8 +775,9 @@ def upsert_from_df(cur, df, table_name, conflict_column, update_columns):
 
     # Prepara los datos para la ejecución en bloque
     from psycopg2.extras import execute_values
-    # Reemplaza NaN de pandas por None, que psycopg2 traduce a NULL
-    data_tuples = [tuple(row) for row in df.replace({pd.NA: None, float('nan'): None}).itertuples(index=False)]
+    # Reemplaza NaN de pandas por None, que psycopg2 traduce a NULL. Como object, para que
+    # los enteros con nulos de la instantánea Parquet (Int32, ...) lleguen como int de Python
+    data_tuples = [tuple(row) for row in df.astype(object).where(df.notna(), None).itertuples(index=False)]
     execute_values(cur, insert_stmt, data_tuples)
 
 
@@ -305,9 +786,9 @@ def cargar_provincias(cur):
     filename = 'ref_provincia.csv'
     print(f"--- Procesando: {filename} (Carga Especial con Upsert) ---")
     try:
-        df = pd.read_csv(os.path.join(DATA_DIR, filename), sep=';')
+        df = leer_datos(filename)
         # Las columnas a actualizar si hay conflicto en 'provincia_id'
-        update_cols = ['provincia', 'codigo_indec', 'region_mincyt', 'region_iso', 'region_cofecyt']
+        update_cols = ['provincia', 'codigo_indec', 'region_mincyt', 'region_iso', 'region_cofecyt', 'region_id']
         upsert_from_df(cur, df, 'ref_provincia', 'provincia_id', update_cols)
         print(f" Se procesaron {len(df)} registros para ref_provincia.")
     except Exception as e:
@@ -319,7 +800,7 @@ def cargar_indicadores_contexto(cur):
     filename = 'indicadores_contexto_y_sicytar.csv'
     print(f"--- Procesando: {filename} (Carga Especial con Upsert) ---")
     try:
-        df = pd.read_csv(os.path.join(DATA_DIR, filename), sep=';')
+        df = leer_datos(filename)
         update_cols = [col for col in df.columns if col != 'id']
         upsert_from_df(cur, df, 'indicadores_contexto_y_sicytar', 'id', update_cols)
         print(f" Se procesaron {len(df)} registros para indicadores_contexto_y_sicytar.")
@@ -332,8 +813,8 @@ def cargar_unidadesID(cur):
     filename = 'listado_unidades_de_id.csv'
     print(f"--- Procesando: {filename} (Carga Especial con Upsert) ---")
     try:
-        df = pd.read_csv(os.path.join(DATA_DIR, filename), sep=';')
-        update_cols = ['organizacion', 'nivel_1', 'provincia']
+        df = leer_datos(filename)
+        update_cols = ['organizacion', 'nivel_1', 'provincia', 'provincia_id']
         upsert_from_df(cur, df, 'listado_unidades_de_id', 'organizacion_id', update_cols)
         print(f" Se procesaron {len(df)} registros para listado_unidades_de_id.")
     except Exception as e:
@@ -345,7 +826,7 @@ def cargar_proyectosPFI(cur):
     filename = 'proyectos_pfi.csv'
     print(f"--- Procesando: {filename} (Carga Especial con Upsert) ---")
     try:
-        df = pd.read_csv(os.path.join(DATA_DIR, filename), sep=';')
+        df = leer_datos(filename)
         update_cols = [col for col in df.columns if col != 'id_pfi']
         upsert_from_df(cur, df, 'proyectos_pfi', 'id_pfi', update_cols)
         print(f" Se procesaron {len(df)} registros para proyectos_pfi.")
@@ -364,6 +845,7 @@ def main():
 
         # 1. Crear el esquema
         create_schema(conn)
+        NO_RESUELTOS.clear()
 
         with conn.cursor() as cur:
             # 2. Cargas especiales con lógica de "upsert"
@@ -385,11 +867,10 @@ def main():
                 if filename in special_files:
                     continue  # Ya se cargaron
 
-                filepath = os.path.join(DATA_DIR, filename)
                 try:
                     print(f"Cargando datos para la tabla {table_name} desde {filename}...")
-                    df = pd.read_csv(filepath, sep=';')
-                    bulk_load_data(cur, table_name, df)
+                    df = leer_datos(filename)
+                    cargar_tabla(cur, table_name, df)
                     print(f" Se cargaron {len(df)} registros para {table_name}.")
 
                 except FileNotFoundError:
@@ -398,8 +879,16 @@ def main():
                     print(f"Ocurrió un error al cargar {table_name}: {e}")
                     raise  # Detenemos la ejecución si una carga masiva falla
 
+            # 4. Tablas derivadas
+            print("\n--- Calculando tablas derivadas ---")
+            cur.execute(SQL_DERIVADAS)
+
+            # El esquema se recreó completo: cambian todas las tablas
+            registrar_versiones(cur, [tabla for tabla in tablas_del_esquema() if not tabla.startswith('version_')])
             conn.commit()
             print("\n Proceso de construcción y carga de datos finalizado exitosamente.")
+            reporte_territorios()
+            reporte_tamanios(cur)
 
     except psycopg2.Error as e:
         print(f"Error de base de datos: {e}")
@@ -415,5 +904,43 @@ def main():
             print("🔌 Conexión a la base de datos cerrada.")
 
 
+def recargar_anios(table_name, anios):
+    """
+    Recarga desde su CSV solo las particiones de ``anios`` de una tabla
+    particionada, en una transacción, y registra una nueva versión de la tabla:
+    la aplicación solo invalida lo que depende de ella.
+    """
+    filename = next(archivo for archivo, tabla in ARCHIVOS_A_CARGAR.items() if tabla == table_name)
+    conn = None
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        with conn.cursor() as cur:
+            print(f"Recargando {table_name} para los años {', '.join(map(str, anios))}...")
+            df = leer_datos(filename)
+            cargar_tabla(cur, table_name, df, anios)
+            registrar_versiones(cur, [table_name])
+            conn.commit()
+            print(f" Se cargaron {int(df['anio'].isin(anios).sum())} registros.")
+            reporte_territorios()
+            reporte_dependientes([table_name])
+    except Exception as e:
+        print(f"Error al recargar {table_name}: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if conn is not None:
+            conn.close()
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Crea el esquema y carga los CSV en PostgreSQL.")
+    parser.add_argument("--recargar", choices=sorted(TABLAS_PARTICIONADAS), metavar="TABLA",
+                        help="Recarga solo los años indicados de una tabla particionada (requiere PARTICIONAR_ANIO=1)")
+    parser.add_argument("--anios", type=int, nargs="+", help="Años a recargar con --recargar")
+    args = parser.parse_args()
+    if args.recargar:
+        if not PARTICIONAR_ANIO or not args.anios:
+            parser.error("--recargar requiere PARTICIONAR_ANIO=1 y --anios")
+        recargar_anios(args.recargar, args.anios)
+    else:
+        main()
@@ -1,3 +1,7 @@
+import base64
+import os
+import re
+
 import streamlit as st
 
 
@@ -19,3 +23,39 @@ def load_css(path: str) -> str:
     except FileNotFoundError:
         st.warning("No se encontró el archivo icono-arg.css. Se aplicará solo el CSS personalizado.")
         return ""
+
+
+ICON_CSS = "static/iconos/dist/css/icono-arg-subset.css"
+
+_FONT_URL = re.compile(r'url\("app/static/([^"]+)"\)')
+
+
+@st.cache_data
+def load_icon_css(path: str = ICON_CSS) -> str:
+    """Load the icon CSS subset built by ``activos.py``.
+
+    The CSS only has the glyphs used by the pages and points to the subset font
+    served from ``app/static``. If static file serving is disabled the font is
+    inlined as a data URI instead (about 1 KB), so the icons still render.
+
+    Args:
+        path: Path to the subset CSS file.
+
+    Returns:
+        The CSS as a string, or an empty string if the subset was not built.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as css_file:
+            css = css_file.read()
+    except FileNotFoundError:
+        st.warning("No se encontró el CSS de iconos. Ejecute `python activos.py` para generarlo.")
+        return ""
+
+    if st.get_option("server.enableStaticServing"):
+        return css
+
+    def inline_font(match: re.Match) -> str:
+        with open(os.path.join("static", match.group(1)), "rb") as font_file:
+            return f'url("data:font/woff;base64,{base64.b64encode(font_file.read()).decode("ascii")}")'
+
+    return _FONT_URL.sub(inline_font, css)
@@ -5,71 +5,64 @@ Created on Sun Jun 25 22:11:18 2023
 @author: facun
 """
 import pandas as pd
-from typing import Union
 from jinja2 import Template
 import psycopg2
 from psycopg2 import pool
 import streamlit as st
-import streamlit_authenticator as stauth
-from streamlit_authenticator.utilities import LoginError
-import yaml
-from yaml import SafeLoader
-from copy import deepcopy
-from typing import Dict
-from great_tables import GT, style, loc
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import csv
+import io
 import logging
-from logging.handlers import RotatingFileHandler
 import os
 import textwrap
-from pathlib import Path
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from log_utils import LOGGER_SQL, configurar_logging
+from metricas import RegistroMetricas
+from registro_informes import ALCANCE_SOLICITUD, DIMENSIONES_COMPARABLES, RegistroInformes, alcance_parametros
 
-log_level_name = os.getenv("LOG_LEVEL", "INFO").upper()
-log_level = getattr(logging, log_level_name, logging.INFO)
+if TYPE_CHECKING:
+    from great_tables import GT
 
-handler = RotatingFileHandler(
-    "InformesApp-dh.log", maxBytes=5 * 1024 * 1024, backupCount=5
-)
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-handler.setFormatter(formatter)
-
-root_logger = logging.getLogger()
-root_logger.setLevel(log_level)
-root_logger.addHandler(handler)
+configurar_logging()
 logger = logging.getLogger(__name__)
+logger_sql = logging.getLogger(LOGGER_SQL)
 
 
 # Configuración de la conexión a la base de datos
 class Conexion:
-    __HOST = st.secrets["DB_HOST"]
-    __PORT = st.secrets["DB_PORT"]
-    __USER = st.secrets["DB_USER"]
-    __PASSWORD = st.secrets["DB_PASSWORD"]
-    __DB = st.secrets["DB_NAME"]
     __MIN_CONN = 1
     __MAX_CONN = 500
     _pool = None
+    _lock = threading.Lock()
 
     @classmethod
     def get_pool(cls):
         if cls._pool is None:
-            try:
-                cls._pool = pool.SimpleConnectionPool(
-                    cls.__MIN_CONN,
-                    cls.__MAX_CONN,
-                    host=cls.__HOST,
-                    port=cls.__PORT,
-                    user=cls.__USER,
-                    password=cls.__PASSWORD,
-                    database=cls.__DB
-                )
-
-                return cls._pool
-            except psycopg2.Error as e:
-                raise e
-            except Exception as e:
-                raise e
-        else:
-            return cls._pool
+            # Las consultas de un informe se ejecutan en paralelo: evita crear dos pools
+            with cls._lock:
+                if cls._pool is None:
+                    try:
+                        # Los secretos se leen al crear el pool y no al importar el módulo
+                        cls._pool = pool.ThreadedConnectionPool(
+                            cls.__MIN_CONN,
+                            cls.__MAX_CONN,
+                            host=st.secrets["DB_HOST"],
+                            port=st.secrets["DB_PORT"],
+                            user=st.secrets["DB_USER"],
+                            password=st.secrets["DB_PASSWORD"],
+                            database=st.secrets["DB_NAME"]
+                        )
+                    except psycopg2.Error as e:
+                        raise e
+                    except Exception as e:
+                        raise e
+        return cls._pool
 
     @classmethod
     def get_conn(cls):
@@ -80,6 +73,93 @@ class Conexion:
         cls.get_pool().putconn(conn)
 
 
+# Pool de hilos compartido para ejecutar en paralelo las consultas de un informe
+class EjecutorConsultas:
+    __MAX_WORKERS = int(os.getenv("DB_MAX_CONSULTAS", "8"))
+    _executor = None
+
+    @classmethod
+    def get_executor(cls):
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(max_workers=cls.__MAX_WORKERS, thread_name_prefix="consulta")
+        return cls._executor
+
+
+# Modo pipeline (DB_PIPELINE=1): las consultas de un informe se envían todas
+# juntas por una sola conexión de psycopg 3 (modo pipeline de libpq) en lugar de
+# repartirse entre varias conexiones del pool. Con latencia alta hacia la base, las
+# idas y vueltas de un informe se reducen a una y cada solicitud ocupa una sola
+# conexión. Requiere psycopg 3; sin él se usa la ejecución en paralelo.
+PIPELINE = os.getenv("DB_PIPELINE", "0") == "1"
+
+
+@lru_cache(maxsize=None)
+def modo_pipeline() -> bool:
+    """Si las consultas de los informes se ejecutan en modo pipeline."""
+    if not PIPELINE:
+        return False
+    import importlib.util
+    if importlib.util.find_spec("psycopg") is None:
+        logger.warning("DB_PIPELINE=1 requiere psycopg 3 (pip install psycopg); se ejecuta en paralelo.")
+        return False
+    return True
+
+
+# Conexiones de psycopg 3 para el modo pipeline: cada informe toma una sola y la devuelve al terminar
+class ConexionPipeline:
+    __MAX_CONN = int(os.getenv("DB_PIPELINE_MAX_CONN", "50"))
+    # Segundos que un informe espera una conexión libre antes de ejecutar sus consultas por separado
+    __ESPERA = float(os.getenv("DB_PIPELINE_ESPERA", "5"))
+    _libres = []
+    _cupos = threading.BoundedSemaphore(__MAX_CONN)
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_conn(cls):
+        """
+        Raises:
+            TimeoutError: Si las DB_PIPELINE_MAX_CONN conexiones siguen ocupadas
+                después de DB_PIPELINE_ESPERA segundos.
+        """
+        if not cls._cupos.acquire(timeout=cls.__ESPERA):
+            raise TimeoutError(f"No hay conexiones libres para el modo pipeline después de {cls.__ESPERA:g} s")
+        with cls._lock:
+            if cls._libres:
+                return cls._libres.pop()
+        try:
+            import psycopg
+
+            return psycopg.connect(
+                host=st.secrets["DB_HOST"],
+                port=st.secrets["DB_PORT"],
+                user=st.secrets["DB_USER"],
+                password=st.secrets["DB_PASSWORD"],
+                dbname=st.secrets["DB_NAME"],
+                autocommit=True,
+            )
+        except Exception:
+            cls._cupos.release()
+            raise
+
+    @classmethod
+    def free_conn(cls, conn):
+        from psycopg.pq import TransactionStatus
+
+        # Una transacción que quedó abierta o abortada se descarta antes de devolver la conexión
+        if not (conn.broken or conn.closed) and conn.info.transaction_status != TransactionStatus.IDLE:
+            try:
+                conn.rollback()
+            except Exception as e:
+                logger.warning(f"No se pudo revertir la conexión del modo pipeline: {e}")
+        # Una conexión rota o que no quedó libre no vuelve al pool
+        if conn.broken or conn.closed or conn.info.transaction_status != TransactionStatus.IDLE:
+            conn.close()
+        else:
+            with cls._lock:
+                cls._libres.append(conn)
+        cls._cupos.release()
+
+
 # This class provides a context manager for database operations
 class Cursor:
     def __init__(self):
@@ -95,7 +175,9 @@ class Cursor:
     def __exit__(self, exception_type, exception_value, exception_traceback):
         if exception_value:
             self._conn.rollback()
-            st.error('Ha ocurrido un error, la transacción ha sido cancelada.')
+            # En los hilos de EjecutorConsultas no hay página: el error llega al componente
+            if get_script_run_ctx(suppress_warning=True) is not None:
+                st.error('Ha ocurrido un error, la transacción ha sido cancelada.')
             logger.info(f'Detalles: {exception_type} /// {exception_value} /// {exception_traceback}')
         else:
             query = getattr(self._cursor, "query", None)
@@ -112,9 +194,134 @@ class Cursor:
         Conexion.free_conn(self._conn)
 
 
+# Versión de los datos cargados: la escribe constructor_postgres en ``version_datos``
+# al final de cada carga, y la de cada tabla cargada en ``version_tablas``
+class VersionDatos:
+    __TTL = float(os.getenv("DATOS_VERSION_TTL", "60"))
+    _version = None
+    _tablas = {}
+    _consultada = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def actual(cls) -> Optional[str]:
+        """
+        Versión vigente, consultada como mucho una vez cada ``DATOS_VERSION_TTL``
+        segundos. None si la base no tiene ``version_datos`` (carga anterior a
+        la tabla): en ese caso no se comparten resultados entre solicitudes.
+        Si cambió la versión de alguna tabla, descarta de ``CacheResultados``
+        los resultados que la leen.
+        """
+        with cls._lock:
+            ahora = time.monotonic()
+            if cls._consultada is not None and ahora - cls._consultada < cls.__TTL:
+                return cls._version
+            version, tablas = None, {}
+            with Cursor() as cursor:
+                # Los errores se manejan acá para que el Cursor no los muestre en la página
+                try:
+                    cursor.execute("SELECT CAST(max(cargado) AS VARCHAR) FROM version_datos;")
+                    fila = cursor.fetchone()
+                    version = fila[0] if fila else None
+                    cursor.execute("SELECT tabla, CAST(cargado AS VARCHAR) FROM version_tablas;")
+                    tablas = dict(cursor.fetchall())
+                except Exception as e:
+                    logger.warning(f"No se pudo obtener la versión de los datos: {e}")
+            if version != cls._version:
+                logger.info(f"Versión de los datos: {version}")
+            cambiadas = {t for t in tablas.keys() | cls._tablas.keys() if tablas.get(t) != cls._tablas.get(t)}
+            if cambiadas and cls._consultada is not None:
+                logger.info(f"Tablas recargadas: {', '.join(sorted(cambiadas))}")
+                CacheResultados.invalidar(cambiadas)
+            cls._version, cls._tablas, cls._consultada = version, tablas, ahora
+            return version
+
+    @classmethod
+    def de_tablas(cls, tablas: Iterable[str]) -> Optional[str]:
+        """
+        Versión de los datos que leen ``tablas``: la última carga de cada una (la
+        versión global para las que no la registran). Solo cambia cuando se
+        recarga alguna de ellas. None si no hay versión de los datos.
+        """
+        version = cls.actual()
+        if version is None:
+            return None
+        versiones = cls._tablas
+        return "|".join(versiones.get(tabla, version) for tabla in sorted(tablas)) or version
+
+
+# Resultados de los componentes que no dependen de la solicitud, compartidos por todo el proceso
+class CacheResultados:
+    __MAX_ENTRADAS = int(os.getenv("RESULTADOS_CACHE_MAX", "512"))
+    _entradas = OrderedDict()
+    _lock = threading.RLock()
+
+    @classmethod
+    def obtener(cls, version: str, tablas: Tuple[str, ...], clave: str, alcance: str, ejecutar) -> Future:
+        """
+        Futuro con el resultado de la consulta ``clave``, que lee ``tablas``, para
+        la versión ``version`` de esas tablas (``VersionDatos.de_tablas``). Si no
+        está, ``ejecutar()`` lanza la consulta y su futuro se guarda enseguida:
+        las solicitudes simultáneas esperan la misma ejecución. Un resultado de
+        otra versión se reemplaza, y una consulta fallida no queda guardada.
+        """
+        with cls._lock:
+            entrada = cls._entradas.get(clave)
+            vigente = entrada is not None and entrada[1] == version
+            RegistroMetricas.registrar_cache(f"resultados_{alcance}", vigente)
+            if vigente:
+                cls._entradas.move_to_end(clave)
+                return entrada[2]
+
+            futuro = ejecutar()
+            cls._entradas[clave] = (frozenset(tablas), version, futuro)
+            cls._entradas.move_to_end(clave)
+            while len(cls._entradas) > cls.__MAX_ENTRADAS:
+                cls._entradas.popitem(last=False)
+        futuro.add_done_callback(lambda f: cls._descartar_fallido(clave, f))
+        return futuro
+
+    @classmethod
+    def _descartar_fallido(cls, clave: str, futuro: Future):
+        # La consulta falló: el futuro tiene la excepción (o un DataFrame sin columnas)
+        if futuro.exception() is None and len(futuro.result().columns):
+            return
+        with cls._lock:
+            entrada = cls._entradas.get(clave)
+            if entrada is not None and entrada[2] is futuro:
+                del cls._entradas[clave]
+
+    @classmethod
+    def invalidar(cls, tablas: Iterable[str]):
+        """Descarta los resultados de las consultas que leen alguna de ``tablas``."""
+        tablas = set(tablas)
+        with cls._lock:
+            descartadas = [clave for clave, (leidas, _, _) in cls._entradas.items() if leidas & tablas]
+            for clave in descartadas:
+                del cls._entradas[clave]
+        logger.info(f"Resultados en caché invalidados: {len(descartadas)}")
+
+    @classmethod
+    def limpiar(cls):
+        with cls._lock:
+            cls._entradas.clear()
+
+
+def version_informe(nombre_informe: str) -> Optional[str]:
+    """Versión de las tablas que lee el informe: cambia solo si se recarga alguna de ellas."""
+    return VersionDatos.de_tablas(RegistroInformes.obtener(nombre_informe).tablas)
+
+
+@lru_cache(maxsize=4096)
+def _compilar_plantilla(value: str) -> Template:
+    return Template(value)
+
+
 def _render_str(value: str, params: dict) -> str:
+    if "{" not in value:
+        return value
     try:
-        return Template(value).render(params)
+        return _compilar_plantilla(value).render(params)
     except Exception:
         return value
 
@@ -133,6 +340,159 @@ def render_obj(obj, params):
     return obj
 
 
+# Tipos de PostgreSQL (OID de ``cursor.description``) -> dtype compacto del resultado
+DTYPES_POSTGRES = {
+    16: "bool",        # boolean
+    20: "int64",       # bigint
+    21: "int32",       # smallint
+    23: "int32",       # integer
+    700: "float64",    # real
+    701: "float64",    # double precision
+    1700: "float64",   # numeric (llega como decimal.Decimal)
+    19: "texto",       # name
+    25: "texto",       # text
+    1042: "texto",     # char
+    1043: "texto",     # varchar
+}
+
+# Las columnas de texto con pocos valores distintos se guardan como ``category``
+CATEGORIA_MIN_FILAS = 50
+CATEGORIA_MAX_PROPORCION = 0.5
+
+
+def _tipar_columnas(df: pd.DataFrame, description, categorias: bool = True) -> pd.DataFrame:
+    for i, desc in enumerate(description):
+        dtype = DTYPES_POSTGRES.get(desc[1])
+        columna = df.iloc[:, i]
+        if dtype is None or columna.empty:
+            continue
+        if dtype == "texto":
+            if categorias and not isinstance(columna.dtype, pd.CategoricalDtype):
+                distintos = columna.nunique()
+                if len(columna) >= CATEGORIA_MIN_FILAS and distintos <= len(columna) * CATEGORIA_MAX_PROPORCION:
+                    df.isetitem(i, columna.astype("category"))
+        elif columna.isna().any():
+            # Sin enteros ni booleanos con nulos: se representan como float con NaN
+            if dtype != "bool":
+                df.isetitem(i, pd.to_numeric(columna, errors="coerce").astype("float64"))
+        else:
+            df.isetitem(i, columna.astype(dtype))
+    return df
+
+
+def construir_dataframe(rows: list, description, categorias: bool = True) -> pd.DataFrame:
+    """
+    Arma el DataFrame de un resultado con dtypes compactos según el tipo de
+    cada columna en ``cursor.description``, en lugar de columnas ``object``
+    con ``Decimal`` y ``str`` por celda. Los tipos no mapeados se dejan a pandas.
+    """
+    df = pd.DataFrame(rows, columns=[desc[0] for desc in description])
+    return _tipar_columnas(df, description, categorias)
+
+
+# ---- Modos de lectura de resultados ----
+# Se elige según las filas que devolvió la última ejecución del mismo componente:
+# fetchall para resultados chicos, COPY ... TO STDOUT en CSV para los grandes
+# (sin una tupla de Python por fila) y cursor del lado del servidor, leído por
+# bloques, para los muy grandes.
+MODO_FETCHALL = "fetchall"
+MODO_COPY = "copy"
+MODO_CURSOR_SERVIDOR = "cursor_servidor"
+MODO_PIPELINE = "pipeline"
+COPY_MIN_FILAS = int(os.getenv("DB_COPY_MIN_FILAS", "5000"))
+CURSOR_SERVIDOR_MIN_FILAS = int(os.getenv("DB_CURSOR_SERVIDOR_MIN_FILAS", "500000"))
+CURSOR_SERVIDOR_ITERSIZE = int(os.getenv("DB_CURSOR_SERVIDOR_ITERSIZE", "50000"))
+
+# COPY no informa nombres ni tipos de las columnas: se toman de la última lectura
+# del mismo componente, ((nombre, OID), ...), para no ejecutar la consulta dos veces
+DESCRIPCIONES: Dict[str, Tuple[Tuple[str, int], ...]] = {}
+
+
+def _descripcion(description) -> Tuple[Tuple[str, int], ...]:
+    return tuple((desc[0], desc[1]) for desc in description)
+
+
+def modo_lectura(cursor, filas_esperadas: Optional[int],
+                 descripcion: Optional[Tuple[Tuple[str, int], ...]] = None) -> str:
+    """
+    Modo de lectura para ``filas_esperadas``, limitado a lo que soporta el cursor.
+    COPY se usa solo si se conoce ``descripcion`` y todos sus tipos están en
+    DTYPES_POSTGRES: fechas y otros tipos llegarían como texto, con dtypes
+    distintos de los de fetchall para el mismo componente.
+    """
+    if filas_esperadas is None or filas_esperadas < COPY_MIN_FILAS or not hasattr(cursor, "copy_expert"):
+        return MODO_FETCHALL
+    if filas_esperadas >= CURSOR_SERVIDOR_MIN_FILAS:
+        return MODO_CURSOR_SERVIDOR
+    if descripcion is None or any(tipo not in DTYPES_POSTGRES for _, tipo in descripcion):
+        return MODO_FETCHALL
+    return MODO_COPY
+
+
+def _leer_fetchall(cursor, sql_renderizado: str, descripcion=None) -> Tuple[pd.DataFrame, float, tuple]:
+    cursor.execute(sql_renderizado)
+    ejecutado = time.perf_counter()
+    return construir_dataframe(cursor.fetchall(), cursor.description), ejecutado, _descripcion(cursor.description)
+
+
+def _leer_copy(cursor, sql_renderizado: str, descripcion) -> Tuple[pd.DataFrame, float, tuple]:
+    consulta = sql_renderizado.strip().rstrip(";")
+    buffer = io.StringIO()
+    cursor.copy_expert(f"COPY ({consulta}) TO STDOUT WITH (FORMAT CSV, HEADER, NULL '\\N')", buffer)
+    ejecutado = time.perf_counter()
+    buffer.seek(0)
+
+    # Si la consulta cambió de columnas desde la lectura anterior, los tipos no sirven
+    columnas = next(csv.reader([buffer.readline()]), [])
+    if columnas != [nombre for nombre, _ in descripcion]:
+        logger.warning(f"Las columnas del resultado cambiaron ({columnas}), se vuelve a leer con fetchall.")
+        return _leer_fetchall(cursor, sql_renderizado)
+
+    df = pd.read_csv(
+        buffer,
+        header=None,
+        names=list(range(len(descripcion))),
+        # El texto se lee tal cual (sin inferir números ni "NA"), solo \N es NULL
+        dtype={i: str for i, (_, tipo) in enumerate(descripcion) if DTYPES_POSTGRES[tipo] == "texto"},
+        keep_default_na=False,
+        na_values=["\\N"],
+        float_precision="round_trip",
+    )
+    for i, (_, tipo) in enumerate(descripcion):
+        if DTYPES_POSTGRES[tipo] == "bool":
+            df.isetitem(i, df.iloc[:, i].map({"t": True, "f": False}))
+    df.columns = columnas
+    return _tipar_columnas(df, descripcion), ejecutado, descripcion
+
+
+def _leer_cursor_servidor(cursor, sql_renderizado: str, descripcion=None) -> Tuple[pd.DataFrame, float, tuple]:
+    # WITH HOLD: la conexión del pool trabaja en autocommit
+    servidor = cursor.connection.cursor(name=f"informe_{threading.get_ident()}_{time.monotonic_ns()}", withhold=True)
+    try:
+        servidor.itersize = CURSOR_SERVIDOR_ITERSIZE
+        servidor.execute(sql_renderizado)
+        ejecutado = time.perf_counter()
+        bloques = []
+        while True:
+            filas = servidor.fetchmany(CURSOR_SERVIDOR_ITERSIZE)
+            if not filas:
+                break
+            bloques.append(construir_dataframe(filas, servidor.description, categorias=False))
+        if not bloques:
+            return construir_dataframe([], servidor.description), ejecutado, _descripcion(servidor.description)
+        df = _tipar_columnas(pd.concat(bloques, ignore_index=True), servidor.description)
+        return df, ejecutado, _descripcion(servidor.description)
+    finally:
+        servidor.close()
+
+
+LECTORES = {
+    MODO_FETCHALL: _leer_fetchall,
+    MODO_COPY: _leer_copy,
+    MODO_CURSOR_SERVIDOR: _leer_cursor_servidor,
+}
+
+
 def insertar_saltos(cadena):
     if not isinstance(cadena, str):
         return cadena
@@ -161,7 +521,7 @@ def get_provincias():
             return pd.DataFrame(columns=["id", "provincia", "nombre_iso", "region"])
 
 
-def ejecutar_consulta_parametrizada(plantilla_sql: str, params: dict) -> pd.DataFrame:
+def ejecutar_consulta_parametrizada(plantilla_sql: str, params: dict, componente: Optional[str] = None) -> pd.DataFrame:
     """
     Toma una plantilla SQL y un diccionario de parámetros, la renderiza
     y ejecuta la consulta contra la base de datos, devolviendo un DataFrame de Pandas.
@@ -169,64 +529,394 @@ def ejecutar_consulta_parametrizada(plantilla_sql: str, params: dict) -> pd.Data
     Args:
         plantilla_sql: Un string con la consulta SQL que contiene placeholders de Jinja2.
         params: Un diccionario con los valores para reemplazar los placeholders.
+        componente: Nombre del componente que origina la consulta, para las métricas.
 
     Returns:
         Un DataFrame de Pandas con el resultado de la consulta.
         Retorna un DataFrame vacío si ocurre un error.
     """
-    logger.info("Iniciando ejecución de consulta parametrizada...")
+    logger.debug("Iniciando ejecución de consulta parametrizada...")
+
+    sql_renderizado = _renderizar_sql(plantilla_sql, params, componente)
+    if sql_renderizado is None:
+        return pd.DataFrame()
+    return _ejecutar_sql(sql_renderizado, componente)
 
-    # 1. Renderizado de la plantilla SQL con Jinja2 para inyectar los parámetros de forma segura
+
+def _renderizar_sql(plantilla_sql: str, params: dict, componente: Optional[str] = None) -> Optional[str]:
+    """Renderiza la plantilla; devuelve None (y lo registra) si falla."""
+    # Renderizado de la plantilla SQL con Jinja2 para inyectar los parámetros de forma segura
     try:
-        template = Template(plantilla_sql)
+        template = _compilar_plantilla(plantilla_sql)
         sql_renderizado = template.render(params)
-        logger.info(f"SQL Renderizado: \n{sql_renderizado}")
+        logger_sql.debug("SQL Renderizado (%s): \n%s", componente, sql_renderizado)
+        return sql_renderizado
     except Exception as e:
         logger.error(f"Error al renderizar la plantilla SQL con Jinja2: {e}")
-        return pd.DataFrame()
+        return None
 
-    # 3. Ejecución de la consulta usando Pandas y el motor de SQLAlchemy
+
+def _ejecutar_sql(sql_renderizado: str, componente: Optional[str] = None, propagar: bool = False) -> pd.DataFrame:
+    """
+    Ejecuta una consulta ya renderizada; devuelve un DataFrame vacío si falla.
+    Con ``propagar`` el error, ya registrado, se vuelve a lanzar para que llegue
+    por el futuro a quien espera el resultado.
+    """
+    # Ejecución de la consulta, con el modo de lectura según el tamaño esperado del resultado
+    inicio = time.perf_counter()
+    conectado = ejecutado = None
+    modo = MODO_FETCHALL
     try:
         with Cursor() as cursor:
-            cursor.execute(sql_renderizado)
-            rows = cursor.fetchall()
-            column_names = [desc[0] for desc in cursor.description]
-            df = pd.DataFrame(rows, columns=column_names)
-        logger.info(f"Consulta exitosa. Se obtuvieron {len(df)} filas y {len(df.columns)} columnas.")
+            conectado = time.perf_counter()
+            descripcion = DESCRIPCIONES.get(componente) if componente else None
+            modo = modo_lectura(cursor, RegistroMetricas.filas_recientes(componente), descripcion)
+            df, ejecutado, descripcion = LECTORES[modo](cursor, sql_renderizado, descripcion)
+            if componente:
+                DESCRIPCIONES[componente] = descripcion
+        leido = time.perf_counter()
+        medicion = RegistroMetricas.registrar_consulta(
+            componente, sql_renderizado,
+            espera_conexion=conectado - inicio,
+            ejecucion=ejecutado - conectado,
+            lectura=leido - ejecutado,
+            filas=len(df),
+            bytes_=int(df.memory_usage(deep=True).sum()),
+            modo=modo,
+        )
+        logger.info(f"Consulta exitosa. Se obtuvieron {len(df)} filas y {len(df.columns)} columnas "
+                    f"en {medicion['total']:.3f} s ({medicion['componente']}, {medicion['sql_hash']}, {modo}).")
         return df
     except Exception as e:
+        fin = time.perf_counter()
+        conectado = conectado or fin
+        ejecutado = ejecutado or fin
+        RegistroMetricas.registrar_consulta(
+            componente, sql_renderizado,
+            espera_conexion=conectado - inicio,
+            ejecucion=ejecutado - conectado,
+            lectura=fin - ejecutado,
+            filas=0,
+            bytes_=0,
+            modo=modo,
+            error=str(e),
+        )
         logger.error(f"Error al ejecutar la consulta SQL con Pandas: {e}")
+        if propagar:
+            raise
         return pd.DataFrame()
 
 
-@st.cache_data
-def _load_informes() -> Dict[str, object]:
-    with open("informes.yml", "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+def _ejecutar_pipeline(lote: List[Tuple[str, Optional[str], Future]]):
+    """
+    Ejecuta las consultas de ``lote`` (SQL, componente, futuro) por una sola
+    conexión en modo pipeline: se envían todas sin esperar cada respuesta y los
+    resultados se leen después, en orden, resolviendo el futuro de cada una.
+
+    Un error en el pipeline aborta las consultas que le siguen: esas, y la que
+    falló, se ejecutan de nuevo por separado con ``_ejecutar_sql``, que registra
+    el error como en la ejecución en paralelo. Lo mismo todo el lote si no hay
+    una conexión libre en ``DB_PIPELINE_ESPERA`` segundos.
+    """
+    inicio = time.perf_counter()
+    pendientes = list(lote)
+    try:
+        conn = ConexionPipeline.get_conn()
+    except Exception as e:
+        logger.warning(f"No se pudo abrir la conexión del modo pipeline, se ejecuta por separado: {e}")
+        conn = None
+
+    if conn is not None:
+        conectado = time.perf_counter()
+        try:
+            # Los cursores se cierran aunque falle la lectura de alguno
+            with ExitStack() as abiertos:
+                cursores = []
+                try:
+                    with conn.pipeline():
+                        for sql_renderizado, _, _ in lote:
+                            cursores.append(abiertos.enter_context(conn.cursor()))
+                            cursores[-1].execute(sql_renderizado)
+                except Exception as e:
+                    logger.warning(f"Error en el pipeline de consultas, se reintentan por separado: {e}")
+                ejecutado = time.perf_counter()
+
+                pendientes = []
+                for i, (sql_renderizado, componente, futuro) in enumerate(lote):
+                    leyendo = time.perf_counter()
+                    try:
+                        cursor = cursores[i]
+                        df = construir_dataframe(cursor.fetchall(), cursor.description)
+                    except Exception:
+                        pendientes.append((sql_renderizado, componente, futuro))
+                        continue
+                    RegistroMetricas.registrar_consulta(
+                        componente, sql_renderizado,
+                        espera_conexion=conectado - inicio,
+                        ejecucion=ejecutado - conectado,
+                        lectura=time.perf_counter() - leyendo,
+                        filas=len(df),
+                        bytes_=int(df.memory_usage(deep=True).sum()),
+                        modo=MODO_PIPELINE,
+                    )
+                    futuro.set_result(df)
+                logger.info(f"Pipeline de {len(lote)} consultas en {time.perf_counter() - inicio:.3f} s "
+                            f"({len(pendientes)} a reintentar).")
+        except Exception as e:
+            # Solo las consultas cuyo futuro sigue sin resolver
+            logger.error(f"Error al leer los resultados del pipeline: {e}")
+            pendientes = [consulta for consulta in lote if not consulta[2].done()]
+        finally:
+            ConexionPipeline.free_conn(conn)
+
+    for sql_renderizado, componente, futuro in pendientes:
+        try:
+            futuro.set_result(_ejecutar_sql(sql_renderizado, componente, propagar=True))
+        except Exception as e:
+            futuro.set_exception(e)
+
+
+def _preparar_informe(nombre_informe: str, params: Dict[str, object],
+                      componentes: Optional[Iterable[str]],
+                      orden: Optional[Tuple[int, int]]) -> Tuple[str, Dict[str, dict]]:
+    informe = RegistroInformes.obtener(nombre_informe)
+    seleccion = {
+        comp_nombre: comp.como_dict()
+        for comp_nombre, comp in informe.seleccionar(componentes, orden).items()
+    }
+    # render_obj devuelve copias: los componentes del registro no se modifican
+    return render_obj(informe.nombre, params), render_obj(seleccion, params)
+
+
+def _clave_consulta(sql_renderizado: str) -> str:
+    return sql_renderizado.strip().rstrip(";").strip()
+
+
+def _evaluar_informes(selecciones: Dict[str, Dict[str, dict]],
+                      params: Dict[str, object]) -> Iterator[Tuple[str, str, dict]]:
+    """
+    Ejecuta los componentes de uno o más informes. Las consultas que quedan
+    idénticas una vez renderizadas (componentes compartidos entre informes, o
+    repetidos dentro de uno) se ejecutan una sola vez y su resultado se asigna
+    a todos los componentes que la usan: el mismo DataFrame, que no debe
+    modificarse in situ.
+
+    Los componentes que no declaran parámetros propios de la solicitud (sin
+    parámetros, o solo ``anio``) toman su resultado de ``CacheResultados``:
+    se calcula una vez por versión de las tablas que lee (y por año) para todo
+    el proceso, no en cada selección.
+
+    En modo pipeline (``DB_PIPELINE=1``) las consultas que hay que ejecutar se
+    envían juntas por una sola conexión (``_ejecutar_pipeline``) en lugar de
+    repartirse entre los hilos de ``EjecutorConsultas``.
+
+    Las consultas corren fuera del hilo de la página, que no puede mostrar sus
+    errores: si una falla, sus componentes reciben un ``resultado_sql`` vacío y
+    el mensaje en ``error``, para que la página lo muestre.
+
+    Yields:
+        Tuplas ``(nombre_informe, nombre_componente, componente)`` en orden de finalización.
+    """
+    consultas = {}
+    inmediatos = []
+    for nombre_informe, seleccion in selecciones.items():
+        for comp_nombre, comp in seleccion.items():
+            plantilla = comp.pop("plantilla_sql", None)
+            tablas = tuple(comp.pop("tablas", ()))
+            if not plantilla:
+                inmediatos.append((nombre_informe, comp_nombre, comp))
+                continue
+            params_comp = {k: params[k] for k in comp.get("parametros", []) if k in params}
+            sql_renderizado = _renderizar_sql(plantilla, params_comp, comp_nombre)
+            if sql_renderizado is None:
+                comp["resultado_sql"] = pd.DataFrame()
+                inmediatos.append((nombre_informe, comp_nombre, comp))
+                continue
+            clave = _clave_consulta(sql_renderizado)
+            if clave not in consultas:
+                consultas[clave] = (sql_renderizado, alcance_parametros(comp.get("parametros")), tablas, [])
+            consumidores = consultas[clave][3]
+            RegistroMetricas.registrar_cache("consultas_compartidas", bool(consumidores))
+            consumidores.append((nombre_informe, comp_nombre, comp))
+
+    futuros = {}
+    # En modo pipeline las consultas a ejecutar se juntan y se envían juntas al final
+    lote = [] if modo_pipeline() else None
+    try:
+        for clave, (sql_renderizado, alcance, tablas, consumidores) in consultas.items():
+            # Las métricas de la consulta se registran a nombre del primer componente que la usa
+            def ejecutar(sql_renderizado=sql_renderizado, componente=consumidores[0][1]):
+                if lote is not None:
+                    lote.append((sql_renderizado, componente, Future()))
+                    return lote[-1][2]
+                return EjecutorConsultas.get_executor().submit(_ejecutar_sql, sql_renderizado, componente, True)
+
+            version = VersionDatos.de_tablas(tablas) if alcance != ALCANCE_SOLICITUD else None
+            if version is not None:
+                futuro = CacheResultados.obtener(version, tablas, clave, alcance, ejecutar)
+            else:
+                futuro = ejecutar()
+            futuros[futuro] = consumidores
+    finally:
+        # Aun si algo falló: otras solicitudes pueden estar esperando estos futuros desde CacheResultados
+        if lote:
+            EjecutorConsultas.get_executor().submit(_ejecutar_pipeline, lote)
+
+    yield from inmediatos
+    for futuro in as_completed(futuros):
+        error = futuro.exception()
+        resultado = futuro.result() if error is None else pd.DataFrame()
+        for nombre_informe, comp_nombre, comp in futuros[futuro]:
+            comp["resultado_sql"] = resultado
+            if error is not None:
+                comp["error"] = str(error)
+            yield nombre_informe, comp_nombre, comp
+
 
+def _evaluar_componentes(seleccion: Dict[str, dict], params: Dict[str, object]) -> Iterator[Tuple[str, dict]]:
+    for _, comp_nombre, comp in _evaluar_informes({"": seleccion}, params):
+        yield comp_nombre, comp
 
-def get_informe(nombre_informe: str, params: Dict[str, object]) -> Dict[str, object]:
-    data = _load_informes()
 
-    informes = data.get("informe")
-    if isinstance(informes, dict):
-        informes = [informes]
+def iter_informe(nombre_informe: str, params: Dict[str, object],
+                 componentes: Optional[Iterable[str]] = None,
+                 orden: Optional[Tuple[int, int]] = None) -> Iterator[Tuple[str, dict]]:
+    """
+    Igual que :func:`get_informe`, pero lanza todas las consultas en paralelo y
+    devuelve cada componente apenas termina la suya.
 
-    for informe in informes:
-        if informe.get("nombre") == nombre_informe:
-            informe_render = render_obj(deepcopy(informe), params)
-            resultado = {"nombre": informe_render["nombre"], "componentes": {}}
+    Yields:
+        Tuplas ``(nombre_componente, componente)`` en orden de finalización.
+    """
+    _, seleccion = _preparar_informe(nombre_informe, params, componentes, orden)
+    yield from _evaluar_componentes(seleccion, params)
 
-            for comp_nombre, comp in informe_render.get("componentes", {}).items():
-                params_comp = {k: params[k] for k in comp.get("parametros", []) if k in params}
-                plantilla = comp.pop("plantilla_sql", None)
-                if plantilla:
-                    df = ejecutar_consulta_parametrizada(plantilla, params_comp)
-                    comp["resultado_sql"] = df
-                resultado["componentes"][comp_nombre] = comp
-            return resultado
 
-    raise KeyError(f"Informe '{nombre_informe}' no encontrado")
+def get_informe(nombre_informe: str, params: Dict[str, object],
+                componentes: Optional[Iterable[str]] = None,
+                orden: Optional[Tuple[int, int]] = None) -> Dict[str, object]:
+    """
+    Renderiza y ejecuta los componentes de un informe.
+
+    Args:
+        nombre_informe: Nombre del informe definido en informes.yml.
+        params: Valores para los placeholders de las plantillas.
+        componentes: Nombres de los componentes a evaluar. Si es None se evalúan todos.
+        orden: Rango inclusivo (desde, hasta) sobre el campo ``orden`` de los componentes,
+            usado para cargar una sección de la ficha por separado.
+
+    Returns:
+        Un diccionario con el nombre del informe y sus componentes evaluados,
+        en el orden en que están definidos.
+    """
+    nombre, seleccion = _preparar_informe(nombre_informe, params, componentes, orden)
+    evaluados = dict(_evaluar_componentes(seleccion, params))
+    return {"nombre": nombre, "componentes": {comp_nombre: evaluados[comp_nombre] for comp_nombre in seleccion}}
+
+
+def get_informes(nombres_informes: Iterable[str], params: Dict[str, object],
+                 orden: Optional[Tuple[int, int]] = None) -> Dict[str, Dict[str, object]]:
+    """
+    Como :func:`get_informe` para varios informes a la vez. Las consultas
+    idénticas entre informes (componentes compartidos) se ejecutan una sola vez.
+
+    Returns:
+        Un diccionario ``{nombre_informe: informe}`` con la misma forma que
+        devuelve :func:`get_informe` para cada uno.
+    """
+    preparados = {
+        nombre_informe: _preparar_informe(nombre_informe, params, None, orden)
+        for nombre_informe in dict.fromkeys(nombres_informes)
+    }
+    evaluados = {}
+    for nombre_informe, comp_nombre, comp in _evaluar_informes(
+        {nombre_informe: seleccion for nombre_informe, (_, seleccion) in preparados.items()}, params
+    ):
+        evaluados[nombre_informe, comp_nombre] = comp
+    return {
+        nombre_informe: {
+            "nombre": nombre,
+            "componentes": {comp_nombre: evaluados[nombre_informe, comp_nombre] for comp_nombre in seleccion},
+        }
+        for nombre_informe, (nombre, seleccion) in preparados.items()
+    }
+
+
+# Columnas que agrega la comparación: valor y etiqueta del parámetro comparado
+COLUMNA_ID_COMPARACION = "comparacion_id"
+COLUMNA_COMPARACION = "comparacion"
+
+
+def sql_comparacion(plantilla_sql: str, parametro: str, params: Dict[str, object]) -> str:
+    """
+    Convierte la plantilla de un componente ``comparable`` en una única consulta
+    que devuelve el resultado para todos los valores de ``parametro``.
+
+    El parámetro se renderiza como la columna de la tabla que enumera sus
+    valores y la consulta original se evalúa como subconsulta LATERAL de esa
+    tabla: se conserva la semántica de cada valor por separado (LIMIT, ORDER BY,
+    agregados) en una sola ida a la base.
+    """
+    tabla, columna_id, columna_etiqueta = DIMENSIONES_COMPARABLES[parametro]
+    interna = _compilar_plantilla(plantilla_sql).render({**params, parametro: f"_comparacion.{columna_id}"})
+    interna = textwrap.indent(interna.strip().rstrip(";"), "    ")
+    return (
+        f"SELECT _resultado.*, _comparacion.{columna_id} AS {COLUMNA_ID_COMPARACION}, "
+        f"_comparacion.{columna_etiqueta} AS {COLUMNA_COMPARACION}\n"
+        f"FROM {tabla} AS _comparacion\n"
+        f"CROSS JOIN LATERAL (\n{interna}\n) AS _resultado"
+    )
+
+
+def get_comparacion(nombre_informe: str, comp_nombre: str, params: Dict[str, object]) -> dict:
+    """
+    Evalúa un componente ``comparable`` para todos los valores del parámetro
+    declarado (por ejemplo, todas las provincias) con una sola consulta.
+
+    Returns:
+        El componente renderizado, con ``resultado_sql`` que agrega las columnas
+        ``COLUMNA_ID_COMPARACION`` y ``COLUMNA_COMPARACION`` al final.
+    """
+    definicion = RegistroInformes.obtener(nombre_informe).componentes[comp_nombre]
+    if not definicion.comparable:
+        raise ValueError(f"El componente '{comp_nombre}' no declara un parámetro comparable")
+
+    params_comp = {k: params[k] for k in definicion.parametros if k in params and k != definicion.comparable}
+    comp = render_obj(definicion.como_dict(), params_comp)
+    comp.pop("plantilla_sql", None)
+    comp.pop("tablas", None)
+    try:
+        sql_renderizado = sql_comparacion(definicion.plantilla_sql, definicion.comparable, params_comp)
+    except Exception as e:
+        logger.error(f"Error al renderizar la comparación de {comp_nombre}: {e}")
+        comp["resultado_sql"] = pd.DataFrame()
+        return comp
+    logger_sql.debug("SQL Renderizado (%s): \n%s", comp_nombre, sql_renderizado)
+    comp["resultado_sql"] = _ejecutar_sql(sql_renderizado, f"{comp_nombre} (comparación)")
+    return comp
+
+
+def ranking_comparacion(componente: dict, columna: Optional[str] = None) -> pd.DataFrame:
+    """
+    Ordena de mayor a menor el resultado de :func:`get_comparacion`. Para un KPI
+    se usa su valor; para un gráfico, la suma de ``columna`` por valor comparado.
+
+    Returns:
+        DataFrame con las columnas ``posicion``, ``comparacion`` y ``valor``.
+    """
+    df = componente["resultado_sql"]
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["posicion", COLUMNA_COMPARACION, "valor"])
+    columna = columna or df.columns[0]
+    ranking = (
+        df.assign(valor=pd.to_numeric(df[columna], errors="coerce"))
+        .groupby(COLUMNA_COMPARACION, observed=True, as_index=False)["valor"]
+        .sum(min_count=1)
+        .sort_values("valor", ascending=False, na_position="last", kind="stable")
+        .reset_index(drop=True)
+    )
+    ranking.insert(0, "posicion", range(1, len(ranking) + 1))
+    return ranking
 
 
 def procesar_kpi(df: pd.DataFrame, config: dict) -> str:
@@ -255,7 +945,7 @@ def build_kpi(componentes: dict, key: str) -> dict:
     }
 
 
-def tabla_pivot(componente: dict, render_gt: bool = False) -> Union[pd.DataFrame, GT, None]:
+def tabla_pivot(componente: dict, render_gt: bool = False) -> Union[pd.DataFrame, "GT", None]:
     """
     Crea una tabla dinámica (pivot table) y la formatea con great_tables.
 
@@ -278,7 +968,8 @@ def tabla_pivot(componente: dict, render_gt: bool = False) -> Union[pd.DataFrame
                 index=pivot_config['index'],
                 columns=pivot_config['columns'],
                 values=pivot_config['values'],
-                aggfunc=pivot_config['aggfunc']
+                aggfunc=pivot_config['aggfunc'],
+                observed=True
             )
             .reset_index()
         )
@@ -290,12 +981,16 @@ def tabla_pivot(componente: dict, render_gt: bool = False) -> Union[pd.DataFrame
         tabla = df.pivot_table(
             columns=pivot_config['columns'],
             values=pivot_config['values'],
-            aggfunc=pivot_config['aggfunc']
+            aggfunc=pivot_config['aggfunc'],
+            observed=True
         )
         col_str = tabla.columns.tolist()
 
     # 3. Construcción del objeto GT con el formato deseado
     if render_gt:
+        # great_tables solo hace falta al dibujar: no se importa con el módulo
+        from great_tables import GT, loc, style
+
         try:
             gt = (
                 GT(tabla)
@@ -365,35 +1060,3 @@ def tabla_pivot(componente: dict, render_gt: bool = False) -> Union[pd.DataFrame
     else:
         return tabla
 
-
-def login():
-    credentials_path = Path(__file__).parent / ".streamlit" / "credentials.yaml"
-    with credentials_path.open("r", encoding="utf-8") as file:
-        config = yaml.load(file, Loader=SafeLoader)
-
-    authenticator = stauth.Authenticate(
-        config["credentials"],
-        config["cookie"]["name"],
-        config["cookie"]["key"],
-        config["cookie"]["expiry_days"],
-    )
-
-    try:
-        authenticator.login(fields={'Form name': 'Login', 'Username': 'Usuario', 'Password': 'Contraseña'}, location='main')
-    except LoginError as e:
-        st.error(e)
-
-    if st.session_state["authentication_status"]:
-        st.session_state["authenticator"] = authenticator
-        st.title(f"Bienvenido/a {st.session_state['name']}!")
-        st.subheader("◀️   Seleccione una opción del menú")
-        st.markdown('''---''')
-        st.title('📰 Novedades:')
-
-        authenticator.logout('Cerrar sesión', 'main')
-
-    elif "authentication_status" not in st.session_state:
-        st.warning('Por favor ingrese usuario y contraseña')
-
-    elif st.session_state["authentication_status"] is False:
-        st.error('Usuario/contraseña incorrectos')
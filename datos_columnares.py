@@ -0,0 +1,166 @@
+"""Instantánea columnar (Parquet) de los CSV de ``data/``.
+
+Cada carga de ``constructor_postgres`` y el motor embebido de ``benchmark.py``
+vuelven a parsear los CSV separados por ``;`` e infieren los tipos, con
+sorpresas: ``codigo_indec`` pierde los ceros a la izquierda, ``renaorg_id`` se
+lee como número y se guarda como ``'0.0'``. Este script convierte cada CSV de
+``ARCHIVOS_A_CARGAR`` en un Parquet comprimido junto al CSV
+(``data/<tabla>.parquet``), con los tipos de su tabla en ``SQL_SCHEMA``:
+
+- las columnas VARCHAR/TEXT se leen siempre como texto;
+- las columnas de año de las fuentes anchas (``'2021'``, ...) toman el tipo de
+  ``valor``, la columna en que se cargan;
+- si una columna entera del esquema trae decimales en el CSV se conserva como
+  decimal y se avisa, en lugar de truncar el valor.
+
+``leer_fuente`` es la API de lectura: usa el Parquet si existe y es más nuevo
+que el CSV, y si no lee el CSV con los mismos tipos de texto. Sin pyarrow
+instalado siempre lee el CSV.
+
+Hay que volver a ejecutarlo al actualizar los CSV (los Parquet viejos se
+ignoran, pero la lectura vuelve a ser la del CSV):
+
+    python datos_columnares.py
+"""
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow es opcional: sin él se leen los CSV
+    pa = None
+
+COMPRESION = "zstd"
+
+# Tipos de SQL_SCHEMA -> tipo de pyarrow (NUMERIC y REAL se leen como float64, como hasta ahora)
+TIPOS_SQL = {
+    "SMALLINT": "int16", "INTEGER": "int32", "SERIAL": "int32", "BIGINT": "int64",
+    "REAL": "float64", "NUMERIC": "float64", "BOOLEAN": "bool",
+    "VARCHAR": "string", "TEXT": "string", "DATE": "date32",
+}
+
+ENTEROS = {"int16", "int32", "int64"}
+
+
+def ruta_parquet(filename: str) -> str:
+    """Ruta de la instantánea de ``filename`` (un CSV de DATA_DIR)."""
+    import constructor_postgres as cp
+
+    return os.path.join(cp.DATA_DIR, os.path.splitext(filename)[0] + ".parquet")
+
+
+def tipos_fuente(filename: str, columnas: list) -> dict:
+    """Nombre del tipo de pyarrow de cada columna del CSV, según la tabla de destino en SQL_SCHEMA."""
+    import constructor_postgres as cp
+
+    tipos_tabla = dict(cp.tablas_del_esquema()[cp.ARCHIVOS_A_CARGAR[filename]])
+    tipos = {}
+    for columna in columnas:
+        tipo_sql = tipos_tabla.get(columna)
+        if tipo_sql is None and cp.COLUMNA_ANIO.match(columna):
+            tipo_sql = tipos_tabla.get("valor")
+        if tipo_sql is not None:
+            tipos[columna] = TIPOS_SQL[tipo_sql.split("(")[0]]
+    return tipos
+
+
+def _columnas_csv(ruta: str) -> list:
+    with open(ruta, encoding="utf-8") as archivo:
+        return archivo.readline().rstrip("\r\n").split(";")
+
+
+def convertir(filename: str) -> dict:
+    """
+    Escribe la instantánea Parquet de ``filename`` y devuelve filas, tamaños y
+    las columnas que no coinciden con el esquema.
+    """
+    from pyarrow import csv as pa_csv
+    from pyarrow import parquet as pq
+    import constructor_postgres as cp
+
+    ruta = os.path.join(cp.DATA_DIR, filename)
+    columnas = _columnas_csv(ruta)
+    tipos = tipos_fuente(filename, columnas)
+    # Las enteras se leen como decimales y se convierten después, para detectar las que no lo son
+    lectura = {columna: pa.float64() if tipo in ENTEROS else pa.type_for_alias(tipo) for columna, tipo in tipos.items()}
+    tabla = pa_csv.read_csv(
+        ruta,
+        parse_options=pa_csv.ParseOptions(delimiter=";"),
+        convert_options=pa_csv.ConvertOptions(column_types=lectura, strings_can_be_null=True),
+    )
+
+    avisos = [f"{columna}: no está en el esquema, tipo inferido" for columna in columnas if columna not in tipos]
+    for columna, tipo in tipos.items():
+        if tipo not in ENTEROS:
+            continue
+        indice = tabla.schema.get_field_index(columna)
+        try:
+            tabla = tabla.set_column(indice, columna, tabla.column(columna).cast(pa.type_for_alias(tipo)))
+        except pa.ArrowInvalid:
+            avisos.append(f"{columna}: declarada entera pero tiene decimales, se conserva como float64")
+
+    destino = ruta_parquet(filename)
+    pq.write_table(tabla, destino, compression=COMPRESION)
+    return {
+        "filas": tabla.num_rows,
+        "csv": os.path.getsize(ruta),
+        "parquet": os.path.getsize(destino),
+        "avisos": avisos,
+    }
+
+
+def instantanea_vigente(filename: str) -> bool:
+    """Si hay una instantánea de ``filename`` al menos tan nueva como el CSV."""
+    import constructor_postgres as cp
+
+    destino = ruta_parquet(filename)
+    return (
+        pa is not None
+        and os.path.exists(destino)
+        and os.path.getmtime(destino) >= os.path.getmtime(os.path.join(cp.DATA_DIR, filename))
+    )
+
+
+def leer_fuente(filename: str) -> pd.DataFrame:
+    """
+    Lee ``filename`` de DATA_DIR desde su instantánea Parquet si está vigente y
+    si no desde el CSV, con las columnas de texto del esquema siempre como texto.
+    """
+    import constructor_postgres as cp
+
+    if instantanea_vigente(filename):
+        from pyarrow import parquet as pq
+
+        # Enteros con nulos como Int64 y no float64, para que se escriban sin '.0'
+        return pq.read_table(ruta_parquet(filename)).to_pandas(types_mapper={
+            pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(), pa.int64(): pd.Int64Dtype(),
+        }.get)
+
+    ruta = os.path.join(cp.DATA_DIR, filename)
+    tipos = tipos_fuente(filename, _columnas_csv(ruta))
+    return pd.read_csv(ruta, sep=";", dtype={columna: str for columna, tipo in tipos.items() if tipo == "string"})
+
+
+def main():
+    import constructor_postgres as cp
+
+    if pa is None:
+        raise SystemExit("Se necesita pyarrow para generar las instantáneas (pip install pyarrow).")
+
+    total_csv = total_parquet = 0
+    for filename in cp.ARCHIVOS_A_CARGAR:
+        if not os.path.exists(os.path.join(cp.DATA_DIR, filename)):
+            continue
+        resultado = convertir(filename)
+        total_csv += resultado["csv"]
+        total_parquet += resultado["parquet"]
+        print(f" {filename}: {resultado['filas']} filas, {resultado['csv'] / 1024:.0f} KB -> "
+              f"{resultado['parquet'] / 1024:.0f} KB")
+        for aviso in resultado["avisos"]:
+            print(f"   ADVERTENCIA {aviso}")
+    print(f"Total: {total_csv / 1024:.0f} KB en CSV -> {total_parquet / 1024:.0f} KB en Parquet")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Generador de datos sintéticos para pruebas de capacidad.
+
+Reproduce las tablas de ``constructor_postgres.SQL_SCHEMA`` multiplicando la
+cantidad de filas por un factor (10×, 100×, 1000×) y escribe CSV con el mismo
+nombre y formato que los de ``data/``, de modo que pueden cargarse con
+``constructor_postgres`` (``DATA_DIR=<salida> python constructor_postgres.py``)
+o usarse con el motor embebido de ``benchmark.py``.
+
+Las cardinalidades se mantienen realistas: el conjunto de unidades
+territoriales, niveles de agregación y años no cambia, y lo que crece es la
+cantidad de filas de detalle por ``unidad_territorial``/``anio``:
+
+- Las columnas territoriales y temporales se copian de la fila original.
+- Las categorías de baja cardinalidad (tipo de personal, sector, etc.) se conservan.
+- Las de alta cardinalidad (países, instituciones, títulos) reciben valores
+  nuevos en cada réplica, generados con Faker si está instalado.
+- Los identificadores se renumeran para seguir siendo únicos.
+- Las medidas numéricas se perturban alrededor del valor original.
+
+Las tablas sin CSV en ``data/`` se generan a partir de su DDL.
+
+Uso:
+    python datos_sinteticos.py --factor 100 --salida data_x100
+"""
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import constructor_postgres as cp
+
+try:
+    from faker import Faker
+except ImportError:  # Faker es opcional: sin él se usan etiquetas numeradas
+    Faker = None
+
+# Tablas de referencia: una fila por provincia, no crecen con el volumen
+TABLAS_REFERENCIA = {"ref_provincia", "indicadores_contexto_y_sicytar", "expo_por_provincia_top5"}
+
+COLUMNAS_TERRITORIALES = {
+    "anio", "anio_inicio", "anio_publica", "nivel_agregacion", "unidad_territorial", "provincia",
+    "provincia_id", "cod_prov", "region_cofecyt", "region_mincyt", "region_iso",
+}
+
+# Columnas que identifican la fila y deben seguir siendo únicas tras replicar
+COLUMNAS_ID = {"id", "organizacion_id", "id_pfi", "lens_id", "application_number", "proyecto_id", "producto_id"}
+
+# Más valores distintos que esto: la columna crece con el factor
+UMBRAL_ALTA_CARDINALIDAD = 50
+
+FILAS_POR_GRUPO = 5
+ANIOS = range(2010, 2024)
+TAMANIO_BLOQUE = 200_000
+
+
+class Etiquetas:
+    """Valores nuevos para columnas de alta cardinalidad."""
+
+    def __init__(self, semilla: int):
+        self._faker = None
+        if Faker is not None:
+            self._faker = Faker("es_AR")
+            self._faker.seed_instance(semilla)
+
+    def generar(self, columna: str, base: pd.Series, replica: int) -> pd.Series:
+        """
+        Reemplaza cada valor distinto de ``base`` por uno nuevo, igual para todas
+        sus apariciones: cada réplica conserva la cardinalidad del original.
+        """
+        if self._faker is None:
+            return base.where(base.isna(), base.astype(str) + f" ({replica})")
+        if "pais" in columna:
+            nuevo = self._faker.country
+        elif "institucion" in columna or "organizacion" in columna:
+            nuevo = self._faker.company
+        else:
+            nuevo = self._faker.catch_phrase
+        return base.map({valor: f"{nuevo()} ({replica})" for valor in base.dropna().unique()})
+
+
+def _replicar(df: pd.DataFrame, replica: int, alta_cardinalidad: list, etiquetas: Etiquetas,
+              rng: np.random.Generator) -> pd.DataFrame:
+    if replica == 0:
+        return df
+    copia = df.copy()
+    for columna in copia.columns:
+        serie = copia[columna]
+        if columna in COLUMNAS_TERRITORIALES:
+            continue
+        if columna in COLUMNAS_ID:
+            if pd.api.types.is_numeric_dtype(serie):
+                copia[columna] = serie + replica * (int(serie.max()) + 1)
+            else:
+                copia[columna] = serie.astype(str) + f"-{replica}"
+        elif columna in alta_cardinalidad:
+            copia[columna] = etiquetas.generar(columna, serie, replica)
+        elif pd.api.types.is_float_dtype(serie):
+            copia[columna] = (serie * rng.uniform(0.8, 1.2, len(serie))).round(2)
+        elif pd.api.types.is_integer_dtype(serie) and not pd.api.types.is_bool_dtype(serie) and serie.nunique() > 2:
+            copia[columna] = np.maximum(0, np.rint(serie * rng.uniform(0.8, 1.2, len(serie)))).astype(serie.dtype)
+    return copia
+
+
+def escalar_csv(tabla: str, archivo: str, factor: int, salida: str, semilla: int) -> int:
+    """Replica ``factor`` veces las filas del CSV original, escribiendo por bloques."""
+    origen = os.path.join(cp.DATA_DIR, archivo)
+    destino = os.path.join(salida, archivo)
+    if tabla in TABLAS_REFERENCIA or factor <= 1:
+        shutil.copyfile(origen, destino)
+        return len(pd.read_csv(origen, sep=";"))
+
+    df = pd.read_csv(origen, sep=";")
+    alta_cardinalidad = [
+        c for c in df.columns
+        if c not in COLUMNAS_TERRITORIALES | COLUMNAS_ID
+        and df[c].dtype == object and df[c].nunique() > UMBRAL_ALTA_CARDINALIDAD
+    ]
+    etiquetas = Etiquetas(semilla)
+    rng = np.random.default_rng(semilla)
+
+    filas = 0
+    replicas_por_bloque = max(1, TAMANIO_BLOQUE // max(len(df), 1))
+    with open(destino, "w", encoding="utf-8", newline="") as f:
+        for inicio in range(0, factor, replicas_por_bloque):
+            bloque = pd.concat(
+                [_replicar(df, r, alta_cardinalidad, etiquetas, rng)
+                 for r in range(inicio, min(inicio + replicas_por_bloque, factor))],
+                ignore_index=True,
+            )
+            bloque.to_csv(f, sep=";", index=False, header=inicio == 0)
+            filas += len(bloque)
+    return filas
+
+
+def _unidades_territoriales() -> list:
+    provincias = pd.read_csv(os.path.join(cp.DATA_DIR, "ref_provincia.csv"), sep=";")
+    unidades = [("Provincia", p) for p in provincias["provincia"]]
+    unidades += [("Región", r) for r in provincias["region_cofecyt"].dropna().unique()]
+    unidades.append(("País", "Total País"))
+    return unidades
+
+
+def generar_desde_esquema(tabla: str, columnas: list, factor: int, salida: str, semilla: int) -> int:
+    """Genera una tabla sin CSV de origen: ``FILAS_POR_GRUPO * factor`` filas por unidad territorial y año."""
+    rng = np.random.default_rng(semilla)
+    grupos = [(nivel, unidad, anio) for nivel, unidad in _unidades_territoriales() for anio in ANIOS]
+    n = len(grupos) * FILAS_POR_GRUPO * factor
+    indice = np.repeat(np.arange(len(grupos)), FILAS_POR_GRUPO * factor)
+
+    datos = {}
+    for columna, tipo in columnas:
+        if columna == "nivel_agregacion":
+            datos[columna] = [grupos[i][0] for i in indice]
+        elif columna == "unidad_territorial":
+            datos[columna] = [grupos[i][1] for i in indice]
+        elif columna.startswith("anio"):
+            datos[columna] = [grupos[i][2] for i in indice]
+        elif columna == "id" or columna in COLUMNAS_ID:
+            datos[columna] = np.arange(1, n + 1)
+        elif columna == "revista_sjr":
+            datos[columna] = rng.choice(["Q1", "Q2", "Q3", "Q4", None], n)
+        elif tipo.startswith(("NUMERIC", "REAL", "DOUBLE")):
+            datos[columna] = rng.lognormal(3, 1.5, n).round(2)
+        elif tipo.startswith(("INTEGER", "BIGINT", "SMALLINT")):
+            datos[columna] = rng.integers(0, 1000, n)
+        elif tipo.startswith("BOOLEAN"):
+            datos[columna] = rng.integers(0, 2, n).astype(bool)
+        else:
+            # Categoría de baja cardinalidad: un puñado de valores por columna
+            categorias = [f"{columna.replace('_', ' ').capitalize()} {i}" for i in range(1, 9)]
+            datos[columna] = rng.choice(categorias, n)
+
+    df = pd.DataFrame(datos)
+    df.to_csv(os.path.join(salida, f"{tabla}.csv"), sep=";", index=False)
+    return len(df)
+
+
+def generar(factor: int, salida: str, semilla: int = 42):
+    os.makedirs(salida, exist_ok=True)
+    esquema = cp.tablas_del_esquema()
+    for archivo, tabla in cp.ARCHIVOS_A_CARGAR.items():
+        if os.path.exists(os.path.join(cp.DATA_DIR, archivo)):
+            filas = escalar_csv(tabla, archivo, factor, salida, semilla)
+        else:
+            filas = generar_desde_esquema(tabla, esquema[tabla], factor, salida, semilla)
+        print(f" {tabla}: {filas:,} filas".replace(",", "."))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos a escala a partir de data/ y SQL_SCHEMA.")
+    parser.add_argument("--factor", type=int, default=10, help="Multiplicador de filas (10, 100, 1000...)")
+    parser.add_argument("--salida", help="Directorio de salida (por defecto data_x<factor>)")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    salida = args.salida or os.path.join(cp.BASE_DIR, f"data_x{args.factor}")
+    print(f"Generando datos a escala {args.factor}x en {salida}" + ("" if Faker else " (sin Faker)"))
+    generar(args.factor, salida, args.semilla)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Cola de trabajos en segundo plano para exportar fichas a PDF.
+
+La generación de una ficha (render de los gráficos con Kaleido y escritura
+del PDF con fpdf2) tarda varios segundos. Para no bloquear el hilo del script
+de Streamlit, la exportación se encola en un pool de workers de tamaño acotado
+y la página consulta el estado del trabajo hasta que el archivo está listo.
+"""
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data_handler import tabla_pivot, version_informe
+from figuras import imagen_figura
+from metricas import RegistroMetricas
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = "output"
+
+ESTADO_PENDIENTE = "pendiente"
+ESTADO_EN_PROCESO = "en_proceso"
+ESTADO_COMPLETADO = "completado"
+ESTADO_ERROR = "error"
+
+
+class TrabajoExportacion:
+    """Estado de una exportación encolada."""
+
+    def __init__(self, clave: str, provincia: str, archivo: str):
+        self.clave = clave
+        self.provincia = provincia
+        self.archivo = archivo
+        self.estado = ESTADO_PENDIENTE
+        self.error = None
+        self.creado = time.time()
+        self.finalizado = None
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in (ESTADO_PENDIENTE, ESTADO_EN_PROCESO)
+
+
+class ColaExportacion:
+    __MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", "2"))
+    __MAX_PENDIENTES = int(os.getenv("PDF_MAX_PENDIENTES", "10"))
+    __TTL_ARCHIVO = int(os.getenv("PDF_TTL_SEGUNDOS", str(24 * 60 * 60)))
+    _executor = None
+    _trabajos = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=cls.__MAX_WORKERS, thread_name_prefix="exportacion-pdf"
+            )
+        return cls._executor
+
+    @classmethod
+    def _archivo_vigente(cls, archivo: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(archivo) < cls.__TTL_ARCHIVO
+        except OSError:
+            return False
+
+    @classmethod
+    def _purgar(cls):
+        """Olvida los trabajos y elimina los PDF (y temporales abandonados) de más de PDF_TTL_SEGUNDOS."""
+        limite = time.time() - cls.__TTL_ARCHIVO
+        for clave in [c for c, t in cls._trabajos.items() if t.finalizado and t.finalizado < limite]:
+            del cls._trabajos[clave]
+        for archivo in glob.glob(os.path.join(OUTPUT_DIR, "ficha_provincial_*.pdf*")):
+            try:
+                if os.path.getmtime(archivo) < limite:
+                    os.remove(archivo)
+            except OSError:
+                # Otro proceso lo eliminó o lo está reemplazando
+                pass
+
+    @classmethod
+    def obtener(cls, clave: str):
+        return cls._trabajos.get(clave)
+
+    @classmethod
+    def encolar(cls, clave: str, provincia: str, funcion, *args) -> TrabajoExportacion:
+        """
+        Encola ``funcion(*args, archivo)`` salvo que ya exista un trabajo
+        equivalente en curso o un PDF vigente generado para la misma clave.
+
+        Raises:
+            RuntimeError: Si la cola alcanzó el máximo de trabajos pendientes.
+        """
+        archivo = os.path.join(OUTPUT_DIR, f"ficha_provincial_{clave[:16]}.pdf")
+        with cls._lock:
+            cls._purgar()
+            trabajo = cls._trabajos.get(clave)
+            if trabajo is not None and trabajo.activo:
+                return trabajo
+
+            # Reutiliza el PDF generado por un pedido idéntico anterior
+            vigente = cls._archivo_vigente(archivo)
+            RegistroMetricas.registrar_cache("exportacion_pdf", vigente)
+            if vigente:
+                if trabajo is None or trabajo.estado != ESTADO_COMPLETADO:
+                    trabajo = TrabajoExportacion(clave, provincia, archivo)
+                    trabajo.estado = ESTADO_COMPLETADO
+                    trabajo.finalizado = os.path.getmtime(archivo)
+                    cls._trabajos[clave] = trabajo
+                return trabajo
+
+            pendientes = sum(1 for t in cls._trabajos.values() if t.activo)
+            if pendientes >= cls.__MAX_PENDIENTES:
+                raise RuntimeError("Hay demasiadas exportaciones en curso. Intente nuevamente en unos minutos.")
+
+            trabajo = TrabajoExportacion(clave, provincia, archivo)
+            cls._trabajos[clave] = trabajo
+            cls.get_executor().submit(cls._ejecutar, trabajo, funcion, args)
+            logger.info(f"Exportación encolada: {provincia} ({clave[:16]}). Trabajos activos: {pendientes + 1}")
+            return trabajo
+
+    @staticmethod
+    def _ejecutar(trabajo: TrabajoExportacion, funcion, args):
+        trabajo.estado = ESTADO_EN_PROCESO
+        inicio = time.perf_counter()
+        # Se escribe en un archivo temporal para que nunca se sirva un PDF a medio generar
+        temporal = f"{trabajo.archivo}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            funcion(*args, temporal)
+            os.replace(temporal, trabajo.archivo)
+            trabajo.estado = ESTADO_COMPLETADO
+            logger.info(f"Exportación finalizada: {trabajo.provincia} en {time.perf_counter() - inicio:.2f} s")
+        except Exception as e:
+            trabajo.error = str(e)
+            trabajo.estado = ESTADO_ERROR
+            logger.exception(f"Error al exportar la ficha de {trabajo.provincia}: {e}")
+            if os.path.exists(temporal):
+                os.remove(temporal)
+        finally:
+            trabajo.finalizado = time.time()
+
+
+def clave_exportacion(nombre_informe: str, params: dict) -> str:
+    """
+    Clave estable que identifica dos pedidos de exportación equivalentes: mismo
+    informe, mismos parámetros y misma versión de las tablas que lee el informe.
+    Recargar una tabla que el informe no lee no invalida los PDF generados.
+    """
+    contenido = json.dumps(
+        {"informe": nombre_informe, "params": params, "datos": version_informe(nombre_informe)},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def exportar_ficha_provincial(provincia: str, data: dict, filename: str):
+    """
+    Renderiza los gráficos y tablas de la ficha y escribe el PDF en ``filename``.
+
+    Args:
+        provincia: Nombre de la provincia para el título de la ficha.
+        data: Resultado de ``get_informe`` para la ficha provincial.
+        filename: Ruta del PDF a generar.
+    """
+    for nombre, componente in data["componentes"].items():
+        if componente.get("tipo_componente") == "TABLA":
+            componente["df"] = tabla_pivot(componente)
+        elif componente.get("tipo_componente") == "GRAFICO":
+            resultado = componente["resultado_sql"]
+            if resultado is None or resultado.empty:
+                componente["img"] = ""
+                continue
+            componente["img"] = imagen_figura(componente)
+
+    logger.info(f"Generación del diccionario de la ficha provincial completada: {provincia}")
+    # fpdf y las fuentes se cargan con la primera exportación, no con la página
+    from pdf_generator import ficha_provincial_pdf
+
+    ficha_provincial_pdf(provincia, data, filename)
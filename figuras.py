@@ -0,0 +1,170 @@
+"""Construcción de las figuras de Plotly de los componentes de tipo GRAFICO.
+
+Las figuras se arman a partir de ``tipo_grafico`` y ``config`` del componente
+(ver informes.yml) y se memoizan por huella del resultado SQL más la
+configuración, de modo que los reruns de Streamlit y la exportación a PDF
+reutilizan la misma figura (y la misma imagen PNG) mientras los datos no cambien.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from typing import TYPE_CHECKING
+
+import pandas as pd
+
+from data_handler import COLUMNA_COMPARACION, insertar_saltos
+from metricas import RegistroMetricas
+
+if TYPE_CHECKING:
+    from plotly.graph_objects import Figure
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_POR_DEFECTO = "seaborn"
+
+# Tamaño de la imagen exportada al PDF salvo que el componente declare ``config.exportacion``
+EXPORTACION_POR_DEFECTO = {"width": 1080, "height": None, "scale": 2}
+
+# Función de plotly.express y argumentos fijos por ``tipo_grafico``. plotly se
+# importa recién al construir la primera figura
+CONSTRUCTORES = {
+    "barh": ("bar", {"orientation": "h"}),
+    "bar": ("bar", {}),
+    "line": ("line", {}),
+    "pie": ("pie", {}),
+    "treemap": ("treemap", {}),
+}
+
+# Tipos de gráfico que admiten una faceta por valor comparado (el treemap no)
+TIPOS_COMPARABLES = ("barh", "bar", "line", "pie")
+ALTO_FACETA = 260
+
+
+class CacheFiguras:
+    """Cache LRU acotada y segura entre hilos, compartida por todas las sesiones."""
+
+    __MAX_ENTRADAS = int(os.getenv("FIGURAS_CACHE_MAX", "256"))
+
+    def __init__(self, nombre: str):
+        self._nombre = nombre
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str, construir):
+        with self._lock:
+            if clave in self._entradas:
+                self._entradas.move_to_end(clave)
+                RegistroMetricas.registrar_cache(self._nombre, True)
+                return self._entradas[clave]
+        RegistroMetricas.registrar_cache(self._nombre, False)
+
+        valor = construir()
+        with self._lock:
+            self._entradas[clave] = valor
+            while len(self._entradas) > self.__MAX_ENTRADAS:
+                self._entradas.popitem(last=False)
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+_figuras = CacheFiguras("figuras")
+_imagenes = CacheFiguras("imagenes")
+
+
+def huella_componente(componente: dict) -> str:
+    """
+    Huella del componente: nombre, tipo de gráfico, configuración y contenido
+    del resultado SQL. Dos componentes con la misma huella producen la misma figura.
+    """
+    h = hashlib.sha1()
+    definicion = {k: componente.get(k) for k in ("nombre", "tipo_grafico", "config")}
+    h.update(json.dumps(definicion, sort_keys=True, default=str).encode("utf-8"))
+
+    df = componente.get("resultado_sql")
+    if df is not None:
+        h.update(json.dumps([list(map(str, df.columns)), list(map(str, df.dtypes))]).encode("utf-8"))
+        try:
+            h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+        except TypeError:
+            # Celdas no hasheables (listas, dicts): se recurre a la serialización
+            h.update(df.to_json(orient="split", date_format="iso").encode("utf-8"))
+    return h.hexdigest()
+
+
+def _construir(componente: dict, **extra) -> "Figure":
+    config = componente["config"]
+    tipo = componente.get("tipo_grafico")
+    if tipo not in CONSTRUCTORES:
+        raise ValueError(f"Tipo de gráfico no soportado en '{componente.get('nombre')}': {tipo}")
+
+    df = componente["resultado_sql"]
+    if config.get("saltos_linea"):
+        df = df.copy()
+        df.isetitem(0, df.iloc[:, 0].astype(object).apply(insertar_saltos))
+
+    import plotly.express as px
+
+    funcion, fijos = CONSTRUCTORES[tipo]
+    fig = getattr(px, funcion)(
+        **fijos,
+        data_frame=df,
+        title=componente["nombre"] if config.get("mostrar_titulo", True) else None,
+        template=config.get("template", TEMPLATE_POR_DEFECTO),
+        **{**config.get("plot_mapping", {}), **extra},
+    )
+    if config.get("traces"):
+        fig.update_traces(config["traces"])
+    if config.get("layout"):
+        fig.update_layout(config["layout"])
+    return fig
+
+
+def construir_figura(componente: dict) -> "Figure":
+    """
+    Devuelve la figura de Plotly de un componente GRAFICO ya evaluado.
+
+    La figura se comparte entre reruns y sesiones: no debe modificarse in situ.
+    """
+    return _figuras.obtener(huella_componente(componente), lambda: _construir(componente))
+
+
+def construir_figura_comparacion(componente: dict, columnas: int = 4) -> "Figure":
+    """
+    Small multiples del resultado de ``data_handler.get_comparacion``: el
+    gráfico del componente con una faceta por valor comparado, en orden
+    alfabético y con ejes compartidos.
+    """
+    def construir():
+        etiquetas = sorted(componente["resultado_sql"][COLUMNA_COMPARACION].dropna().astype(str).unique())
+        filas = max(1, -(-len(etiquetas) // columnas))
+        orden = {**componente["config"].get("plot_mapping", {}).get("category_orders", {}), COLUMNA_COMPARACION: etiquetas}
+        fig = _construir(
+            componente,
+            facet_col=COLUMNA_COMPARACION,
+            facet_col_wrap=columnas,
+            facet_row_spacing=min(0.04, 1 / filas),
+            category_orders=orden,
+        )
+        fig.for_each_annotation(lambda a: a.update(text=a.text.split("=", 1)[-1]))
+        fig.update_layout(height=ALTO_FACETA * filas)
+        return fig
+
+    return _figuras.obtener(f"{huella_componente(componente)}:comparacion:{columnas}", construir)
+
+
+def imagen_figura(componente: dict) -> bytes:
+    """Devuelve el PNG de la figura del componente con el tamaño de ``config.exportacion``."""
+    opciones = {**EXPORTACION_POR_DEFECTO, **componente["config"].get("exportacion", {})}
+
+    def renderizar():
+        logger.debug(f"Renderizando imagen de '{componente['nombre']}'")
+        return construir_figura(componente).to_image(format="png", validate=True, **opciones)
+
+    return _imagenes.obtener(huella_componente(componente), renderizar)
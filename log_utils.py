@@ -0,0 +1,70 @@
+"""Configuración del logging de la aplicación.
+
+Los registros se encolan desde los hilos que atienden las sesiones y un único
+hilo (``QueueListener``) los escribe en el archivo rotativo, de modo que las
+consultas no esperan por la E/S del log. La configuración se instala una sola
+vez por proceso aunque Streamlit vuelva a ejecutar los módulos que la llaman.
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_ARCHIVO = "InformesApp-dh.log"
+LOG_FORMATO = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Logger de la salida de depuración por consulta (SQL renderizado), muestreada
+LOGGER_SQL = "data_handler.sql"
+
+_MARCA = "_informesapp_queue_handler"
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Deja pasar una fracción ``tasa`` de los registros por debajo de WARNING.
+    Las advertencias y errores se registran siempre.
+    """
+
+    def __init__(self, tasa: float):
+        super().__init__()
+        self.tasa = tasa
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.tasa
+
+
+def configurar_logging(archivo: str = LOG_ARCHIVO) -> logging.Logger:
+    """
+    Instala en el logger raíz un ``QueueHandler`` atendido por un ``QueueListener``
+    que escribe en un ``RotatingFileHandler``. Si ya está instalado no hace nada.
+
+    Variables de entorno:
+        LOG_LEVEL: Nivel del logger raíz (INFO por defecto).
+        LOG_SQL_MUESTREO: Fracción de consultas cuyo SQL renderizado se registra
+            en DEBUG (0.1 por defecto).
+    """
+    root_logger = logging.getLogger()
+    log_level_name = os.getenv("LOG_LEVEL", "INFO").upper()
+    root_logger.setLevel(getattr(logging, log_level_name, logging.INFO))
+
+    if any(getattr(h, _MARCA, False) for h in root_logger.handlers):
+        return root_logger
+
+    handler = RotatingFileHandler(archivo, maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
+    handler.setFormatter(logging.Formatter(LOG_FORMATO))
+
+    cola = queue.SimpleQueue()
+    queue_handler = QueueHandler(cola)
+    setattr(queue_handler, _MARCA, True)
+    listener = QueueListener(cola, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root_logger.addHandler(queue_handler)
+
+    logger_sql = logging.getLogger(LOGGER_SQL)
+    if not any(isinstance(f, FiltroMuestreo) for f in logger_sql.filters):
+        logger_sql.addFilter(FiltroMuestreo(float(os.getenv("LOG_SQL_MUESTREO", "0.1"))))
+    return root_logger
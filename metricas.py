@@ -0,0 +1,209 @@
+"""Registro de métricas de las consultas y cachés de la aplicación.
+
+Cada consulta que ejecuta ``data_handler`` registra una medición
+con el componente, la huella del SQL renderizado, los tiempos de espera de
+conexión, ejecución y lectura, y la cantidad de filas y bytes obtenidos. Las
+cachés registran aciertos y fallos. El registro es compartido por todo el
+proceso y puede exportarse en formato de texto de Prometheus o como JSONL.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+# Logger que escribe las mediciones en METRICAS_ARCHIVO (no propaga al log de la aplicación)
+LOGGER_METRICAS = "metricas.archivo"
+
+ETAPAS = ("espera_conexion", "ejecucion", "lectura", "total")
+CUANTILES = (0.5, 0.95, 0.99)
+
+
+def huella_sql(sql: str) -> str:
+    """Huella corta del SQL renderizado, para agrupar ejecuciones de la misma consulta."""
+    return hashlib.sha1(sql.encode("utf-8")).hexdigest()[:12]
+
+
+def _cuantil(valores: List[float], q: float) -> float:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return float("nan")
+    posicion = (len(ordenados) - 1) * q
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def _etiquetas(**etiquetas) -> str:
+    pares = []
+    for clave, valor in etiquetas.items():
+        valor = str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pares.append(f'{clave}="{valor}"')
+    return "{" + ",".join(pares) + "}"
+
+
+class RegistroMetricas:
+    """
+    Mediciones de las últimas consultas (ventana acotada) y totales acumulados
+    desde el inicio del proceso. Si ``METRICAS_ARCHIVO`` está definido, cada
+    medición además se agrega a ese archivo JSONL para conservar el histórico,
+    fuera del lock y desde un hilo escritor.
+    """
+    __MAX_MEDICIONES = int(os.getenv("METRICAS_MAX_MEDICIONES", "10000"))
+    __ARCHIVO = os.getenv("METRICAS_ARCHIVO")
+    _mediciones = deque(maxlen=__MAX_MEDICIONES)
+    _totales = {}
+    _cache = {}
+    _lock = threading.Lock()
+    _escritor = None
+    _lock_escritor = threading.Lock()
+
+    @classmethod
+    def registrar_consulta(cls, componente: Optional[str], sql: str, espera_conexion: float,
+                           ejecucion: float, lectura: float, filas: int, bytes_: int,
+                           modo: Optional[str] = None, error: Optional[str] = None) -> dict:
+        medicion = {
+            "timestamp": time.time(),
+            "componente": componente or "sin_componente",
+            "sql_hash": huella_sql(sql),
+            "espera_conexion": espera_conexion,
+            "ejecucion": ejecucion,
+            "lectura": lectura,
+            "total": espera_conexion + ejecucion + lectura,
+            "filas": filas,
+            "bytes": bytes_,
+            "modo": modo,
+            "error": error,
+        }
+        with cls._lock:
+            cls._mediciones.append(medicion)
+            totales = cls._totales.setdefault(medicion["componente"], {
+                "consultas": 0, "errores": 0, "filas": 0, "bytes": 0, **{etapa: 0.0 for etapa in ETAPAS}
+            })
+            totales["consultas"] += 1
+            if error is None:
+                totales["ultimas_filas"] = filas
+            totales["errores"] += error is not None
+            totales["filas"] += filas
+            totales["bytes"] += bytes_
+            for etapa in ETAPAS:
+                totales[etapa] += medicion[etapa]
+        if cls.__ARCHIVO:
+            cls._escritor_archivo().info(json.dumps(medicion, ensure_ascii=False))
+        return medicion
+
+    @classmethod
+    def _escritor_archivo(cls) -> logging.Logger:
+        """
+        Logger que agrega las mediciones a ``METRICAS_ARCHIVO`` desde un hilo propio
+        (``QueueListener``): las consultas y las lecturas del registro no esperan
+        por la E/S del archivo. Se instala una sola vez por proceso.
+        """
+        if cls._escritor is None:
+            with cls._lock_escritor:
+                if cls._escritor is None:
+                    escritor = logging.getLogger(LOGGER_METRICAS)
+                    if not escritor.handlers:
+                        handler = logging.FileHandler(cls.__ARCHIVO, encoding="utf-8")
+                        handler.setFormatter(logging.Formatter("%(message)s"))
+                        cola = queue.SimpleQueue()
+                        listener = QueueListener(cola, handler)
+                        listener.start()
+                        atexit.register(listener.stop)
+                        escritor.addHandler(QueueHandler(cola))
+                        escritor.setLevel(logging.INFO)
+                        escritor.propagate = False
+                    cls._escritor = escritor
+        return cls._escritor
+
+    @classmethod
+    def filas_recientes(cls, componente: Optional[str]) -> Optional[int]:
+        """Filas que devolvió la última ejecución exitosa del componente, si la hubo."""
+        with cls._lock:
+            return cls._totales.get(componente or "sin_componente", {}).get("ultimas_filas")
+
+    @classmethod
+    def registrar_cache(cls, nombre: str, acierto: bool):
+        with cls._lock:
+            contadores = cls._cache.setdefault(nombre, {"aciertos": 0, "fallos": 0})
+            contadores["aciertos" if acierto else "fallos"] += 1
+
+    @classmethod
+    def mediciones(cls) -> List[dict]:
+        with cls._lock:
+            return list(cls._mediciones)
+
+    @classmethod
+    def estadisticas_cache(cls) -> Dict[str, dict]:
+        with cls._lock:
+            return {nombre: dict(contadores) for nombre, contadores in cls._cache.items()}
+
+    @classmethod
+    def resumen_por_componente(cls) -> List[dict]:
+        """p50/p95/máximo del tiempo total por componente sobre la ventana, del más lento al más rápido."""
+        por_componente = {}
+        for medicion in cls.mediciones():
+            por_componente.setdefault(medicion["componente"], []).append(medicion)
+
+        resumen = []
+        for componente, mediciones in por_componente.items():
+            totales = [m["total"] for m in mediciones]
+            resumen.append({
+                "componente": componente,
+                "consultas": len(mediciones),
+                "p50": _cuantil(totales, 0.5),
+                "p95": _cuantil(totales, 0.95),
+                "maximo": max(totales),
+                "espera_conexion_p95": _cuantil([m["espera_conexion"] for m in mediciones], 0.95),
+                "filas": mediciones[-1]["filas"],
+                "bytes": mediciones[-1]["bytes"],
+                "errores": sum(1 for m in mediciones if m["error"]),
+            })
+        return sorted(resumen, key=lambda r: r["p95"], reverse=True)
+
+    @classmethod
+    def exportar_jsonl(cls) -> str:
+        return "".join(json.dumps(m, ensure_ascii=False) + "\n" for m in cls.mediciones())
+
+    @classmethod
+    def exportar_prometheus(cls) -> str:
+        """Métricas en el formato de texto de exposición de Prometheus."""
+        mediciones = cls.mediciones()
+        with cls._lock:
+            totales = {componente: dict(t) for componente, t in cls._totales.items()}
+        cache = cls.estadisticas_cache()
+
+        lineas = [
+            "# HELP informes_consulta_segundos Duración de las consultas por componente y etapa.",
+            "# TYPE informes_consulta_segundos summary",
+        ]
+        for componente, total in sorted(totales.items()):
+            for etapa in ETAPAS:
+                valores = [m[etapa] for m in mediciones if m["componente"] == componente]
+                for q in CUANTILES:
+                    if valores:
+                        lineas.append(f"informes_consulta_segundos{_etiquetas(componente=componente, etapa=etapa, quantile=q)} "
+                                      f"{_cuantil(valores, q):.6f}")
+                lineas.append(f"informes_consulta_segundos_sum{_etiquetas(componente=componente, etapa=etapa)} {total[etapa]:.6f}")
+                lineas.append(f"informes_consulta_segundos_count{_etiquetas(componente=componente, etapa=etapa)} {total['consultas']}")
+
+        for metrica, campo, ayuda in [
+            ("informes_consulta_filas_total", "filas", "Filas obtenidas por componente."),
+            ("informes_consulta_bytes_total", "bytes", "Bytes en memoria de los resultados por componente."),
+            ("informes_consulta_errores_total", "errores", "Consultas fallidas por componente."),
+        ]:
+            lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} counter"]
+            for componente, total in sorted(totales.items()):
+                lineas.append(f"{metrica}{_etiquetas(componente=componente)} {total[campo]}")
+
+        lineas += ["# HELP informes_cache_total Accesos a las cachés por resultado.", "# TYPE informes_cache_total counter"]
+        for nombre, contadores in sorted(cache.items()):
+            lineas.append(f"informes_cache_total{_etiquetas(cache=nombre, resultado='acierto')} {contadores['aciertos']}")
+            lineas.append(f"informes_cache_total{_etiquetas(cache=nombre, resultado='fallo')} {contadores['fallos']}")
+        return "\n".join(lineas) + "\n"
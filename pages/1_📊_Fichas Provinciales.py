@@ -5,13 +5,15 @@ key metrics, tables, and charts for a selected province and allows
 exporting the report to PDF.
 """
 
+import time
+
 import streamlit as st
-import plotly.express as px
-from streamlit_extras.great_tables import great_tables
 from streamlit_extras.metric_cards import style_metric_cards
-from data_handler import get_provincias, get_informe, build_kpi, insertar_saltos, tabla_pivot
-from pdf_generator import ficha_provincial_pdf
-from css_utils import load_css
+from data_handler import get_provincias, iter_informe, build_kpi, tabla_pivot, version_informe
+from figuras import construir_figura
+from exportacion import ColaExportacion, ESTADO_ERROR, clave_exportacion, exportar_ficha_provincial
+from metricas import RegistroMetricas
+from css_utils import load_css, load_icon_css
 
 
 st.set_page_config(page_title="Portal - SICyT", page_icon=st.secrets["LOGO_CORTO"], layout="wide")
@@ -28,7 +30,7 @@ custom_streamlit_css = """
     }
     """
 # Leer los archivos CSS necesarios
-icon_css = load_css("static/iconos/dist/css/icono-arg.css")
+icon_css = load_icon_css()
 roboto_css = load_css("static/style.css")
 
 # Combine los estilos de icono y tipografía con el CSS personalizado
@@ -44,12 +46,296 @@ combined_css = f"""
 st.markdown(combined_css, unsafe_allow_html=True)
 
 
+# ---- SECCIONES ----
+# Rango de ``orden`` (ver informes.yml) de los componentes que muestra cada sección
+SECCIONES = {
+    "Indicadores de contexto": (1000, 1999),
+    "Inversión en I+D": (2000, 2999),
+    "Proyectos": (3000, 3999),
+    "Infraestructura": (4200, 4299),
+    "Capital Humano": (4300, 4399),
+    "Resultados": (4100, 4199),
+    "Ciencia y Sociedad": (5000, 5999),
+}
+
+def componentes_seccion(seccion: str):
+    """Yield the components of ``seccion`` as soon as each one is available.
+
+    The first time a section is opened its queries run in parallel and each
+    component is yielded when its own query finishes. The results are kept in
+    the session, so reopening the section replays them without querying again
+    until a table read by the ficha is reloaded.
+    """
+    cache = st.session_state.setdefault("componentes_cache", {})
+    clave = (st.session_state.provincia_id, st.session_state.anio, version_informe("ficha_provincial"))
+    if cache.get("clave") != clave:
+        cache.clear()
+        cache["clave"] = clave
+    RegistroMetricas.registrar_cache("componentes_sesion", seccion in cache)
+    if seccion in cache:
+        yield from cache[seccion].items()
+        return
+
+    componentes = {}
+    for nombre, componente in iter_informe(
+        "ficha_provincial",
+        {"provincia_id": st.session_state.provincia_id, "provincia": st.session_state.provincia, "anio": st.session_state.anio},
+        orden=SECCIONES[seccion],
+    ):
+        componentes[nombre] = componente
+        yield nombre, componente
+    # Con una consulta fallida la sección no se guarda: al volver a abrirla se consulta de nuevo
+    if not any(componente.get("error") for componente in componentes.values()):
+        cache[seccion] = componentes
+
+
+# ---- BLOQUES ----
+# Cada sección reserva primero un placeholder por bloque y lo dibuja apenas
+# llegan los componentes de los que depende.
+def bloque(dependencias: list, dibujar) -> tuple:
+    """Reserve a placeholder at the current position, drawn once ``dependencias`` are loaded."""
+    return st.empty(), dependencias, dibujar
+
+
+def metrica(key: str, label: str = None):
+    def dibujar(componentes: dict, figuras: dict):
+        kpi = build_kpi(componentes, key)
+        st.metric(label=label or f":primary[{kpi['nombre']}]", value=kpi['valor'], delta=None)
+    return dibujar
+
+
+def fuente(key: str, separador: str = None):
+    def dibujar(componentes: dict, figuras: dict):
+        st.caption(f"Fuente: {componentes[key]['fuente']}")
+        if separador is not None:
+            st.markdown(separador)
+    return dibujar
+
+
+def grafico(key: str, separador: str = None, **kwargs):
+    def dibujar(componentes: dict, figuras: dict):
+        st.plotly_chart(figuras[key], **kwargs)
+        fuente(key, separador)(componentes, figuras)
+    return dibujar
+
+
+def tabla(key: str, separador: str = None):
+    def dibujar(componentes: dict, figuras: dict):
+        componente = componentes[key]
+        if componente['resultado_sql'] is not None and not componente['resultado_sql'].empty:
+            # Deferred: great_tables is only needed by the sections that render tables
+            from streamlit_extras.great_tables import great_tables
+
+            great_tables(tabla_pivot(componente, render_gt=True))
+            fuente(key, separador)(componentes, figuras)
+    return dibujar
+
+
+def layout_indicadores() -> list:
+    st.markdown("")
+
+    bloques = []
+    col1, col2, col3, col4, col5 = st.columns([1, 3.75, .5, 3.75, 1])
+    with col2:
+        for key in ["kpi_poblacion_prov", "kpi_tasa_actividad_prov", "kpi_tasa_desempleo_prov"]:
+            bloques.append(bloque([key], metrica(key)))
+    with col4:
+        for key in ["kpi_densidad_prov", "kpi_tasa_actividad_nac", "kpi_tasa_desempleo_nac"]:
+            bloques.append(bloque([key], metrica(key)))
+    bloques.append(bloque(["kpi_tasa_actividad_nac"], fuente("kpi_tasa_actividad_nac")))
+    st.markdown("")
+
+    bloques.append(bloque(["grafico_expo_top5"], grafico("grafico_expo_top5", use_container_width=True)))
+    return bloques
+
+
+def layout_inversion() -> list:
+    return [
+        bloque(["grafico_evolucion_regional"], grafico("grafico_evolucion_regional", "", use_container_width=True)),
+        bloque(["grafico_inv_por_investigador"], grafico("grafico_inv_por_investigador", "", use_container_width=True)),
+        bloque(["grafico_inv_empresaria_sector"], grafico("grafico_inv_empresaria_sector", use_container_width=True)),
+    ]
+
+
+def layout_proyectos() -> list:
+    st.markdown("")
+
+    bloques = []
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        for key in ["kpi_pfi_provincial", "kpi_porc_privada_provincial"]:
+            bloques.append(bloque([key], metrica(key)))
+    with col2:
+        for key in ["kpi_pfi_regional", "kpi_porc_privada_regional"]:
+            bloques.append(bloque([key], metrica(key)))
+    with col3:
+        for key in ["kpi_pfi_nacional", "kpi_porc_privada_nacional"]:
+            bloques.append(bloque([key], metrica(key)))
+    st.caption("*PFI: Proyectos Federales de Innovación")
+    bloques.append(bloque(["kpi_pfi_provincial"], fuente("kpi_pfi_provincial", "")))
+
+    bloques.append(bloque(["tabla_pfi_cruce"], tabla("tabla_pfi_cruce", "")))
+    return bloques
+
+
+def layout_infraestructura() -> list:
+    st.markdown("")
+
+    bloques = []
+    col0, col1, col2 = st.columns([.25, 2.5, 7.25], vertical_alignment="center")
+    with col1:
+        bloques.append(bloque(["kpi_unidades_id_prov"], metrica("kpi_unidades_id_prov")))
+    with col2:
+        bloques.append(bloque(
+            ["grafico_unidades_por_inst"],
+            lambda componentes, figuras: st.markdown(f"#### {componentes['grafico_unidades_por_inst']['nombre']}")
+        ))
+
+    bloques.append(bloque(["grafico_unidades_por_inst"], grafico("grafico_unidades_por_inst", "---", use_container_width=True)))
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        bloques.append(bloque(["kpi_equipos_provincial"], metrica("kpi_equipos_provincial")))
+    with col2:
+        bloques.append(bloque(["kpi_equipos_regional"], metrica("kpi_equipos_regional")))
+    with col3:
+        bloques.append(bloque(["kpi_equipos_nacional"], metrica("kpi_equipos_nacional")))
+    bloques.append(bloque(["kpi_equipos_nacional"], fuente("kpi_equipos_nacional", "")))
+
+    bloques.append(bloque(["grafico_equipos_por_tipo"], grafico("grafico_equipos_por_tipo", use_container_width=True)))
+    return bloques
+
+
+def layout_capital_humano() -> list:
+    st.markdown("")
+
+    bloques = [
+        bloque(["grafico_distribucion_investigadores"], grafico("grafico_distribucion_investigadores", "", use_container_width=True)),
+    ]
+
+    col1, col2, col3 = st.columns(3, border=True)
+    for col, titulo, key in [
+        (col1, st.session_state.provincia, "kpi_tasa_pea_provincial"),
+        (col2, st.session_state.region, "kpi_tasa_pea_regional"),
+        (col3, st.session_state.pais, "kpi_tasa_pea_nacional"),
+    ]:
+        with col:
+            st.markdown(f"#### {titulo}")
+            bloques.append(bloque([key], metrica(key, label=":primary[Investigadores cada 1000 habs.]")))
+    bloques.append(bloque(["kpi_tasa_pea_nacional"], fuente("kpi_tasa_pea_nacional", "")))
+
+    bloques.append(bloque(["tabla_personas_por_funcion"], tabla("tabla_personas_por_funcion", "---")))
+    bloques.append(bloque(["grafico_evolucion_investigadores"], grafico("grafico_evolucion_investigadores")))
+    return bloques
+
+
+def layout_resultados() -> list:
+    st.markdown("")
+
+    bloques = [
+        bloque(["grafico_expo_intensidad"], grafico("grafico_expo_intensidad", "")),
+        bloque(["grafico_expo_evolucion"], grafico("grafico_expo_evolucion", "")),
+        bloque(["grafico_expo_destino"], grafico("grafico_expo_destino", "---")),
+    ]
+
+    col1, col2, col3 = st.columns([6, 1, 3], vertical_alignment="center")
+    with col1:
+        bloques.append(bloque(["kpi_patentes_cyt_prov"], metrica("kpi_patentes_cyt_prov")))
+    col1b, col2b, col3b = st.columns([2, 6, 2])
+    with col2b:
+        bloques.append(bloque(["kpi_patentes_cyt_arg"], metrica("kpi_patentes_cyt_arg")))
+    col1c, col2c, col3c = st.columns([2, 2, 6])
+    with col3c:
+        bloques.append(bloque(["kpi_patentes_arg"], metrica("kpi_patentes_arg")))
+    bloques.append(bloque(["kpi_patentes_arg"], fuente("kpi_patentes_arg", "---")))
+
+    def patentes_evolucion(componentes: dict, figuras: dict):
+        # Si el dataframe no tiene info, no mostrar
+        resultado = componentes["grafico_patentes_evolucion"]['resultado_sql']
+        if resultado is not None and not resultado.empty:
+            grafico("grafico_patentes_evolucion", "---")(componentes, figuras)
+
+    bloques += [
+        bloque(["grafico_patentes_evolucion"], patentes_evolucion),
+        bloque(["tabla_patentes_sector"], tabla("tabla_patentes_sector", "---")),
+        bloque(["grafico_produccion_evolucion"], grafico("grafico_produccion_evolucion", "---")),
+        bloque(["grafico_produccion_tipo"], grafico("grafico_produccion_tipo", "---")),
+        bloque(["grafico_publicaciones_area"], grafico("grafico_publicaciones_area", "---")),
+        bloque(["tabla_articulos_q1_q2"], tabla("tabla_articulos_q1_q2")),
+    ]
+    return bloques
+
+
+def layout_ciencia_sociedad() -> list:
+    st.markdown("")
+
+    def percepcion(componentes: dict, figuras: dict):
+        st.markdown(f"### {componentes['grafico_percepcion_calidad_vida']['nombre']}")
+        grafico("grafico_percepcion_calidad_vida", "")(componentes, figuras)
+
+    return [bloque(["grafico_percepcion_calidad_vida"], percepcion)]
+
+
+LAYOUT_SECCION = {
+    "Indicadores de contexto": layout_indicadores,
+    "Inversión en I+D": layout_inversion,
+    "Proyectos": layout_proyectos,
+    "Infraestructura": layout_infraestructura,
+    "Capital Humano": layout_capital_humano,
+    "Resultados": layout_resultados,
+    "Ciencia y Sociedad": layout_ciencia_sociedad,
+}
+
+
+def mostrar_seccion(seccion: str):
+    """Lay out ``seccion`` with empty placeholders and fill them as components arrive."""
+    pendientes = LAYOUT_SECCION[seccion]()
+    componentes, figuras = {}, {}
+    for nombre, componente in componentes_seccion(seccion):
+        componentes[nombre] = componente
+        if componente.get("tipo_componente") == "GRAFICO":
+            figuras[nombre] = construir_figura(componente)
+        for placeholder, dependencias, dibujar in [b for b in pendientes if all(d in componentes for d in b[1])]:
+            with placeholder.container():
+                fallidos = [componentes[d]["nombre"] for d in dependencias if componentes[d].get("error")]
+                if fallidos:
+                    # Las consultas corren en otros hilos: sus errores se muestran acá
+                    for nombre_fallido in fallidos:
+                        st.error(f"No se pudieron consultar los datos de «{nombre_fallido}».", icon="⚠️")
+                else:
+                    dibujar(componentes, figuras)
+        pendientes = [b for b in pendientes if not all(d in componentes for d in b[1])]
+
+
+def exportar_a_pdf(provincia: str):
+    """Enqueue the PDF export of the whole ficha for ``provincia``.
+
+    Sections that were not opened yet are loaded here, so the export always
+    contains every component.
+    """
+    componentes = {}
+    for seccion in SECCIONES:
+        componentes.update(componentes_seccion(seccion))
+    # Un PDF con datos faltantes quedaría guardado como el de esta clave
+    if any(componente.get("error") for componente in componentes.values()):
+        raise RuntimeError("no se pudieron consultar todos los datos de la ficha. Intente nuevamente.")
+
+    # El trabajo agrega las imágenes a cada componente: no debe tocar los de la sesión
+    data = {"nombre": "ficha_provincial", "componentes": {nombre: dict(comp) for nombre, comp in componentes.items()}}
+
+    clave = clave_exportacion("ficha_provincial", {
+        "provincia_id": st.session_state.provincia_id,
+        "anio": st.session_state.anio,
+    })
+    return ColaExportacion.encolar(clave, provincia, exportar_ficha_provincial, provincia, data)
+
+
 # ---- MAINPAGE ----
 def panomProvincial():
     """Render the provincial dashboard page.
 
-    Loads provincial data, displays metrics and tables, and provides the
-    option to export the report as a PDF.
+    Loads provincial data section by section, displays metrics and tables,
+    and provides the option to export the report as a PDF.
 
     Returns:
         None: This function renders the page but does not return a value.
@@ -85,583 +371,18 @@ def panomProvincial():
         st.session_state.pais = 'Argentina'
         st.session_state.anio = '2023'
 
-        DFs = get_informe("ficha_provincial", {
-            "provincia_id": st.session_state.provincia_id,
-            "provincia": st.session_state.provincia,
-            "anio": st.session_state.anio
-        })
-
-        # ################################## COMPONENTES #######################################
-        kpi_keys = [
-            "kpi_poblacion_prov",
-            "kpi_densidad_prov",
-            "kpi_tasa_actividad_prov",
-            "kpi_tasa_actividad_nac",
-            "kpi_tasa_desempleo_prov",
-            "kpi_tasa_desempleo_nac",
-            "kpi_pfi_nacional",
-            "kpi_pfi_regional",
-            "kpi_pfi_provincial",
-            "kpi_porc_privada_nacional",
-            "kpi_porc_privada_regional",
-            "kpi_porc_privada_provincial",
-            "kpi_patentes_arg",
-            "kpi_patentes_cyt_arg",
-            "kpi_patentes_cyt_prov",
-            "kpi_unidades_id_prov",
-            "kpi_equipos_nacional",
-            "kpi_equipos_regional",
-            "kpi_equipos_provincial",
-            "kpi_tasa_pea_provincial",
-            "kpi_tasa_pea_regional",
-            "kpi_tasa_pea_nacional",
-        ]
-
-        kpis = {key: build_kpi(DFs["componentes"], key) for key in kpi_keys}
-
-        grafico_expo_top5 = DFs["componentes"]["grafico_expo_top5"]
-
-        grafico_evolucion_regional = DFs["componentes"]["grafico_evolucion_regional"]
-        grafico_inv_por_investigador = DFs["componentes"]["grafico_inv_por_investigador"]
-        grafico_inv_empresaria_sector = DFs["componentes"]["grafico_inv_empresaria_sector"]
-
-        tabla_pfi_cruce = DFs["componentes"]["tabla_pfi_cruce"]
-
-        grafico_expo_intensidad = DFs["componentes"]["grafico_expo_intensidad"]
-        grafico_expo_evolucion = DFs["componentes"]["grafico_expo_evolucion"]
-        grafico_expo_destino = DFs["componentes"]["grafico_expo_destino"]
-
-        grafico_patentes_evolucion = DFs["componentes"]["grafico_patentes_evolucion"]
-        tabla_patentes_sector = DFs["componentes"]["tabla_patentes_sector"]
-        grafico_produccion_evolucion = DFs["componentes"]["grafico_produccion_evolucion"]
-        grafico_produccion_tipo = DFs["componentes"]["grafico_produccion_tipo"]
-        tabla_articulos_q1_q2 = DFs["componentes"]["tabla_articulos_q1_q2"]
-        grafico_publicaciones_area = DFs["componentes"]["grafico_publicaciones_area"]
-
-        grafico_unidades_por_inst = DFs["componentes"]["grafico_unidades_por_inst"]
-        grafico_equipos_por_tipo = DFs["componentes"]["grafico_equipos_por_tipo"]
-
-        grafico_distribucion_investigadores = DFs["componentes"]["grafico_distribucion_investigadores"]
-        tabla_personas_por_funcion = DFs["componentes"]["tabla_personas_por_funcion"]
-        grafico_evolucion_investigadores = DFs["componentes"]["grafico_evolucion_investigadores"]
-
-        grafico_percepcion_calidad_vida = DFs["componentes"]["grafico_percepcion_calidad_vida"]
-
-        #######################################################################################
         st.markdown(f"## {provincia}")
 
-        indicadoresTab, inversionTab, proyectosTab, infraestructuraTab, capitalHumanoTab, resultadosTab, ciencia_sociedadTab = st.tabs(
-            ["Indicadores de contexto", "Inversión en I+D", "Proyectos", "Infraestructura", "Capital Humano", "Resultados", "Ciencia y Sociedad"]
-        )
+        # Solo se consultan y dibujan los componentes de la sección elegida
+        seccion = st.segmented_control(
+            "Sección",
+            options=list(SECCIONES),
+            default=next(iter(SECCIONES)),
+            label_visibility="collapsed",
+            key="seccion",
+        ) or next(iter(SECCIONES))
 
-        with indicadoresTab:
-            st.markdown("")
-
-            col1, col2, col3, col4, col5 = st.columns([1, 3.75, .5, 3.75, 1])
-            with col2:
-                st.metric(
-                    label=f":primary[{kpis['kpi_poblacion_prov']['nombre']}]",
-                    value=kpis['kpi_poblacion_prov']['valor'],
-                    delta=None,
-                )
-                st.metric(
-                    label=f":primary[{kpis['kpi_tasa_actividad_prov']['nombre']}]",
-                    value=kpis['kpi_tasa_actividad_prov']['valor'],
-                    delta=None,
-                )
-                st.metric(
-                    label=f":primary[{kpis['kpi_tasa_desempleo_prov']['nombre']}]",
-                    value=kpis['kpi_tasa_desempleo_prov']['valor'],
-                    delta=None,
-                )
-            with col4:
-                st.metric(
-                    label=f":primary[{kpis['kpi_densidad_prov']['nombre']}]",
-                    value=kpis['kpi_densidad_prov']['valor'],
-                    delta=None,
-                )
-                st.metric(
-                    label=f":primary[{kpis['kpi_tasa_actividad_nac']['nombre']}]",
-                    value=kpis['kpi_tasa_actividad_nac']['valor'],
-                    delta=None,
-                )
-                st.metric(
-                    label=f":primary[{kpis['kpi_tasa_desempleo_nac']['nombre']}]",
-                    value=kpis['kpi_tasa_desempleo_nac']['valor'],
-                    delta=None,
-                )
-            st.caption(f"Fuente: {kpis['kpi_tasa_actividad_nac']['fuente']}")
-            st.markdown("")
-
-            grafico_expo_top5['resultado_sql'].iloc[:, 0] = grafico_expo_top5['resultado_sql'].iloc[:, 0].apply(insertar_saltos)
-
-            top5_exportaciones_fig = px.bar(
-                data_frame=grafico_expo_top5['resultado_sql'],
-                x=grafico_expo_top5['config']['plot_mapping']['x'],
-                y=grafico_expo_top5['config']['plot_mapping']['y'],
-                labels=grafico_expo_top5['config']['plot_mapping']['labels'],
-                title=grafico_expo_top5['nombre'],
-                template="seaborn",
-                orientation='h',
-                color=grafico_expo_top5['config']['plot_mapping']['y'],
-                color_discrete_sequence=["#4D7AAE", "#B9422D", "#B2713F", "#198769", "#5C3C7D", "#F2C94C", "#E26D5C", "#9B51E0", "#56CCF2", "#27AE60"]
-            )
-            top5_exportaciones_fig.update_layout(grafico_expo_top5['config']['layout'])
-            top5_exportaciones_fig.update_layout(showlegend=False)
-
-            st.plotly_chart(top5_exportaciones_fig, use_container_width=True)
-            st.caption(f"Fuente: {grafico_expo_top5['fuente']}")
-
-        with inversionTab:
-            inversionID_fig = px.line(
-                data_frame=grafico_evolucion_regional['resultado_sql'],
-                x=grafico_evolucion_regional['config']['plot_mapping']['x'],
-                y=grafico_evolucion_regional['config']['plot_mapping']['y'],
-                labels=grafico_evolucion_regional['config']['plot_mapping']['labels'],
-                title=grafico_evolucion_regional['nombre'],
-                template="seaborn",
-                color=grafico_evolucion_regional['config']['plot_mapping']['color']
-            )
-            inversionID_fig.update_layout(grafico_evolucion_regional['config']['layout'])
-            st.plotly_chart(inversionID_fig, use_container_width=True)
-            st.caption(f"Fuente: {grafico_evolucion_regional['fuente']}")
-            st.markdown("")
-
-            inversionInvestigador_fig = px.bar(
-                data_frame=grafico_inv_por_investigador['resultado_sql'],
-                y=grafico_inv_por_investigador['config']['plot_mapping']['y'],
-                x=grafico_inv_por_investigador['config']['plot_mapping']['x'],
-                labels=grafico_inv_por_investigador['config']['plot_mapping']['labels'],
-                title=grafico_inv_por_investigador['nombre'],
-                template="seaborn",
-                orientation='h'
-            )
-            inversionInvestigador_fig.update_layout(grafico_inv_por_investigador['config']['layout'])
-            st.plotly_chart(inversionInvestigador_fig, use_container_width=True)
-            st.caption(f"Fuente: {grafico_inv_por_investigador['fuente']}")
-            st.markdown("")
-
-            grafico_inv_empresaria_sector['resultado_sql'].iloc[:, 0] = grafico_inv_empresaria_sector['resultado_sql'].iloc[:, 0].apply(insertar_saltos)
-
-            inversionEmpresas_fig = px.bar(
-                data_frame=grafico_inv_empresaria_sector['resultado_sql'],
-                y=grafico_inv_empresaria_sector['config']['plot_mapping']['y'],
-                x=grafico_inv_empresaria_sector['config']['plot_mapping']['x'],
-                labels=grafico_inv_empresaria_sector['config']['plot_mapping']['labels'],
-                title=grafico_inv_empresaria_sector['nombre'],
-                template="seaborn",
-                orientation='h',
-                color=grafico_inv_empresaria_sector['config']['plot_mapping']['y'],
-                color_discrete_sequence=["#4D7AAE", "#B9422D", "#B2713F", "#198769", "#5C3C7D", "#F2C94C", "#E26D5C", "#9B51E0", "#56CCF2", "#27AE60"]
-            )
-
-            inversionEmpresas_fig.update_layout(grafico_inv_empresaria_sector['config']['layout'])
-            inversionEmpresas_fig.update_layout(showlegend=False)
-            st.plotly_chart(inversionEmpresas_fig, use_container_width=True)
-            st.caption(f"Fuente: {grafico_inv_empresaria_sector['fuente']}")
-
-        with proyectosTab:
-            st.markdown("")
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric(
-                    label=f":primary[{kpis['kpi_pfi_provincial']['nombre']}]",
-                    value=kpis['kpi_pfi_provincial']['valor'],
-                    delta=None,
-                )
-                st.metric(
-                    label=f":primary[{kpis['kpi_porc_privada_provincial']['nombre']}]",
-                    value=kpis['kpi_porc_privada_provincial']['valor'],
-                    delta=None,
-                )
-            with col2:
-                st.metric(
-                    label=f":primary[{kpis['kpi_pfi_regional']['nombre']}]",
-                    value=kpis['kpi_pfi_regional']['valor'],
-                    delta=None,
-                )
-                st.metric(
-                    label=f":primary[{kpis['kpi_porc_privada_regional']['nombre']}]",
-                    value=kpis['kpi_porc_privada_regional']['valor'],
-                    delta=None,
-                )
-            with col3:
-                st.metric(
-                    label=f":primary[{kpis['kpi_pfi_nacional']['nombre']}]",
-                    value=kpis['kpi_pfi_nacional']['valor'],
-                    delta=None,
-                )
-                st.metric(
-                    label=f":primary[{kpis['kpi_porc_privada_nacional']['nombre']}]",
-                    value=kpis['kpi_porc_privada_nacional']['valor'],
-                    delta=None,
-                )
-            st.caption("*PFI: Proyectos Federales de Innovación")
-            st.caption(f"Fuente: {kpis['kpi_pfi_provincial']['fuente']}")
-            st.markdown("")
-
-            if tabla_pfi_cruce['resultado_sql'] is not None and not tabla_pfi_cruce['resultado_sql'].empty:
-                tabla_pfi_cruce_fig = tabla_pivot(tabla_pfi_cruce, render_gt=True)
-                great_tables(tabla_pfi_cruce_fig)
-                st.caption(f"Fuente: {tabla_pfi_cruce['fuente']}")
-                st.markdown("")
-
-        with infraestructuraTab:
-            st.markdown("")
-            col0, col1, col2 = st.columns([.25, 2.5, 7.25], vertical_alignment="center")
-            with col1:
-                st.metric(
-                    label=f":primary[{kpis['kpi_unidades_id_prov']['nombre']}]",
-                    value=kpis['kpi_unidades_id_prov']['valor'],
-                    delta=None,
-                )
-            with col2:
-                st.markdown(f"#### {grafico_unidades_por_inst['nombre']}")
-
-            grafico_unidades_por_inst['resultado_sql'].iloc[:, 0] = grafico_unidades_por_inst['resultado_sql'].iloc[:, 0].apply(insertar_saltos)
-
-            unidadesIDxinstitucion_fig = px.bar(
-                data_frame=grafico_unidades_por_inst['resultado_sql'],
-                y=grafico_unidades_por_inst['config']['plot_mapping']['y'],
-                x=grafico_unidades_por_inst['config']['plot_mapping']['x'],
-                labels=grafico_unidades_por_inst['config']['plot_mapping']['labels'],
-                title=None,  # grafico_unidades_por_inst['nombre'],
-                template="seaborn",
-                orientation='h',
-                color=grafico_unidades_por_inst['config']['plot_mapping']['y'],
-                color_discrete_sequence=["#4D7AAE", "#B9422D", "#B2713F", "#198769", "#5C3C7D", "#F2C94C", "#E26D5C", "#9B51E0", "#56CCF2", "#27AE60"]
-            )
-            unidadesIDxinstitucion_fig.update_layout(grafico_unidades_por_inst['config']['layout'])
-            unidadesIDxinstitucion_fig.update_layout(margin=dict(l=0, r=20, t=0, b=20), showlegend=False)
-            st.plotly_chart(unidadesIDxinstitucion_fig, use_container_width=True)
-            st.caption(f"Fuente: {grafico_unidades_por_inst['fuente']}")
-            st.markdown("---")
-
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric(
-                    label=f":primary[{kpis['kpi_equipos_provincial']['nombre']}]",
-                    value=kpis['kpi_equipos_provincial']['valor'],
-                    delta=None,
-                )
-            with col2:
-                st.metric(
-                    label=f":primary[{kpis['kpi_equipos_regional']['nombre']}]",
-                    value=kpis['kpi_equipos_regional']['valor'],
-                    delta=None,
-                )
-            with col3:
-                st.metric(
-                    label=f":primary[{kpis['kpi_equipos_nacional']['nombre']}]",
-                    value=kpis['kpi_equipos_nacional']['valor'],
-                    delta=None,
-                )
-            st.caption(f"Fuente: {kpis['kpi_equipos_nacional']['fuente']}")
-            st.markdown("")
-
-            equiposIDxTipo_fig = px.bar(
-                data_frame=grafico_equipos_por_tipo['resultado_sql'],
-                y=grafico_equipos_por_tipo['config']['plot_mapping']['y'],
-                x=grafico_equipos_por_tipo['config']['plot_mapping']['x'],
-                labels=grafico_equipos_por_tipo['config']['plot_mapping']['labels'],
-                title=grafico_equipos_por_tipo['nombre'],
-                color=grafico_equipos_por_tipo['config']['plot_mapping']['y'],
-                template="seaborn",
-                orientation='h'
-            )
-            equiposIDxTipo_fig.update_layout(grafico_equipos_por_tipo['config']['layout'])
-            equiposIDxTipo_fig.update_layout(showlegend=False)
-            st.plotly_chart(equiposIDxTipo_fig, use_container_width=True)
-            st.caption(f"Fuente: {grafico_equipos_por_tipo['fuente']}")
-
-        with capitalHumanoTab:
-            st.markdown("")
-            investigadoresxArea_fig = px.treemap(
-                title=grafico_distribucion_investigadores['nombre'],
-                data_frame=grafico_distribucion_investigadores['resultado_sql'],
-                path=grafico_distribucion_investigadores['config']['plot_mapping']['path'],
-                values=grafico_distribucion_investigadores['config']['plot_mapping']['values'],
-                labels=grafico_distribucion_investigadores['config']['plot_mapping']['labels'],
-                color=grafico_distribucion_investigadores['config']['plot_mapping']['color'],
-                color_discrete_sequence=["#4D7AAE", "#B9422D", "#B2713F", "#198769", "#5C3C7D", "#F2C94C", "#E26D5C", "#9B51E0", "#56CCF2", "#27AE60"],
-            )
-            investigadoresxArea_fig.update_traces(
-                textinfo=grafico_distribucion_investigadores['config']['traces']['textinfo'],
-                textposition=grafico_distribucion_investigadores['config']['traces']['textposition'],
-                marker=dict(cornerradius=5))
-
-            investigadoresxArea_fig.update_layout(grafico_distribucion_investigadores['config']['layout'])
-            investigadoresxArea_fig.update_layout(
-                margin=dict(l=20, r=20, t=50, b=20)
-            )
-            st.plotly_chart(investigadoresxArea_fig, use_container_width=True)
-            st.caption(f"Fuente: {grafico_distribucion_investigadores['fuente']}")
-            st.markdown("")
-
-            col1, col2, col3 = st.columns(3, border=True)
-            with col1:
-                st.markdown(f"#### {st.session_state.provincia}")
-                st.metric(
-                    label=":primary[Investigadores cada 1000 habs.]",
-                    value=kpis['kpi_tasa_pea_provincial']['valor'],
-                    delta=None,
-                )
-            with col2:
-                st.markdown(f"#### {st.session_state.region}")
-                st.metric(
-                    label=":primary[Investigadores cada 1000 habs.]",
-                    value=kpis['kpi_tasa_pea_regional']['valor'],
-                    delta=None,
-                )
-            with col3:
-                st.markdown(f"#### {st.session_state.pais}")
-                st.metric(label=":primary[Investigadores cada 1000 habs.]", value=kpis['kpi_tasa_pea_nacional']['valor'], delta=None)
-            st.caption(f"Fuente: {kpis['kpi_tasa_pea_nacional']['fuente']}")
-            st.markdown("")
-
-            if tabla_personas_por_funcion['resultado_sql'] is not None and not tabla_personas_por_funcion['resultado_sql'].empty:
-                tabla_personas_por_funcion_fig = tabla_pivot(tabla_personas_por_funcion, render_gt=True)
-                great_tables(tabla_personas_por_funcion_fig)
-                st.caption(f"Fuente: {tabla_personas_por_funcion['fuente']}")
-
-                st.markdown("---")
-
-            evolucionInvestigadores_fig = px.line(
-                data_frame=grafico_evolucion_investigadores['resultado_sql'],
-                x=grafico_evolucion_investigadores['config']['plot_mapping']['x'],
-                y=grafico_evolucion_investigadores['config']['plot_mapping']['y'],
-                labels=grafico_evolucion_investigadores['config']['plot_mapping']['labels'],
-                title=grafico_evolucion_investigadores['nombre'],
-                template="seaborn"
-            )
-            evolucionInvestigadores_fig.update_layout(grafico_evolucion_investigadores['config']['layout'])
-            evolucionInvestigadores_fig.update_layout(margin=dict(l=20, r=20, t=50, b=20))
-            st.plotly_chart(evolucionInvestigadores_fig)
-            st.caption(f"Fuente: {grafico_evolucion_investigadores['fuente']}")
-
-        with resultadosTab:
-            st.markdown("")
-            exportacionesIntensidad_fig = px.pie(
-                data_frame=grafico_expo_intensidad['resultado_sql'],
-                names=grafico_expo_intensidad['config']['plot_mapping']['names'],
-                values=grafico_expo_intensidad['config']['plot_mapping']['values'],
-                labels=grafico_expo_intensidad['config']['plot_mapping']['labels'],
-                title=grafico_expo_intensidad['nombre'],
-                hole=grafico_expo_intensidad['config']['plot_mapping']['hole'],
-                template="seaborn",
-            )
-            exportacionesIntensidad_fig.update_layout(grafico_expo_intensidad['config']['layout'])
-            exportacionesIntensidad_fig.update_traces(grafico_expo_intensidad['config']['traces'])
-            exportacionesIntensidad_fig.update_layout(margin=dict(l=20, r=20, t=50, b=20))
-
-            st.plotly_chart(exportacionesIntensidad_fig)
-            st.caption(f"Fuente: {grafico_expo_intensidad['fuente']}")
-            st.markdown("")
-
-            evolucionExportaciones_fig = px.line(
-                data_frame=grafico_expo_evolucion['resultado_sql'],
-                x=grafico_expo_evolucion['config']['plot_mapping']['x'],
-                y=grafico_expo_evolucion['config']['plot_mapping']['y'],
-                labels=grafico_expo_evolucion['config']['plot_mapping']['labels'],
-                title=grafico_expo_evolucion['nombre'],
-                color=grafico_expo_evolucion['config']['plot_mapping']['color'],
-                template="seaborn"
-            )
-            evolucionExportaciones_fig.update_layout(grafico_expo_evolucion['config']['layout'])
-            evolucionExportaciones_fig.update_layout(margin=dict(l=20, r=20, t=50, b=20))
-
-            st.plotly_chart(evolucionExportaciones_fig)
-            st.caption(f"Fuente: {grafico_expo_evolucion['fuente']}")
-            st.markdown("")
-
-            exportacionesxPais_fig = px.treemap(
-                data_frame=grafico_expo_destino['resultado_sql'],
-                path=grafico_expo_destino['config']['plot_mapping']['path'],
-                values=grafico_expo_destino['config']['plot_mapping']['values'],
-                color=grafico_expo_destino['config']['plot_mapping']['color'],
-                title=grafico_expo_destino['nombre'],
-                template="seaborn",
-                color_discrete_sequence=["#4D7AAE", "#BC321A", "#EBDBCF", "#198769", "#5C3C7D", "#F2C94C", "#E26D5C", "#9B51E0", "#56CCF2", "#27AE60"]
-            )
-            exportacionesxPais_fig.update_traces(grafico_expo_destino['config']['traces'])
-            exportacionesxPais_fig.update_layout(grafico_expo_destino['config']['layout'])
-            exportacionesxPais_fig.update_layout(margin=dict(l=20, r=20, t=50, b=0))
-
-            st.plotly_chart(exportacionesxPais_fig)
-            st.caption(f"Fuente: {grafico_expo_destino['fuente']}")
-            st.markdown("---")
-
-            col1, col2, col3 = st.columns([6, 1, 3], vertical_alignment="center")
-            with col1:
-                st.metric(
-                    label=f":primary[{kpis['kpi_patentes_cyt_prov']['nombre']}]",
-                    value=kpis['kpi_patentes_cyt_prov']['valor'],
-                    delta=None,
-                )
-            col1b, col2b, col3b = st.columns([2, 6, 2])
-            with col2b:
-                st.metric(
-                    label=f":primary[{kpis['kpi_patentes_cyt_arg']['nombre']}]",
-                    value=kpis['kpi_patentes_cyt_arg']['valor'],
-                    delta=None
-                )
-            col1c, col2c, col3c = st.columns([2, 2, 6])
-            with col3c:
-                st.metric(
-                    label=f":primary[{kpis['kpi_patentes_arg']['nombre']}]",
-                    value=kpis['kpi_patentes_arg']['valor'],
-                    delta=None
-                )
-            st.caption(f"Fuente: {kpis['kpi_patentes_arg']['fuente']}")
-            st.markdown("---")
-
-            evolucionPatentes_fig = px.line(
-                data_frame=grafico_patentes_evolucion['resultado_sql'],
-                x=grafico_patentes_evolucion['config']['plot_mapping']['x'],
-                y=grafico_patentes_evolucion['config']['plot_mapping']['y'],
-                labels=grafico_patentes_evolucion['config']['plot_mapping']['labels'],
-                title=grafico_patentes_evolucion['nombre'],
-                template="seaborn"
-            )
-            evolucionPatentes_fig.update_layout(grafico_patentes_evolucion['config']['layout'])
-            evolucionPatentes_fig.update_layout(margin=dict(l=20, r=20, t=50, b=20))
-            # Si el dataframe no tiene info, no mostrar
-            if grafico_patentes_evolucion['resultado_sql'] is not None and not grafico_patentes_evolucion['resultado_sql'].empty:
-                st.plotly_chart(evolucionPatentes_fig)
-                st.caption(f"Fuente: {grafico_patentes_evolucion['fuente']}")
-                st.markdown("---")
-
-            if tabla_patentes_sector['resultado_sql'] is not None and not tabla_patentes_sector['resultado_sql'].empty:
-                tabla_patentes_sector_fig = tabla_pivot(tabla_patentes_sector, render_gt=True)
-                great_tables(tabla_patentes_sector_fig)
-                st.caption(f"Fuente: {tabla_patentes_sector['fuente']}")
-
-                st.markdown("---")
-
-            produccionProvincial_fig = px.line(
-                data_frame=grafico_produccion_evolucion['resultado_sql'],
-                x=grafico_produccion_evolucion['config']['plot_mapping']['x'],
-                y=grafico_produccion_evolucion['config']['plot_mapping']['y'],
-                labels=grafico_produccion_evolucion['config']['plot_mapping']['labels'],
-                title=grafico_produccion_evolucion['nombre'],
-                color=grafico_produccion_evolucion['config']['plot_mapping']['color'],
-                template="seaborn"
-            )
-            produccionProvincial_fig.update_layout(grafico_produccion_evolucion['config']['layout'])
-            produccionProvincial_fig.update_layout(margin=dict(l=20, r=20, t=50, b=20))
-
-            st.plotly_chart(produccionProvincial_fig)
-            st.caption(f"Fuente: {grafico_produccion_evolucion['fuente']}")
-            st.markdown("---")
-
-            distribucionPublicaciones_fig = px.treemap(
-                data_frame=grafico_produccion_tipo['resultado_sql'],
-                path=grafico_produccion_tipo['config']['plot_mapping']['path'],
-                values=grafico_produccion_tipo['config']['plot_mapping']['values'],
-                labels=grafico_produccion_tipo['config']['plot_mapping']['labels'],
-                color=grafico_produccion_tipo['config']['plot_mapping']['color'],
-                title=grafico_produccion_tipo['nombre'],
-                template="seaborn"
-            )
-            distribucionPublicaciones_fig.update_traces(
-                textinfo=grafico_produccion_tipo['config']['traces']['textinfo'],
-                textposition=grafico_produccion_tipo['config']['traces']['textposition'],
-                marker=dict(cornerradius=5)
-            )
-            distribucionPublicaciones_fig.update_layout(grafico_produccion_tipo['config']['layout'])
-            distribucionPublicaciones_fig.update_layout(margin=dict(l=20, r=20, t=50, b=20))
-
-            st.plotly_chart(distribucionPublicaciones_fig)
-            st.caption(f"Fuente: {grafico_produccion_tipo['fuente']}")
-            st.markdown("---")
-
-            publicacionesArea_fig = px.bar(
-                data_frame=grafico_publicaciones_area['resultado_sql'],
-                x=grafico_publicaciones_area['config']['plot_mapping']['x'],
-                y=grafico_publicaciones_area['config']['plot_mapping']['y'],
-                labels=grafico_publicaciones_area['config']['plot_mapping']['labels'],
-                title=grafico_publicaciones_area['nombre'],
-                color=grafico_publicaciones_area['config']['plot_mapping']['color'],
-                color_discrete_sequence=["#4D7AAE", "#B9422D", "#B2713F", "#198769", "#5C3C7D", "#EBD081", "#E26D5C", "#9B51E0", "#56CCF2", "#27AE60"],
-                orientation='h',
-            )
-            publicacionesArea_fig.update_traces(showlegend=False)
-            publicacionesArea_fig.update_layout(grafico_publicaciones_area['config']['layout'])
-
-            st.plotly_chart(publicacionesArea_fig)
-            st.caption(f"Fuente: {grafico_publicaciones_area['fuente']}")
-            st.markdown("---")
-
-            tabla_articulos_q1_q2_fig = tabla_pivot(tabla_articulos_q1_q2, render_gt=True)
-            great_tables(tabla_articulos_q1_q2_fig)
-            st.caption(f"Fuente: {tabla_articulos_q1_q2['fuente']}")
-
-        with ciencia_sociedadTab:
-            st.markdown("")
-
-            nBarras = len(provinciasDF)
-            altura = 20 * nBarras + 150
-
-            percepcionPublica_fig = px.bar(
-                data_frame=grafico_percepcion_calidad_vida['resultado_sql'],
-                y=grafico_percepcion_calidad_vida['config']['plot_mapping']['y'],
-                x=grafico_percepcion_calidad_vida['config']['plot_mapping']['x'],
-                labels=grafico_percepcion_calidad_vida['config']['plot_mapping']['labels'],
-                title=None,
-                template="seaborn",
-                orientation='h',
-                height=altura
-            )
-            percepcionPublica_fig.update_layout(grafico_percepcion_calidad_vida['config']['layout'])
-            percepcionPublica_fig.update_layout(margin=dict(l=20, r=40, t=20, b=20))
-
-            st.markdown(f"### {grafico_percepcion_calidad_vida['nombre']}")
-            st.plotly_chart(percepcionPublica_fig)
-            st.caption(f"Fuente: {grafico_percepcion_calidad_vida['fuente']}")
-            st.markdown("")
-
-        def exportar_a_pdf(provincia: str, data: dict):
-            componentes_exportables = {
-                "grafico_expo_top5": top5_exportaciones_fig,
-                "grafico_evolucion_regional": inversionID_fig,
-                "grafico_inv_por_investigador": inversionInvestigador_fig,
-                "grafico_inv_empresaria_sector": inversionEmpresas_fig,
-                "grafico_unidades_por_inst": unidadesIDxinstitucion_fig,
-                "grafico_equipos_por_tipo": equiposIDxTipo_fig,
-                "grafico_distribucion_investigadores": investigadoresxArea_fig,
-                "grafico_evolucion_investigadores": evolucionInvestigadores_fig,
-                "grafico_expo_intensidad": exportacionesIntensidad_fig,
-                "grafico_expo_evolucion": evolucionExportaciones_fig,
-                "grafico_expo_destino": exportacionesxPais_fig,
-                "grafico_produccion_evolucion": produccionProvincial_fig,
-                "grafico_produccion_tipo": distribucionPublicaciones_fig,
-                "grafico_publicaciones_area": publicacionesArea_fig,
-                "grafico_percepcion_calidad_vida": percepcionPublica_fig,
-                "grafico_patentes_evolucion": evolucionPatentes_fig,
-                "tabla_pfi_cruce": tabla_pfi_cruce,
-                "tabla_personas_por_funcion": tabla_personas_por_funcion,
-                "tabla_patentes_sector": tabla_patentes_sector,
-                "tabla_articulos_q1_q2": tabla_articulos_q1_q2,
-            }
-
-            for nombre, componente in componentes_exportables.items():
-                if nombre.startswith("tabla"):
-                    data["componentes"][nombre]["df"] = tabla_pivot(componente)
-                else:
-                    width, height = (1080, None)
-                    if nombre == "grafico_percepcion_calidad_vida":
-                        width, height = (None, 600)
-                    if nombre == "grafico_patentes_evolucion":
-                        resultado = data["componentes"][nombre]["resultado_sql"]
-                        if resultado is None or resultado.empty:
-                            data["componentes"][nombre]["img"] = ""
-                            continue
-                    data["componentes"][nombre]["img"] = componente.to_image(
-                        format="png", width=width, height=height, scale=2, validate=True
-                    )
-
-            print('Generación del diccionario de la ficha provincial completada.')
-            ficha_provincial_pdf(provincia, data, "output/ficha_provincial.pdf")
+        mostrar_seccion(seccion)
 
         style_metric_cards()
         st.markdown("---")
@@ -670,12 +391,51 @@ def panomProvincial():
             exportar = st.button("Exportar a PDF", use_container_width=True)
             if exportar:
                 try:
-                    exportar_a_pdf(st.session_state.provincia, DFs)
-                    exportar = False
+                    trabajo = exportar_a_pdf(st.session_state.provincia)
+                    st.session_state.exportacion_clave = trabajo.clave
                 except Exception as e:
                     st.error(f"Error al generar la ficha provincial: {e}")
+            estado_exportacion()
 
 
+# Segundos entre consultas del estado mientras el PDF se genera
+INTERVALO_EXPORTACION = 2
+
+
+@st.fragment
+def estado_exportacion():
+    """
+    Muestra el estado de la exportación en segundo plano y, cuando termina, el
+    botón de descarga. Solo se vuelve a ejecutar sola mientras el trabajo está
+    activo; después el botón se dibuja una vez y no en cada intervalo.
+    """
+    trabajo = ColaExportacion.obtener(st.session_state.get("exportacion_clave", ""))
+    if trabajo is None or trabajo.provincia != st.session_state.get("provincia"):
+        return
+
+    if trabajo.activo:
+        st.info("Generando la ficha provincial...", icon="⏳")
+        time.sleep(INTERVALO_EXPORTACION)
+        st.rerun(scope="fragment")
+    elif trabajo.estado == ESTADO_ERROR:
+        st.error(f"Error al generar la ficha provincial: {trabajo.error}")
+    else:
+        try:
+            with open(trabajo.archivo, "rb") as pdf:
+                contenido = pdf.read()
+        except FileNotFoundError:
+            # El PDF venció y se eliminó del directorio de salida
+            st.warning("El PDF ya no está disponible. Vuelva a exportar la ficha.")
+            st.session_state.pop("exportacion_clave", None)
+            return
+        st.download_button(
+            "Descargar PDF",
+            data=contenido,
+            file_name=f"Ficha provincial - {trabajo.provincia}.pdf",
+            mime="application/pdf",
+            use_container_width=True,
+        )
+
 try:
     st.session_state.authenticator.login(location='unrendered')
     if 'authentication_status' in st.session_state:
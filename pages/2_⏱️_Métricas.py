@@ -0,0 +1,131 @@
+"""Streamlit page with query and cache metrics for administrators.
+
+Shows the slowest report components, p50/p95 query times per component over
+time and cache hit ratios, read from :class:`metricas.RegistroMetricas`. The
+metrics can also be downloaded in Prometheus text format or as JSONL.
+"""
+
+import pandas as pd
+import streamlit as st
+from metricas import RegistroMetricas
+
+
+st.set_page_config(page_title="Portal - SICyT", page_icon=st.secrets["LOGO_CORTO"], layout="wide")
+st.logo(image=st.secrets["LOGO_LARGO"], size="large")
+
+VENTANAS = {"1 minuto": "1min", "5 minutos": "5min", "15 minutos": "15min", "1 hora": "1h"}
+
+
+def mostrar_metricas():
+    """Render the query timing and cache metrics of this process."""
+    st.header("Métricas de consultas")
+    st.write("Tiempos de las consultas de los informes desde el último reinicio del servidor.")
+
+    mediciones = pd.DataFrame(RegistroMetricas.mediciones())
+    if mediciones.empty:
+        st.info("Todavía no se registraron consultas.")
+    else:
+        mediciones["fecha"] = pd.to_datetime(mediciones["timestamp"], unit="s")
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Consultas", f"{len(mediciones):,}".replace(",", "."))
+        col2.metric("p50 total", f"{mediciones['total'].quantile(0.5) * 1000:.0f} ms")
+        col3.metric("p95 total", f"{mediciones['total'].quantile(0.95) * 1000:.0f} ms")
+        col4.metric("Errores", int(mediciones["error"].notna().sum()))
+
+        st.subheader("Componentes más lentos")
+        resumen = pd.DataFrame(RegistroMetricas.resumen_por_componente())
+        for columna in ["p50", "p95", "maximo", "espera_conexion_p95"]:
+            resumen[columna] = (resumen[columna] * 1000).round(1)
+        st.dataframe(
+            resumen,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "p50": st.column_config.NumberColumn("p50 (ms)"),
+                "p95": st.column_config.NumberColumn("p95 (ms)"),
+                "maximo": st.column_config.NumberColumn("Máximo (ms)"),
+                "espera_conexion_p95": st.column_config.NumberColumn("Espera de conexión p95 (ms)"),
+            },
+        )
+
+        st.subheader("Evolución por componente")
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            componentes = st.multiselect(
+                "Componentes",
+                options=resumen["componente"].tolist(),
+                default=resumen["componente"].head(5).tolist(),
+            )
+        with col2:
+            cuantil = st.radio("Cuantil", ["p50", "p95"], horizontal=True)
+        with col3:
+            ventana = st.selectbox("Ventana", list(VENTANAS), index=1)
+
+        seleccion = mediciones[mediciones["componente"].isin(componentes)]
+        if not seleccion.empty:
+            import plotly.express as px
+
+            evolucion = (
+                seleccion
+                .groupby([pd.Grouper(key="fecha", freq=VENTANAS[ventana]), "componente"])["total"]
+                .quantile(0.5 if cuantil == "p50" else 0.95)
+                .mul(1000)
+                .reset_index()
+            )
+            fig = px.line(
+                evolucion,
+                x="fecha",
+                y="total",
+                color="componente",
+                markers=True,
+                labels={"fecha": "", "total": f"{cuantil} (ms)", "componente": "Componente"},
+                template="seaborn",
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader("Cachés")
+    cache = pd.DataFrame.from_dict(RegistroMetricas.estadisticas_cache(), orient="index")
+    if cache.empty:
+        st.info("Todavía no se registraron accesos a las cachés.")
+    else:
+        cache["tasa_aciertos"] = (cache["aciertos"] / (cache["aciertos"] + cache["fallos"]) * 100).round(1)
+        st.dataframe(
+            cache.rename_axis("cache").reset_index(),
+            hide_index=True,
+            use_container_width=True,
+            column_config={"tasa_aciertos": st.column_config.NumberColumn("Aciertos (%)")},
+        )
+
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "Exportar (Prometheus)",
+            data=RegistroMetricas.exportar_prometheus(),
+            file_name="metricas.prom",
+            mime="text/plain",
+            use_container_width=True,
+        )
+    with col2:
+        st.download_button(
+            "Exportar (JSONL)",
+            data=RegistroMetricas.exportar_jsonl(),
+            file_name="metricas.jsonl",
+            mime="application/jsonl",
+            use_container_width=True,
+        )
+
+
+try:
+    st.session_state.authenticator.login(location='unrendered')
+    if 'authentication_status' in st.session_state:
+        if "authentication_status" not in st.session_state or not st.session_state["authentication_status"]:
+            st.warning("Debe estar logueado para acceder a esta información.")
+            st.stop()  # App won't run anything after this line
+        elif 'admin' not in st.session_state["roles"]:
+            st.error('Acceso no autorizado.')
+        else:
+            mostrar_metricas()
+except AttributeError:
+    st.warning("Debe estar logueado para acceder a esta información.")
@@ -0,0 +1,131 @@
+"""Streamlit page comparing every province on a single indicator.
+
+Each comparable component of the provincial ficha (``comparable`` in
+informes.yml) is evaluated for all provinces with a single query
+(:func:`data_handler.get_comparacion`). KPIs are shown as a ranking table and
+bar chart; charts are shown as small multiples, one panel per province.
+"""
+
+import streamlit as st
+from data_handler import COLUMNA_COMPARACION, get_comparacion, ranking_comparacion, render_obj, version_informe
+from figuras import construir_figura_comparacion
+from metricas import RegistroMetricas
+from registro_informes import RegistroInformes
+
+
+st.set_page_config(page_title="Portal - SICyT", page_icon=st.secrets["LOGO_CORTO"], layout="wide")
+st.logo(image=st.secrets["LOGO_LARGO"], size="large")
+
+INFORME = "ficha_provincial"
+ANIO = "2023"
+
+# Columna que se suma para ordenar las provincias en cada tipo de gráfico
+MEDIDA_POR_TIPO = {"barh": "x", "bar": "y", "pie": "values"}
+
+
+def comparacion(comp_nombre: str) -> dict:
+    """
+    Evaluate ``comp_nombre`` for every province, reusing the result within the
+    session until one of the tables the report reads is reloaded.
+    """
+    cache = st.session_state.setdefault("comparacion_cache", {})
+    version = version_informe(INFORME)
+    # Results of an older data version are never read again
+    for vieja in [c for c in cache if c[2] != version]:
+        del cache[vieja]
+    clave = (comp_nombre, ANIO, version)
+    RegistroMetricas.registrar_cache("comparacion_sesion", clave in cache)
+    if clave not in cache:
+        cache[clave] = get_comparacion(INFORME, comp_nombre, {"anio": ANIO})
+    return cache[clave]
+
+
+def mostrar_ranking(componente: dict, columna: str = None):
+    """Render the provinces ordered by ``columna`` (the KPI value by default)."""
+    ranking = ranking_comparacion(componente, columna)
+    config = componente.get("config") or {}
+    formato = {"int": "%d", "float": "%.2f"}.get(config.get("format"), "%.2f") + config.get("suffix", "")
+
+    col1, col2 = st.columns([2, 3])
+    with col1:
+        st.dataframe(
+            ranking,
+            hide_index=True,
+            use_container_width=True,
+            height=35 * (len(ranking) + 1) + 3,
+            column_config={
+                "posicion": st.column_config.NumberColumn("#", width="small"),
+                COLUMNA_COMPARACION: st.column_config.TextColumn("Provincia"),
+                "valor": st.column_config.NumberColumn("Valor", format=formato),
+            },
+        )
+    with col2:
+        import plotly.express as px
+
+        fig = px.bar(
+            ranking.iloc[::-1],
+            x="valor",
+            y=COLUMNA_COMPARACION,
+            orientation="h",
+            template="seaborn",
+            labels={"valor": "", COLUMNA_COMPARACION: ""},
+            height=35 * (len(ranking) + 1) + 3,
+        )
+        fig.update_traces(marker_color="#4D7AAE")
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def mostrar_comparacion():
+    """Render the province comparison page."""
+    st.header("Comparación provincial")
+    st.write("Todas las provincias lado a lado para un mismo indicador.")
+    st.markdown("---")
+
+    componentes = {
+        clave: componente
+        for clave, componente in RegistroInformes.obtener(INFORME).componentes.items()
+        if componente.comparable
+    }
+    comp_nombre = st.selectbox(
+        "Indicador",
+        options=list(componentes),
+        format_func=lambda clave: render_obj(componentes[clave].nombre, {"anio": ANIO}),
+        index=None,
+        placeholder="Seleccione un indicador para comparar las provincias",
+        label_visibility="collapsed",
+        key="indicador",
+    )
+    if comp_nombre is None:
+        return
+
+    with st.spinner("Consultando todas las provincias..."):
+        componente = comparacion(comp_nombre)
+
+    st.subheader(componente["nombre"])
+    if componente["resultado_sql"] is None or componente["resultado_sql"].empty:
+        st.info("No hay datos para comparar.")
+        return
+
+    if componente["tipo_componente"] == "KPI":
+        mostrar_ranking(componente)
+    elif componente["tipo_componente"] == "GRAFICO":
+        medida = componente["config"].get("plot_mapping", {}).get(MEDIDA_POR_TIPO.get(componente["tipo_grafico"]))
+        if medida:
+            with st.expander("Ranking de provincias"):
+                mostrar_ranking(componente, medida)
+        st.plotly_chart(construir_figura_comparacion(componente), use_container_width=True)
+    st.caption(f"Fuente: {componente['fuente']}")
+
+
+try:
+    st.session_state.authenticator.login(location='unrendered')
+    if 'authentication_status' in st.session_state:
+        if "authentication_status" not in st.session_state or not st.session_state["authentication_status"]:
+            st.warning("Debe estar logueado para acceder a esta información.")
+            st.stop()  # App won't run anything after this line
+        elif 'admin' not in st.session_state["roles"] and 'director' not in st.session_state["roles"]:
+            st.error('Acceso no autorizado.')
+        else:
+            mostrar_comparacion()
+except AttributeError:
+    st.warning("Debe estar logueado para acceder a esta información.")
@@ -1,10 +1,15 @@
+from activos import ruta_pdf
 from data_handler import procesar_kpi
 from fpdf import FPDF, XPos, YPos, enums
 from fpdf.fonts import FontFace
 from PIL import Image
 
 
-HEADER = "static/logo/letterhead.png"
+# Versiones reducidas de ``python activos.py`` si existen, si no los originales
+HEADER = ruta_pdf("static/logo/letterhead.png")
+POPPINS_REGULAR = ruta_pdf("static/fonts/Poppins/Poppins-Regular.ttf")
+POPPINS_BOLD = ruta_pdf("static/fonts/Poppins/Poppins-Bold.ttf")
+POPPINS_ITALIC = ruta_pdf("static/fonts/Poppins/Poppins-Italic.ttf")
 HEIGHT = 297  # A4 height in mm
 WIDTH = 210  # A4 width in mm
 FUENTES = "#FFFFFF"
@@ -162,10 +167,10 @@ def ficha_provincial_pdf(provincia: str, content: dict, filename):
 
     pdf = PDF(provincia=provincia)
     # Agregamos las fuentes
-    pdf.add_font("Poppins regular", "", "static/fonts/Poppins/Poppins-Regular.ttf")
-    pdf.add_font("Poppins regular", "B", "static/fonts/Poppins/Poppins-Bold.ttf")
-    pdf.add_font("Poppins bold", "", "static/fonts/Poppins/Poppins-Bold.ttf")
-    pdf.add_font("Poppins italic", "", "static/fonts/Poppins/Poppins-Italic.ttf")
+    pdf.add_font("Poppins regular", "", POPPINS_REGULAR)
+    pdf.add_font("Poppins regular", "B", POPPINS_BOLD)
+    pdf.add_font("Poppins bold", "", POPPINS_BOLD)
+    pdf.add_font("Poppins italic", "", POPPINS_ITALIC)
 
     pdf.set_top_margin(20)
 
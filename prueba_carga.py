@@ -0,0 +1,169 @@
+"""Prueba de carga con usuarios concurrentes.
+
+Simula N sesiones que, como en la página de fichas provinciales, eligen una
+provincia al azar, recorren sus secciones (consultas, figuras y tablas) y con
+cierta probabilidad exportan la ficha a PDF. Las sesiones corren en hilos del
+mismo proceso, igual que las sesiones de Streamlit. Al final informa el
+throughput y los percentiles de latencia por operación.
+
+Se ejecuta contra el PostgreSQL configurado o contra el motor embebido de
+``benchmark.py``; combinado con ``datos_sinteticos.py`` permite estimar la
+capacidad con volúmenes mayores:
+
+    python datos_sinteticos.py --factor 100 --salida data_x100
+    DATA_DIR=data_x100 python prueba_carga.py --motor embebido --usuarios 20 --duracion 120
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Mismos rangos de ``orden`` que las secciones de la página de fichas
+SECCIONES = [(1000, 1999), (2000, 2999), (3000, 3999), (4200, 4299), (4300, 4399), (4100, 4199), (5000, 5999)]
+ANIO = "2023"
+
+
+class Resultados:
+    """Latencias por operación, compartidas por todas las sesiones simuladas."""
+
+    def __init__(self):
+        self.latencias = {}
+        self.errores = {}
+        self._lock = threading.Lock()
+
+    def medir(self, operacion: str, funcion, *args):
+        inicio = time.perf_counter()
+        try:
+            funcion(*args)
+        except Exception as e:
+            with self._lock:
+                self.errores.setdefault(operacion, []).append(f"{type(e).__name__}: {e}")
+            return
+        self.registrar(operacion, time.perf_counter() - inicio)
+
+    def registrar(self, operacion: str, duracion: float):
+        with self._lock:
+            self.latencias.setdefault(operacion, []).append(duracion)
+
+    def resumen(self, duracion: float) -> dict:
+        resumen = {}
+        for operacion in sorted(set(self.latencias) | set(self.errores)):
+            valores = pd.Series(self.latencias.get(operacion, []), dtype=float)
+            resumen[operacion] = {
+                "n": len(valores),
+                "errores": len(self.errores.get(operacion, [])),
+                "por_segundo": len(valores) / duracion,
+                "p50": valores.quantile(0.5) if len(valores) else None,
+                "p95": valores.quantile(0.95) if len(valores) else None,
+                "p99": valores.quantile(0.99) if len(valores) else None,
+                "max": valores.max() if len(valores) else None,
+            }
+        return resumen
+
+
+def abrir_seccion(params: dict, orden: tuple) -> dict:
+    from data_handler import iter_informe, tabla_pivot
+    from figuras import construir_figura
+
+    componentes = {}
+    for nombre, componente in iter_informe("ficha_provincial", params, orden=orden):
+        componentes[nombre] = componente
+        if componente.get("tipo_componente") == "GRAFICO":
+            construir_figura(componente)
+        elif componente.get("tipo_componente") == "TABLA" and not componente["resultado_sql"].empty:
+            tabla_pivot(componente, render_gt=True)
+    return componentes
+
+
+def exportar(params: dict, componentes: dict, directorio: str):
+    from exportacion import exportar_ficha_provincial
+
+    data = {"nombre": "ficha_provincial", "componentes": {n: dict(c) for n, c in componentes.items()}}
+    archivo = os.path.join(directorio, f"ficha_{threading.get_ident()}.pdf")
+    exportar_ficha_provincial(params["provincia"], data, archivo)
+
+
+def sesion(resultados: Resultados, provincias: pd.DataFrame, fin: float, prob_seccion: float,
+           prob_exportar: float, pausa: float, directorio: str):
+    """Una sesión simulada: fichas de provincias al azar hasta que se agota el tiempo."""
+    rng = random.Random()
+    while time.time() < fin:
+        fila = provincias.iloc[rng.randrange(len(provincias))]
+        params = {"provincia_id": int(fila["id"]), "provincia": fila["nombre_iso"], "anio": ANIO}
+
+        componentes = {}
+        espera = 0.0
+        inicio = time.perf_counter()
+        for i, orden in enumerate(SECCIONES):
+            # La primera sección se muestra siempre; el resto, si el usuario la abre
+            if i == 0 or rng.random() < prob_seccion:
+                resultados.medir("seccion", lambda: componentes.update(abrir_seccion(params, orden)))
+                lectura = rng.uniform(0, pausa)
+                time.sleep(lectura)
+                espera += lectura
+        # Tiempo de espera del usuario por la ficha, sin las pausas de lectura
+        resultados.registrar("ficha", time.perf_counter() - inicio - espera)
+
+        if rng.random() < prob_exportar:
+            for orden in SECCIONES:
+                if not any(orden[0] <= c.get("orden", 0) <= orden[1] for c in componentes.values()):
+                    componentes.update(abrir_seccion(params, orden))
+            resultados.medir("exportacion", exportar, params, componentes, directorio)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la ficha provincial con usuarios concurrentes.")
+    parser.add_argument("--motor", choices=["embebido", "postgres"], default="embebido")
+    parser.add_argument("--usuarios", type=int, default=10, help="Sesiones concurrentes")
+    parser.add_argument("--duracion", type=float, default=60, help="Segundos de prueba")
+    parser.add_argument("--prob-seccion", type=float, default=0.5, help="Probabilidad de abrir cada sección adicional")
+    parser.add_argument("--prob-exportar", type=float, default=0.1, help="Probabilidad de exportar la ficha a PDF")
+    parser.add_argument("--pausa", type=float, default=1.0, help="Tiempo máximo de lectura entre secciones (s)")
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import data_handler
+
+    if args.motor == "embebido":
+        from benchmark import CursorEmbebido, MotorEmbebido
+        data_handler.Cursor = CursorEmbebido
+        MotorEmbebido.get_db()
+
+    provincias = data_handler.get_provincias()
+    resultados = Resultados()
+    print(f"{args.usuarios} usuarios durante {args.duracion:.0f} s contra el motor {args.motor}...")
+
+    inicio = time.time()
+    with tempfile.TemporaryDirectory() as directorio, ThreadPoolExecutor(max_workers=args.usuarios) as executor:
+        fin = inicio + args.duracion
+        futuros = [
+            executor.submit(sesion, resultados, provincias, fin, args.prob_seccion, args.prob_exportar, args.pausa, directorio)
+            for _ in range(args.usuarios)
+        ]
+        for futuro in futuros:
+            futuro.result()
+    duracion = time.time() - inicio
+
+    resumen = resultados.resumen(duracion)
+    print(f"\n{'Operación':<12}{'n':>7}{'errores':>9}{'ops/s':>9}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}")
+    for operacion, r in resumen.items():
+        tiempos = "".join(f"{r[q] * 1000:>11.0f}" if r[q] is not None else f"{'-':>11}" for q in ("p50", "p95", "p99"))
+        print(f"{operacion:<12}{r['n']:>7}{r['errores']:>9}{r['por_segundo']:>9.2f}{tiempos}")
+    for operacion, errores in resultados.errores.items():
+        print(f"Primer error en {operacion}: {' '.join(errores[0].split())[:120]}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "duracion": duracion, "operaciones": resumen}, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
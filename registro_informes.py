@@ -0,0 +1,456 @@
+"""Registro compilado y validado de las definiciones de informes.yml.
+
+``informes.yml`` se parsea y valida una sola vez y se compila en objetos
+``Informe``/``Componente``; los componentes con ``estado: false`` se descartan
+al compilar. El resultado se guarda en un pickle (``.cache/informes.pickle``)
+identificado por el hash del YAML, de modo que los procesos siguientes no lo
+vuelven a parsear mientras el archivo no cambie. Cada consulta al registro
+compara la fecha de modificación del archivo, así que un cambio en el YAML se
+toma sin reiniciar la aplicación.
+
+Un YAML mal formado o un componente inválido levantan ``ErrorInformes`` con
+todos los problemas encontrados, en lugar de fallar al ejecutar el componente.
+
+Validación desde la línea de comandos (renderiza todas las plantillas, también
+en su forma comparativa, y con ``--motor`` además ejecuta un EXPLAIN de cada
+consulta):
+
+    python registro_informes.py
+    python registro_informes.py --motor embebido --anio 2023
+"""
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import re
+import sys
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+from jinja2 import Environment, TemplateSyntaxError, meta
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TIPOS_COMPONENTE = ("KPI", "GRAFICO", "TABLA")
+
+# Parámetros que un componente puede declarar como ``comparable``: la tabla que
+# enumera todos sus valores, la columna con el valor y la columna con la etiqueta.
+# Al comparar, el parámetro deja de ser un valor fijo y pasa a ser una dimensión
+# del resultado (ver ``data_handler.get_comparacion``).
+DIMENSIONES_COMPARABLES = {
+    "provincia_id": ("ref_provincia", "provincia_id", "provincia"),
+}
+
+# Alcance del resultado de un componente según los parámetros que declara: sin
+# parámetros es el mismo para todas las solicitudes mientras no cambien los
+# datos; con ``anio`` como único parámetro, uno por año; con cualquier otro (la
+# provincia), propio de cada solicitud.
+ALCANCE_GLOBAL = "global"
+ALCANCE_ANIO = "anio"
+ALCANCE_SOLICITUD = "solicitud"
+
+# Cambia cuando cambia la forma de los objetos compilados: invalida los pickles anteriores
+VERSION_REGISTRO = 2
+
+_jinja = Environment()
+
+
+class ErrorInformes(ValueError):
+    """Definición de informes inválida. ``errores`` lista cada problema encontrado."""
+
+    def __init__(self, archivo: str, errores: List[str]):
+        self.errores = errores
+        super().__init__(f"{archivo}: {len(errores)} error(es)\n" + "\n".join(f" - {e}" for e in errores))
+
+
+def alcance_parametros(parametros: Iterable[str]) -> str:
+    """Alcance (``ALCANCE_*``) del resultado de un componente que declara ``parametros``."""
+    parametros = set(parametros or ())
+    if not parametros:
+        return ALCANCE_GLOBAL
+    if parametros == {"anio"}:
+        return ALCANCE_ANIO
+    return ALCANCE_SOLICITUD
+
+
+class Componente:
+    """Componente de un informe, tal como está declarado en informes.yml."""
+
+    def __init__(self, clave: str, definicion: dict, tablas: Tuple[str, ...]):
+        self.clave = clave
+        self.orden = definicion["orden"]
+        self.nombre = definicion["nombre"]
+        self.tipo_componente = definicion["tipo_componente"]
+        self.tipo_grafico = definicion.get("tipo_grafico")
+        self.estado = definicion.get("estado", True)
+        self.parametros = tuple(definicion.get("parametros", []))
+        self.fuente = definicion.get("fuente")
+        self.config = definicion.get("config") or {}
+        self.plantilla_sql = definicion.get("plantilla_sql")
+        self.comparable = definicion.get("comparable")
+        # Tablas que lee la plantilla (FROM/JOIN, sin los nombres de CTE)
+        self.tablas = tablas
+
+    def como_dict(self) -> dict:
+        """
+        El componente en la forma de informes.yml que usan las páginas y la
+        exportación. ``config`` se comparte con el registro: quien la modifique
+        debe copiarla (``render_obj`` ya devuelve copias).
+        """
+        componente = {
+            "orden": self.orden,
+            "nombre": self.nombre,
+            "tipo_componente": self.tipo_componente,
+            "estado": self.estado,
+            "parametros": list(self.parametros),
+            "fuente": self.fuente,
+            "config": self.config,
+        }
+        if self.tipo_grafico is not None:
+            componente["tipo_grafico"] = self.tipo_grafico
+        if self.comparable is not None:
+            componente["comparable"] = self.comparable
+        if self.plantilla_sql is not None:
+            componente["plantilla_sql"] = self.plantilla_sql
+            componente["tablas"] = list(self.tablas)
+        return componente
+
+    def __repr__(self) -> str:
+        return f"Componente({self.clave!r}, orden={self.orden}, tipo={self.tipo_componente})"
+
+
+class Informe:
+    """Informe compilado: componentes habilitados en el orden de definición."""
+
+    def __init__(self, nombre: str, componentes: Dict[str, Componente]):
+        self.nombre = nombre
+        self.componentes = componentes
+
+    def seleccionar(self, componentes: Optional[Iterable[str]] = None,
+                    orden: Optional[Tuple[int, int]] = None) -> Dict[str, Componente]:
+        """Componentes por nombre y/o por rango inclusivo de ``orden``."""
+        if componentes is not None:
+            componentes = set(componentes)
+        seleccion = {}
+        for clave, componente in self.componentes.items():
+            if componentes is not None and clave not in componentes:
+                continue
+            if orden is not None and not orden[0] <= componente.orden <= orden[1]:
+                continue
+            seleccion[clave] = componente
+        return seleccion
+
+    @property
+    def tablas(self) -> Tuple[str, ...]:
+        """Tablas que leen los componentes del informe, sin repetir."""
+        return tuple(dict.fromkeys(tabla for componente in self.componentes.values() for tabla in componente.tablas))
+
+    def __repr__(self) -> str:
+        return f"Informe({self.nombre!r}, {len(self.componentes)} componentes)"
+
+
+_RE_TABLA = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.]*)", re.IGNORECASE)
+_RE_CTE = re.compile(r"(?:\bWITH(?:\s+RECURSIVE)?|,)\s*([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+
+
+def tablas_plantilla(plantilla_sql: str) -> Tuple[str, ...]:
+    """Tablas que lee una plantilla SQL, en orden de aparición y sin repetir."""
+    ctes = {nombre.lower() for nombre in _RE_CTE.findall(plantilla_sql)}
+    tablas = []
+    for tabla in _RE_TABLA.findall(plantilla_sql):
+        tabla = tabla.lower()
+        if tabla not in ctes and tabla not in tablas:
+            tablas.append(tabla)
+    return tuple(tablas)
+
+
+def grafo_dependencias(informes: Dict[str, Informe]) -> Dict[str, List[str]]:
+    """
+    Grafo de dependencias de los datos: cada tabla con los componentes
+    (``informe.componente``) cuyas plantillas la leen, según ``tablas_plantilla``.
+    """
+    grafo = {}
+    for informe in informes.values():
+        for clave, componente in informe.componentes.items():
+            for tabla in componente.tablas:
+                grafo.setdefault(tabla, []).append(f"{informe.nombre}.{clave}")
+    return dict(sorted(grafo.items()))
+
+
+def _errores_jinja(valor, ruta: str, errores: List[str]):
+    """Verifica que cada texto con placeholders de ``valor`` sea una plantilla Jinja válida."""
+    if isinstance(valor, dict):
+        for k, v in valor.items():
+            _errores_jinja(k, ruta, errores)
+            _errores_jinja(v, f"{ruta}.{k}", errores)
+    elif isinstance(valor, list):
+        for i, v in enumerate(valor):
+            _errores_jinja(v, f"{ruta}[{i}]", errores)
+    elif isinstance(valor, str) and "{" in valor:
+        try:
+            _jinja.parse(valor)
+        except TemplateSyntaxError as e:
+            errores.append(f"{ruta}: plantilla inválida: {e}")
+
+
+def _compilar_componente(clave: str, definicion, ruta: str, errores: List[str]) -> Optional[Componente]:
+    if not isinstance(definicion, dict):
+        errores.append(f"{ruta}: se esperaba un diccionario")
+        return None
+
+    n_errores = len(errores)
+    if not isinstance(definicion.get("orden"), int):
+        errores.append(f"{ruta}.orden: se esperaba un entero")
+    if not isinstance(definicion.get("nombre"), str):
+        errores.append(f"{ruta}.nombre: se esperaba un texto")
+    tipo = definicion.get("tipo_componente")
+    if tipo not in TIPOS_COMPONENTE:
+        errores.append(f"{ruta}.tipo_componente: '{tipo}' no es uno de {', '.join(TIPOS_COMPONENTE)}")
+    if not isinstance(definicion.get("estado", True), bool):
+        errores.append(f"{ruta}.estado: se esperaba true o false")
+
+    parametros = definicion.get("parametros", [])
+    if not isinstance(parametros, list) or not all(isinstance(p, str) for p in parametros):
+        errores.append(f"{ruta}.parametros: se esperaba una lista de nombres")
+        parametros = []
+    comparable = definicion.get("comparable")
+    if comparable is not None:
+        if comparable not in DIMENSIONES_COMPARABLES:
+            errores.append(f"{ruta}.comparable: '{comparable}' no es uno de {', '.join(DIMENSIONES_COMPARABLES)}")
+        elif comparable not in parametros:
+            errores.append(f"{ruta}.comparable: '{comparable}' debe figurar en parametros")
+
+    config = definicion.get("config") or {}
+    if not isinstance(config, dict):
+        errores.append(f"{ruta}.config: se esperaba un diccionario")
+        config = {}
+    if tipo == "GRAFICO":
+        if not definicion.get("tipo_grafico"):
+            errores.append(f"{ruta}.tipo_grafico: obligatorio en los componentes GRAFICO")
+        if not isinstance(config.get("plot_mapping", {}), dict):
+            errores.append(f"{ruta}.config.plot_mapping: se esperaba un diccionario")
+    elif tipo == "TABLA":
+        pivot = config.get("pivot")
+        faltantes = [k for k in ("columns", "values", "aggfunc") if not isinstance(pivot, dict) or k not in pivot]
+        if faltantes:
+            errores.append(f"{ruta}.config.pivot: faltan {', '.join(faltantes)}")
+    _errores_jinja({k: v for k, v in definicion.items() if k != "plantilla_sql"}, ruta, errores)
+
+    tablas = ()
+    plantilla = definicion.get("plantilla_sql")
+    if plantilla is not None:
+        if not isinstance(plantilla, str) or not plantilla.strip():
+            errores.append(f"{ruta}.plantilla_sql: se esperaba un texto no vacío")
+        else:
+            try:
+                variables = meta.find_undeclared_variables(_jinja.parse(plantilla))
+            except TemplateSyntaxError as e:
+                errores.append(f"{ruta}.plantilla_sql: plantilla inválida (línea {e.lineno}): {e.message}")
+            else:
+                # Las consultas se renderizan solo con los parámetros declarados
+                no_declaradas = sorted(variables - set(parametros))
+                if no_declaradas:
+                    errores.append(f"{ruta}.plantilla_sql: usa {', '.join(no_declaradas)} sin declararlos en parametros")
+                tablas = tablas_plantilla(plantilla)
+
+    if len(errores) > n_errores:
+        return None
+    return Componente(clave, definicion, tablas)
+
+
+def compilar(datos, archivo: str = "informes.yml") -> Dict[str, Informe]:
+    """
+    Valida el contenido de informes.yml y lo compila en ``Informe`` por nombre.
+
+    Raises:
+        ErrorInformes: Con todos los errores encontrados, si hay alguno.
+    """
+    errores = []
+    informes_yml = datos.get("informe") if isinstance(datos, dict) else None
+    if isinstance(informes_yml, dict):
+        informes_yml = [informes_yml]
+    if not isinstance(informes_yml, list) or not informes_yml:
+        raise ErrorInformes(archivo, ["falta la clave 'informe' con al menos un informe"])
+
+    informes = {}
+    for i, informe_yml in enumerate(informes_yml):
+        nombre = informe_yml.get("nombre") if isinstance(informe_yml, dict) else None
+        ruta = f"informe[{nombre or i}]"
+        if not isinstance(nombre, str):
+            errores.append(f"{ruta}.nombre: se esperaba un texto")
+            continue
+        if nombre in informes:
+            errores.append(f"{ruta}: nombre de informe repetido")
+        definiciones = informe_yml.get("componentes")
+        if not isinstance(definiciones, dict) or not definiciones:
+            errores.append(f"{ruta}.componentes: se esperaba un diccionario no vacío")
+            continue
+
+        componentes = {}
+        for clave, definicion in definiciones.items():
+            componente = _compilar_componente(clave, definicion, f"{ruta}.{clave}", errores)
+            if componente is not None and componente.estado:
+                componentes[clave] = componente
+        informes[nombre] = Informe(nombre, componentes)
+
+    if errores:
+        raise ErrorInformes(archivo, errores)
+    return informes
+
+
+def cargar(archivo: str) -> Dict[str, Informe]:
+    """Lee y compila ``archivo`` sin pasar por la caché."""
+    try:
+        with open(archivo, "r", encoding="utf-8") as f:
+            datos = yaml.safe_load(f)
+    except yaml.YAMLError as e:
+        raise ErrorInformes(archivo, [f"YAML inválido: {e}"]) from e
+    return compilar(datos, archivo)
+
+
+class RegistroInformes:
+    __ARCHIVO = os.getenv("INFORMES_ARCHIVO", os.path.join(BASE_DIR, "informes.yml"))
+    __CACHE = os.getenv("INFORMES_CACHE", os.path.join(BASE_DIR, ".cache", "informes.pickle"))
+    _informes = None
+    _firma = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _cargar(cls) -> Dict[str, Informe]:
+        with open(cls.__ARCHIVO, "rb") as f:
+            huella = f"{VERSION_REGISTRO}:{hashlib.sha256(f.read()).hexdigest()}"
+
+        try:
+            with open(cls.__CACHE, "rb") as f:
+                huella_cache, informes = pickle.load(f)
+            if huella_cache == huella:
+                logger.debug("Registro de informes leído de %s", cls.__CACHE)
+                return informes
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"No se pudo leer la caché de informes {cls.__CACHE}: {e}")
+
+        informes = cargar(cls.__ARCHIVO)
+        try:
+            os.makedirs(os.path.dirname(cls.__CACHE), exist_ok=True)
+            temporal = f"{cls.__CACHE}.{os.getpid()}.tmp"
+            with open(temporal, "wb") as f:
+                pickle.dump((huella, informes), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporal, cls.__CACHE)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la caché de informes {cls.__CACHE}: {e}")
+        logger.info(f"Registro de informes compilado: {', '.join(informes)}")
+        return informes
+
+    @classmethod
+    def informes(cls) -> Dict[str, Informe]:
+        """Informes compilados; se recompilan si informes.yml cambió desde la última consulta."""
+        estado = os.stat(cls.__ARCHIVO)
+        firma = (estado.st_mtime_ns, estado.st_size)
+        if cls._firma != firma:
+            with cls._lock:
+                if cls._firma != firma:
+                    cls._informes = cls._cargar()
+                    cls._firma = firma
+        return cls._informes
+
+    @classmethod
+    def dependientes(cls, tablas: Iterable[str]) -> List[str]:
+        """Componentes (``informe.componente``) que leen alguna de ``tablas``."""
+        grafo = grafo_dependencias(cls.informes())
+        return sorted({componente for tabla in tablas for componente in grafo.get(tabla, [])})
+
+    @classmethod
+    def obtener(cls, nombre_informe: str) -> Informe:
+        try:
+            return cls.informes()[nombre_informe]
+        except KeyError:
+            raise KeyError(f"Informe '{nombre_informe}' no encontrado") from None
+
+
+def validar(params: dict, motor: Optional[str] = None) -> List[str]:
+    """
+    Renderiza cada componente habilitado con ``params`` y, si se indica un
+    motor, ejecuta EXPLAIN de su consulta. Devuelve los errores encontrados.
+    """
+    import data_handler
+    from figuras import CONSTRUCTORES, TIPOS_COMPARABLES
+
+    if motor == "embebido":
+        from benchmark import CursorEmbebido
+        data_handler.Cursor = CursorEmbebido
+
+    errores = []
+    for informe in RegistroInformes.informes().values():
+        for clave, componente in informe.componentes.items():
+            ruta = f"{informe.nombre}.{clave}"
+            if componente.tipo_componente == "GRAFICO":
+                if componente.tipo_grafico not in CONSTRUCTORES:
+                    errores.append(f"{ruta}: tipo_grafico '{componente.tipo_grafico}' no soportado")
+                elif componente.comparable and componente.tipo_grafico not in TIPOS_COMPARABLES:
+                    errores.append(f"{ruta}: los gráficos '{componente.tipo_grafico}' no admiten comparable")
+            consultas = []
+            try:
+                data_handler.render_obj(componente.como_dict(), params)
+                if componente.plantilla_sql is None:
+                    continue
+                consultas.append((ruta, _jinja.from_string(componente.plantilla_sql).render(
+                    {k: params[k] for k in componente.parametros if k in params}
+                )))
+                if componente.comparable:
+                    consultas.append((f"{ruta} (comparación)", data_handler.sql_comparacion(
+                        componente.plantilla_sql, componente.comparable,
+                        {k: params[k] for k in componente.parametros if k in params},
+                    )))
+            except Exception as e:
+                errores.append(f"{ruta}: error al renderizar: {e}")
+                continue
+            if motor is not None:
+                for ruta_consulta, sql in consultas:
+                    try:
+                        with data_handler.Cursor() as cursor:
+                            cursor.execute(f"EXPLAIN {sql.strip().rstrip(';')}")
+                            cursor.fetchall()
+                    except Exception as e:
+                        errores.append(f"{ruta_consulta}: EXPLAIN falló: {' '.join(str(e).split())}")
+    return errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Valida informes.yml y prueba el renderizado de todas las plantillas.")
+    parser.add_argument("--motor", choices=["embebido", "postgres"], help="Además ejecuta EXPLAIN de cada consulta")
+    parser.add_argument("--provincia-id", type=int, default=6)
+    parser.add_argument("--provincia", default="Buenos Aires")
+    parser.add_argument("--anio", default="2023")
+    parser.add_argument("--dependencias", action="store_true", help="Muestra qué componentes lee cada tabla")
+    args = parser.parse_args()
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    try:
+        informes = RegistroInformes.informes()
+    except ErrorInformes as e:
+        print(e)
+        sys.exit(1)
+
+    for informe in informes.values():
+        print(f"{informe.nombre}: {len(informe.componentes)} componentes habilitados")
+    if args.dependencias:
+        for tabla, componentes in grafo_dependencias(informes).items():
+            print(f"{tabla}: {', '.join(componentes)}")
+    errores = validar({"provincia_id": args.provincia_id, "provincia": args.provincia, "anio": args.anio}, args.motor)
+    for error in errores:
+        print(f" - {error}")
+    if errores:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    # El pickle debe referirse a las clases de ``registro_informes``, no a las de ``__main__``
+    from registro_informes import main as _main
+    _main()
@@ -0,0 +1,99 @@
+"""Presupuesto de tiempo de importación de las páginas.
+
+Importa en un intérprete nuevo (``python -X importtime``) los módulos propios
+de cada página y compara el tiempo acumulado con su presupuesto. Streamlit y
+pandas se importan antes y no se cuentan: el servidor ya los tiene cargados
+cuando ejecuta una página. Sirve para detectar que una importación pesada
+(plotly, great_tables, fpdf, la lectura de los secretos) volvió a ejecutarse
+al importar el módulo en lugar de en la función que la usa.
+
+Uso:
+    python tiempo_importacion.py
+    IMPORTACION_PRESUPUESTO_FICHAS_MS=200 python tiempo_importacion.py --repeticiones 5
+
+Termina con código 1 si alguna página excede su presupuesto.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Módulos que carga cada página además de streamlit/pandas, y presupuesto en ms
+PAGINAS = {
+    "inicio": (["autenticacion", "css_utils"], 350),
+    "fichas": (["data_handler", "figuras", "exportacion", "metricas", "css_utils"], 150),
+    "metricas": (["metricas"], 20),
+    "comparacion": (["data_handler", "figuras", "metricas", "registro_informes"], 150),
+}
+
+PRECARGADOS = ["streamlit", "pandas"]
+
+_LINEA = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def medir(modulos: list) -> tuple:
+    """
+    Devuelve el tiempo acumulado (s) de importar ``modulos`` y los módulos
+    transitivos con mayor tiempo propio, como lista de (módulo, segundos).
+    """
+    codigo = f"import {', '.join(PRECARGADOS)}; import {', '.join(modulos)}"
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        cwd=BASE_DIR, capture_output=True, text=True,
+        env={**os.environ, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")},
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+
+    # Cada módulo de primer nivel aparece después de sus dependencias
+    total = 0
+    propios = []
+    bloque = []
+    for linea in proceso.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if not m:
+            continue
+        propio, acumulado, sangria, modulo = int(m[1]), int(m[2]), len(m[3]), m[4]
+        bloque.append((modulo, propio / 1e6))
+        if sangria == 0:
+            if modulo in modulos:
+                total += acumulado
+                propios += bloque
+            bloque = []
+    return total / 1e6, sorted(propios, key=lambda p: p[1], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica el presupuesto de tiempo de importación de las páginas.")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Se toma el mínimo de las repeticiones")
+    parser.add_argument("--detalle", type=int, default=5, help="Módulos más lentos a mostrar por página")
+    args = parser.parse_args()
+
+    excedidas = []
+    print(f"{'Página':<10}{'ms':>8}{'presupuesto':>13}")
+    for pagina, (modulos, presupuesto) in PAGINAS.items():
+        presupuesto = float(os.getenv(f"IMPORTACION_PRESUPUESTO_{pagina.upper()}_MS", presupuesto))
+        try:
+            total, propios = min((medir(modulos) for _ in range(args.repeticiones)), key=lambda m: m[0])
+        except RuntimeError as e:
+            print(f"{pagina:<10}{'error':>8}{presupuesto:>13.0f}  {e}")
+            excedidas.append(pagina)
+            continue
+
+        estado = "" if total * 1000 <= presupuesto else "  EXCEDIDO"
+        print(f"{pagina:<10}{total * 1000:>8.0f}{presupuesto:>13.0f}{estado}")
+        if estado:
+            excedidas.append(pagina)
+            for modulo, segundos in propios[:args.detalle]:
+                print(f"{'':<12}{modulo:<40}{segundos * 1000:>8.1f} ms")
+
+    if excedidas:
+        print(f"\nPresupuesto excedido: {', '.join(excedidas)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()